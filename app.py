@@ -1,18 +1,15 @@
 from flask import Flask, request, render_template
 import sys
 
-import pip
 from housing.util.util import read_yaml_file, write_yaml_file
-from matplotlib.style import context
 from housing.logger import logging
-from housing.exception import HousingException
+from housing.exception import HousingException, get_validation_error_message
 import os, sys
 import json
 from housing.config.configuration import Configuration
-from housing.constant import CONFIG_DIR, get_current_time_stamp
-from housing.pipeline.pipeline import Pipeline
-from housing.entity.housing_predictor import HousingPredictor, HousingData
-from flask import send_file, abort, render_template
+from housing.constant import CONFIG_DIR
+from housing.entity.prediction_service import PredictionService, MODEL_VERSION_KEY
+from flask import send_file, abort, render_template, jsonify, Response
 
 
 ROOT_DIR = os.getcwd()
@@ -27,8 +24,9 @@ MODEL_DIR = os.path.join(ROOT_DIR, SAVED_MODELS_DIR_NAME)
 
 from housing.logger import get_log_dataframe
 
-HOUSING_DATA_KEY = "housing_data"
-MEDIAN_HOUSING_VALUE_KEY = "median_house_value"
+serving_config = Configuration().get_serving_config()
+prediction_service = PredictionService(serving_config=serving_config)
+housing_predictor = prediction_service.housing_predictor
 
 app = Flask(__name__)
 
@@ -75,70 +73,136 @@ def index():
         return str(e)
 
 
+training_job_queue = None
+
+
+def get_training_job_queue(start_workers: bool = False):
+    """
+    Job queue of the process. With job_workers > 0 its workers are started by the first submitted job,
+    otherwise jobs are run by a separate `python -m housing.pipeline.training_job_queue` process.
+    The training pipeline itself is only imported by the job workers.
+    """
+    global training_job_queue
+    if training_job_queue is None:
+        from housing.pipeline.training_job_queue import TrainingJobQueue
+
+        training_job_queue = TrainingJobQueue.from_config(Configuration())
+    if start_workers:
+        training_job_queue.start_workers(Configuration().training_pipeline_config.job_workers)
+    return training_job_queue
+
+
+def get_training_jobs_html(limit: int = None) -> str:
+    import pandas as pd
+
+    jobs = get_training_job_queue().list_jobs(limit=limit)
+    return pd.DataFrame([job._asdict() for job in jobs]).to_html(classes='table table-striped col-12')
+
+
 @app.route('/view_experiment_hist', methods=['GET', 'POST'])
 def view_experiment_history():
-    experiment_df = Pipeline.get_experiments_status()
     context = {
-        "experiment": experiment_df.to_html(classes='table table-striped col-12')
+        "experiment": get_training_jobs_html()
     }
     return render_template('experiment_history.html', context=context)
 
 
 @app.route('/train', methods=['GET', 'POST'])
 def train():
-    message = ""
-    pipeline = Pipeline(config=Configuration(current_time_stamp=get_current_time_stamp()))
-    if not Pipeline.experiment.running_status:
-        message = "Training started."
-        pipeline.start()
-    else:
-        message = "Training is already in progress."
+    """
+    Queues a training job. A json body {"config_overrides": {...}, "model_config_overrides": {...}}
+    trains with values of config.yaml and model.yaml replaced, "isolated_export": true keeps the accepted
+    model in the job dir instead of deploying it.
+    """
+    job_request = request.get_json(silent=True) or dict()
+    try:
+        training_job = get_training_job_queue(start_workers=True).submit(
+            config_overrides=job_request.get("config_overrides"),
+            model_config_overrides=job_request.get("model_config_overrides"),
+            isolated_export=bool(job_request.get("isolated_export", False)))
+    except Exception as e:
+        logging.info(e)
+        return jsonify({"error": get_validation_error_message(e, "Training job could not be queued")}), 400
+    if request.is_json:
+        return jsonify(training_job._asdict())
     context = {
-        "experiment": pipeline.get_experiments_status().to_html(classes='table table-striped col-12'),
-        "message": message
+        "experiment": get_training_jobs_html(limit=5),
+        "message": f"Training job [{training_job.job_id}] queued."
     }
     return render_template('train.html', context=context)
 
 
+@app.route('/train/<job_id>', methods=['GET'])
+def training_job_status(job_id):
+    training_job = get_training_job_queue().get_job(job_id)
+    if training_job is None:
+        return abort(404)
+    return jsonify(training_job._asdict())
+
+
 @app.route('/predict', methods=['GET', 'POST'])
 def predict():
-    context = {
-        HOUSING_DATA_KEY: None,
-        MEDIAN_HOUSING_VALUE_KEY: None
-    }
+    context = prediction_service.get_predict_context()
 
     if request.method == 'POST':
-        longitude = float(request.form['longitude'])
-        latitude = float(request.form['latitude'])
-        housing_median_age = float(request.form['housing_median_age'])
-        total_rooms = float(request.form['total_rooms'])
-        total_bedrooms = float(request.form['total_bedrooms'])
-        population = float(request.form['population'])
-        households = float(request.form['households'])
-        median_income = float(request.form['median_income'])
-        ocean_proximity = request.form['ocean_proximity']
-
-        housing_data = HousingData(longitude=longitude,
-                                   latitude=latitude,
-                                   housing_median_age=housing_median_age,
-                                   total_rooms=total_rooms,
-                                   total_bedrooms=total_bedrooms,
-                                   population=population,
-                                   households=households,
-                                   median_income=median_income,
-                                   ocean_proximity=ocean_proximity,
-                                   )
-        housing_df = housing_data.get_housing_input_data_frame()
-        housing_predictor = HousingPredictor(model_dir=MODEL_DIR)
-        median_housing_value = housing_predictor.predict(X=housing_df)
-        context = {
-            HOUSING_DATA_KEY: housing_data.get_housing_data_as_dict(),
-            MEDIAN_HOUSING_VALUE_KEY: median_housing_value,
-        }
-        return render_template('predict.html', context=context)
+        request_timer = prediction_service.metrics.start_request("predict")
+        with request_timer.stage("parse"):
+            form = request.form.to_dict()
+        housing_data = prediction_service.get_housing_data(form, request_timer=request_timer)
+        housing_prediction = prediction_service.predict(housing_data, request_timer=request_timer)
+        if housing_prediction is None:
+            request_timer.finish(status="busy")
+            return "Server is busy, please retry.", 503
+        context = prediction_service.get_predict_context(housing_data=housing_data,
+                                                         housing_prediction=housing_prediction)
+        with request_timer.stage("render"):
+            page = render_template('predict.html', context=context)
+        request_timer.finish(model_version=housing_prediction.model_version)
+        return page
     return render_template("predict.html", context=context)
 
 
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch():
+    """
+    Accepts a json list of records (or {"records": [...]}) or a csv file upload / text/csv body.
+    Responds with one result per input row, in input order.
+    """
+    request_timer = prediction_service.metrics.start_request("predict_batch")
+    try:
+        with request_timer.stage("parse"):
+            if 'file' in request.files:
+                housing_batch_data = prediction_service.get_batch_from_csv(request.files['file'])
+            elif request.mimetype == 'text/csv':
+                housing_batch_data = prediction_service.get_batch_from_csv(request.stream)
+            else:
+                housing_batch_data = prediction_service.get_batch_from_records(request.get_json(force=True))
+    except Exception as e:
+        logging.info(e)
+        request_timer.finish(status="400")
+        return jsonify({"error": get_validation_error_message(e, "Batch could not be parsed")}), 400
+
+    response, status = prediction_service.predict_batch(housing_batch_data, request_timer=request_timer)
+    request_timer.finish(model_version=response.get(MODEL_VERSION_KEY), status="ok" if status == 200 else str(status))
+    return jsonify(response), status
+
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    response, status = prediction_service.get_readiness()
+    return jsonify(response), status
+
+
+@app.route('/serving_metrics', methods=['GET'])
+def serving_metrics():
+    return jsonify(prediction_service.get_metrics())
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(prediction_service.get_prometheus_metrics(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/saved_models', defaults={'req_path': 'saved_models'})
 @app.route('/saved_models/<path:req_path>')
 def saved_models_dir(req_path):
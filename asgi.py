@@ -0,0 +1,183 @@
+"""
+Asyncio serving mode: uvicorn asgi:application --host 0.0.0.0 --port 8080 --workers 4
+Exposes the same /predict, /predict_batch, /ready, /serving_metrics and /metrics endpoints as app.py through
+the shared PredictionService. Request bodies are read on the event loop, parsing and prediction run
+in a bounded thread pool and requests are answered with 503 once asgi_max_pending are waiting.
+/predict_batch accepts json or a text/csv body (multipart uploads are only handled by app.py).
+"""
+import os
+import io
+import sys
+import json
+import asyncio
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from housing.logger import logging
+from housing.exception import HousingException, get_validation_error_message
+from housing.config.configuration import Configuration
+from housing.entity.prediction_service import PredictionService, MODEL_VERSION_KEY
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+
+
+class BoundedExecutor:
+    """
+    Thread pool for cpu bound prediction work with a limit on waiting plus running calls.
+    Only touched from the event loop thread, so the pending counter needs no lock.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="asgi_predict")
+        self.max_pending = max_pending
+        self.pending = 0
+
+    def is_full(self) -> bool:
+        return self.pending >= self.max_pending
+
+    async def run(self, function, *args):
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+        finally:
+            self.pending -= 1
+
+
+class HousingAsgiApp:
+
+    def __init__(self, prediction_service: PredictionService, executor_workers: int, max_pending: int):
+        try:
+            self.prediction_service = prediction_service
+            self.executor = BoundedExecutor(max_workers=executor_workers, max_pending=max_pending)
+            self.template_env = Environment(loader=FileSystemLoader(TEMPLATE_DIR),
+                                            autoescape=select_autoescape(["html"]))
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    @staticmethod
+    async def read_body(receive) -> bytes:
+        body = bytearray()
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+        return bytes(body)
+
+    @staticmethod
+    async def send_response(send, status: int, body: bytes, content_type: str):
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", content_type.encode()),
+                                (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def send_json(self, send, response, status: int = 200):
+        await self.send_response(send, status, json.dumps(response).encode(), "application/json")
+
+    async def send_template(self, send, template_name: str, path: str, context: dict, status: int = 200):
+        template = self.template_env.get_template(template_name)
+        body = template.render(context=context, request={"path": path}).encode()
+        await self.send_response(send, status, body, "text/html; charset=utf-8")
+
+    def _predict_form(self, body: bytes, request_timer):
+        with request_timer.stage("parse"):
+            form = {key: values[0] for key, values in urllib.parse.parse_qs(body.decode()).items()}
+        housing_data = self.prediction_service.get_housing_data(form, request_timer=request_timer)
+        return housing_data, self.prediction_service.predict(housing_data, request_timer=request_timer)
+
+    def _predict_batch(self, body: bytes, content_type: str, request_timer):
+        try:
+            with request_timer.stage("parse"):
+                if content_type.startswith("text/csv"):
+                    housing_batch_data = self.prediction_service.get_batch_from_csv(io.BytesIO(body))
+                else:
+                    housing_batch_data = self.prediction_service.get_batch_from_records(json.loads(body))
+        except Exception as e:
+            logging.info(e)
+            return {"error": get_validation_error_message(e, "Batch could not be parsed")}, 400
+        return self.prediction_service.predict_batch(housing_batch_data, request_timer=request_timer)
+
+    async def handle_lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await self.executor.run(self.prediction_service.housing_predictor.warm_up)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.executor.shutdown(wait=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def handle_http(self, scope, receive, send):
+        path, method = scope["path"], scope["method"]
+        headers = {key.decode().lower(): value.decode() for key, value in scope.get("headers", [])}
+
+        if path == "/predict" and method == "GET":
+            return await self.send_template(send, "predict.html", path,
+                                            self.prediction_service.get_predict_context())
+
+        if path == "/predict" and method == "POST":
+            body = await self.read_body(receive)
+            if self.executor.is_full():
+                return await self.send_response(send, 503, b"Server is busy, please retry.", "text/plain")
+            request_timer = self.prediction_service.metrics.start_request("predict")
+            housing_data, housing_prediction = await self.executor.run(self._predict_form, body, request_timer)
+            if housing_prediction is None:
+                request_timer.finish(status="busy")
+                return await self.send_response(send, 503, b"Server is busy, please retry.", "text/plain")
+            context = self.prediction_service.get_predict_context(housing_data=housing_data,
+                                                                  housing_prediction=housing_prediction)
+            with request_timer.stage("render"):
+                await self.send_template(send, "predict.html", path, context)
+            request_timer.finish(model_version=housing_prediction.model_version)
+            return
+
+        if path == "/predict_batch" and method == "POST":
+            body = await self.read_body(receive)
+            if self.executor.is_full():
+                return await self.send_json(send, {"error": "Server is busy, please retry."}, 503)
+            request_timer = self.prediction_service.metrics.start_request("predict_batch")
+            response, status = await self.executor.run(self._predict_batch, body,
+                                                       headers.get("content-type", "application/json"),
+                                                       request_timer)
+            request_timer.finish(model_version=response.get(MODEL_VERSION_KEY),
+                                 status="ok" if status == 200 else str(status))
+            return await self.send_json(send, response, status)
+
+        if path == "/ready" and method == "GET":
+            response, status = await self.executor.run(self.prediction_service.get_readiness)
+            return await self.send_json(send, response, status)
+
+        if path == "/serving_metrics" and method == "GET":
+            return await self.send_json(send, {**self.prediction_service.get_metrics(),
+                                               "asgi_executor": {"pending": self.executor.pending,
+                                                                 "max_pending": self.executor.max_pending}})
+
+        if path == "/metrics" and method == "GET":
+            return await self.send_response(send, 200, self.prediction_service.get_prometheus_metrics().encode(),
+                                            "text/plain; version=0.0.4")
+
+        await self.send_response(send, 404, b"Not Found", "text/plain")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.handle_lifespan(receive, send)
+        if scope["type"] != "http":
+            return
+        try:
+            await self.handle_http(scope, receive, send)
+        except Exception as e:
+            logging.info(f"Request to [{scope['path']}] failed: {e}")
+            await self.send_response(send, 500, b"Internal Server Error", "text/plain")
+
+
+def create_app() -> HousingAsgiApp:
+    serving_config = Configuration().get_serving_config()
+    return HousingAsgiApp(prediction_service=PredictionService(serving_config=serving_config),
+                          executor_workers=serving_config.asgi_executor_workers,
+                          max_pending=serving_config.asgi_max_pending)
+
+
+application = create_app()
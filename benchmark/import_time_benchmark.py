@@ -0,0 +1,90 @@
+"""
+Cold start import time of the serving entry points measured with python -X importtime, each run in a fresh interpreter.
+Fails with exit code 1 when an entry point takes longer than the budget (import_time_budget_ms in serving_config)
+or imports a training only module.
+
+usage: python benchmark/import_time_benchmark.py [--modules app,asgi] [--repeat 5] [--budget-ms 1500] [--top 15]
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import subprocess
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+# modules the prediction path must not import at startup
+TRAINING_ONLY_MODULES = ("sklearn", "matplotlib", "pip", "evidently", "housing.pipeline.pipeline",
+                         "housing.component", "housing.entity.model_factory")
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)$")
+
+
+def measure_import(module_name: str) -> dict:
+    """
+    return: wall time of the interpreter, summed cumulative import time of the top level imports
+    and self time of every imported module, in milliseconds
+    """
+    start_time = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+                               cwd=ROOT_DIR, capture_output=True, text=True)
+    wall_ms = 1000 * (time.perf_counter() - start_time)
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module_name} failed:\n{completed.stderr[-2000:]}")
+
+    import_ms, module_self_ms = 0.0, dict()
+    for line in completed.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, imported_module = match.groups()
+        module_self_ms[imported_module] = int(self_us) / 1000
+        # top level imports are indented by a single space, nested ones by two more per level
+        if len(indent) == 1:
+            import_ms += int(cumulative_us) / 1000
+    return {"wall_ms": wall_ms, "import_ms": import_ms, "module_self_ms": module_self_ms}
+
+
+def get_budget_ms() -> float:
+    from housing.config.configuration import Configuration
+    return Configuration().get_serving_config().import_time_budget_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", default="app,asgi")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    budget_ms = args.budget_ms if args.budget_ms is not None else get_budget_ms()
+    failures = []
+    print(f"budget {budget_ms:.0f} ms, best of {args.repeat}")
+    print(f"{'module':<16}{'import ms':>12}{'wall ms':>12}")
+    for module_name in args.modules.split(","):
+        results = [measure_import(module_name) for _ in range(args.repeat)]
+        best = min(results, key=lambda result: result["import_ms"])
+        print(f"{module_name:<16}{best['import_ms']:>12.1f}{min(r['wall_ms'] for r in results):>12.1f}")
+
+        slowest = sorted(best["module_self_ms"].items(), key=lambda item: item[1], reverse=True)[:args.top]
+        for imported_module, self_ms in slowest:
+            print(f"{'':<4}{imported_module:<50}{self_ms:>8.1f}")
+
+        training_modules = sorted(imported_module for imported_module in best["module_self_ms"]
+                                  if any(imported_module == training_module
+                                         or imported_module.startswith(f"{training_module}.")
+                                         for training_module in TRAINING_ONLY_MODULES))
+        if len(training_modules) > 0:
+            failures.append(f"{module_name} imports training only modules: {training_modules[:10]}")
+        if best["import_ms"] > budget_ms:
+            failures.append(f"{module_name} imports in {best['import_ms']:.1f} ms, budget is {budget_ms:.0f} ms")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if len(failures) > 0 else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Throughput of DataIngestion.split_data_as_train_test for each worker count on synthetic raw shards
+with the housing schema.
+
+usage: python benchmark/ingestion_benchmark.py --size-gb 2 --shards 16 --workers 1,2,4,8 [--data-dir /tmp/housing_raw]
+The shards are generated once into --data-dir and reused by later runs with the same size and shard count.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from housing.constant import ROOT_DIR, CONFIG_DIR, SCHEMA_FILE
+from housing.entity.config_entity import DataIngestionConfig
+from housing.component.data_ingestion import DataIngestion
+
+# average size of a csv row of the housing dataset
+BYTES_PER_ROW = 80
+OCEAN_PROXIMITY = np.array(["<1H OCEAN", "INLAND", "ISLAND", "NEAR BAY", "NEAR OCEAN"])
+
+
+def write_shard(file_path: str, n_rows: int, seed: int, chunk_size: int = 500000):
+    random_generator = np.random.default_rng(seed)
+    with open(file_path, "w", newline="") as file_obj:
+        for start in range(0, n_rows, chunk_size):
+            size = min(chunk_size, n_rows - start)
+            shard_df = pd.DataFrame({
+                "longitude": random_generator.uniform(-124.3, -114.3, size).round(2),
+                "latitude": random_generator.uniform(32.5, 42.0, size).round(2),
+                "housing_median_age": random_generator.integers(1, 52, size).astype(float),
+                "total_rooms": random_generator.integers(2, 39320, size).astype(float),
+                "total_bedrooms": random_generator.integers(1, 6445, size).astype(float),
+                "population": random_generator.integers(3, 35682, size).astype(float),
+                "households": random_generator.integers(1, 6082, size).astype(float),
+                "median_income": random_generator.gamma(4.0, 1.0, size).round(4),
+                "median_house_value": random_generator.uniform(14999, 500001, size).round(0),
+                "ocean_proximity": OCEAN_PROXIMITY[random_generator.integers(0, len(OCEAN_PROXIMITY), size)],
+            })
+            shard_df.to_csv(file_obj, index=False, header=start == 0)
+
+
+def generate_data(data_dir: str, size_gb: float, n_shards: int) -> int:
+    n_rows = int(size_gb * (1 << 30) / BYTES_PER_ROW)
+    rows_per_shard = n_rows // n_shards
+    os.makedirs(data_dir, exist_ok=True)
+    for shard_index in range(n_shards):
+        file_path = os.path.join(data_dir, f"housing-{shard_index:05d}.csv")
+        if not os.path.exists(file_path):
+            write_shard(file_path, rows_per_shard, seed=shard_index)
+    return rows_per_shard * n_shards
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-gb", type=float, default=2.0)
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "housing_raw_benchmark"))
+    args = parser.parse_args()
+
+    data_dir = os.path.join(args.data_dir, f"{args.size_gb}gb_{args.shards}shards")
+    n_rows = generate_data(data_dir, args.size_gb, args.shards)
+    size_mb = sum(os.path.getsize(os.path.join(data_dir, file_name)) for file_name in os.listdir(data_dir)) / (1 << 20)
+    print(f"{n_rows} rows, {size_mb:.0f} MB in {args.shards} shards, chunks of {args.chunk_size} rows")
+    print(f"{'workers':>8}{'seconds':>10}{'rows/sec':>14}{'MB/sec':>10}")
+
+    for workers in [int(value) for value in args.workers.split(",")]:
+        with tempfile.TemporaryDirectory() as output_dir:
+            data_ingestion_config = DataIngestionConfig(dataset_download_url=None,
+                                                        tgz_download_dir=None,
+                                                        raw_data_dir=None,
+                                                        ingested_train_dir=os.path.join(output_dir, "train"),
+                                                        ingested_test_dir=os.path.join(output_dir, "test"),
+                                                        raw_data_path=data_dir,
+                                                        schema_file_path=os.path.join(ROOT_DIR, CONFIG_DIR,
+                                                                                      SCHEMA_FILE),
+                                                        chunk_size=args.chunk_size,
+                                                        workers=workers,
+                                                        split_seed=1,
+                                                        split_key_columns=None,
+                                                        split_tolerance=0.005)
+            start_time = time.perf_counter()
+            DataIngestion(data_ingestion_config=data_ingestion_config).initiate_data_ingestion()
+            seconds = time.perf_counter() - start_time
+        print(f"{workers:>8}{seconds:>10.1f}{n_rows / seconds:>14.0f}{size_mb / seconds:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Compares the dill pickled model with the memory mapped compact model of the latest version in saved_models.
+Every worker is a fresh process that loads the model and predicts a sample, all workers stay alive
+together so that the proportional set size (pss) shows how much memory is really shared.
+
+usage: python benchmark/model_load_benchmark.py --model-dir saved_models --workers 4
+Linux only, memory figures are read from /proc/self/smaps_rollup.
+"""
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from housing.constant import COMPACT_MODEL_FILE_NAME
+
+
+def read_memory_kb() -> dict:
+    memory = dict()
+    with open("/proc/self/smaps_rollup") as smaps_file:
+        for line in smaps_file:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                memory[parts[0].rstrip(":")] = int(parts[1])
+    memory["Private"] = memory.get("Private_Clean", 0) + memory.get("Private_Dirty", 0)
+    return memory
+
+
+def run_worker(model_path: str, barrier, result_queue):
+    from housing.entity.housing_predictor import ResidentModel
+    import pandas as pd
+
+    before = read_memory_kb()
+    start_time = time.perf_counter()
+    model = ResidentModel.load_model(model_path=model_path)
+    load_seconds = time.perf_counter() - start_time
+
+    compiled_preprocessor = getattr(model, "compiled_preprocessor", None)
+    if compiled_preprocessor is not None:
+        sample_df = compiled_preprocessor.get_sample_data_frame(n_rows=1000)
+        model.predict(sample_df)
+
+    # wait until every worker holds its model so shared pages are split between all of them
+    barrier.wait()
+    after = read_memory_kb()
+    barrier.wait()
+    result_queue.put({
+        "load_seconds": load_seconds,
+        "rss_mb": (after["Rss"] - before["Rss"]) / 1024,
+        "pss_mb": (after["Pss"] - before["Pss"]) / 1024,
+        "private_mb": (after["Private"] - before["Private"]) / 1024,
+    })
+
+
+def benchmark(model_path: str, workers: int) -> dict:
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers)
+    result_queue = context.Queue()
+    processes = [context.Process(target=run_worker, args=(model_path, barrier, result_queue))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    results = [result_queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return {key: sum(result[key] for result in results) / workers for key in results[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default="saved_models")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    model_versions = [folder_name for folder_name in os.listdir(args.model_dir) if folder_name.isdigit()]
+    model_version_dir = os.path.join(args.model_dir, max(model_versions, key=int))
+    file_names = os.listdir(model_version_dir)
+    model_paths = {
+        "dill": os.path.join(model_version_dir, [name for name in file_names if name != COMPACT_MODEL_FILE_NAME][0]),
+    }
+    if COMPACT_MODEL_FILE_NAME in file_names:
+        model_paths["compact"] = os.path.join(model_version_dir, COMPACT_MODEL_FILE_NAME)
+
+    print(f"model version dir: {model_version_dir}, workers: {args.workers}")
+    print(f"{'format':<10}{'file MB':>10}{'load s':>10}{'rss MB':>10}{'pss MB':>10}{'private MB':>12}")
+    for model_format, model_path in model_paths.items():
+        result = benchmark(model_path=model_path, workers=args.workers)
+        print(f"{model_format:<10}{os.path.getsize(model_path) / 2 ** 20:>10.2f}{result['load_seconds']:>10.4f}"
+              f"{result['rss_mb']:>10.2f}{result['pss_mb']:>10.2f}{result['private_mb']:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
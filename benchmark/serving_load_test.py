@@ -0,0 +1,108 @@
+"""
+Load test of the gunicorn serving entry point.
+For every worker count a gunicorn server is started with wsgi:application, the script waits for /ready
+and then keeps --concurrency connections posting the /predict form for --duration seconds.
+
+usage: python benchmark/serving_load_test.py --workers 1,2,4,8 --threads 4 --concurrency 64 --duration 20
+A model must already be exported in saved_models.
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+import http.client
+import urllib.parse
+from threading import Thread
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PREDICT_FORM = urllib.parse.urlencode({
+    "longitude": -122.23,
+    "latitude": 37.88,
+    "housing_median_age": 41.0,
+    "total_rooms": 880.0,
+    "total_bedrooms": 129.0,
+    "population": 322.0,
+    "households": 126.0,
+    "median_income": 8.3252,
+    "ocean_proximity": "NEAR BAY",
+})
+
+
+def wait_until_ready(port: int, timeout: float = 120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            connection.request("GET", "/ready")
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise Exception(f"Server on port [{port}] did not become ready in [{timeout}] seconds")
+
+
+def run_client(port: int, deadline: float, latencies: list, errors: list):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    while time.monotonic() < deadline:
+        start_time = time.perf_counter()
+        try:
+            connection.request("POST", "/predict", body=PREDICT_FORM, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+        except OSError as e:
+            errors.append(str(e))
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start_time)
+
+
+def load_test(port: int, concurrency: int, duration: float) -> dict:
+    latencies, errors = [], []
+    deadline = time.monotonic() + duration
+    clients = [Thread(target=run_client, args=(port, deadline, latencies, errors)) for _ in range(concurrency)]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    latencies.sort()
+    percentile = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else 0
+    return {"requests_per_sec": len(latencies) / duration, "p50_ms": percentile(0.50),
+            "p99_ms": percentile(0.99), "errors": len(errors)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--port", type=int, default=8089)
+    args = parser.parse_args()
+
+    print(f"threads per worker: {args.threads}, concurrency: {args.concurrency}, duration: {args.duration}s")
+    print(f"{'workers':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for workers in [int(workers) for workers in args.workers.split(",")]:
+        env = dict(os.environ, PORT=str(args.port), GUNICORN_WORKERS=str(workers),
+                   GUNICORN_THREADS=str(args.threads))
+        server = subprocess.Popen([sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py",
+                                   "wsgi:application"], cwd=ROOT_DIR, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_ready(args.port)
+            result = load_test(port=args.port, concurrency=args.concurrency, duration=args.duration)
+            print(f"{workers:>8}{result['requests_per_sec']:>10.1f}{result['p50_ms']:>10.2f}"
+                  f"{result['p99_ms']:>10.2f}{result['errors']:>8}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
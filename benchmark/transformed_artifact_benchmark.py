@@ -0,0 +1,88 @@
+"""
+Write+read time and file size of a transformed train array stored as csv (previous format), .npy and float32 .npy.
+The array is synthetic with the layout of the transformed housing data: scaled numerical columns,
+one hot columns and the target.
+
+usage: python benchmark/transformed_artifact_benchmark.py --rows 20640 --repeat 5
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from housing.util.util import save_numpy_array_data, load_numpy_array_data
+
+
+def get_transformed_array(n_rows: int, n_numerical: int = 8, n_categories: int = 5) -> np.ndarray:
+    random_generator = np.random.default_rng(42)
+    numerical = random_generator.standard_normal((n_rows, n_numerical))
+    one_hot = np.zeros((n_rows, n_categories))
+    one_hot[np.arange(n_rows), random_generator.integers(0, n_categories, n_rows)] = 2.5
+    target = random_generator.uniform(15000, 500000, (n_rows, 1))
+    return np.c_[numerical, one_hot, target]
+
+
+def write_csv(file_path: str, array: np.ndarray):
+    pd.DataFrame(array).to_csv(file_path, index=False)
+
+
+def read_csv(file_path: str) -> np.ndarray:
+    data = pd.read_csv(file_path)
+    return data.iloc[:, :-1].to_numpy(), data.iloc[:, -1].to_numpy()
+
+
+def write_npy(file_path: str, array: np.ndarray):
+    save_numpy_array_data(file_path=file_path, array=array,
+                          column_names=[f"feature_{index}" for index in range(array.shape[1])])
+
+
+def read_npy(file_path: str):
+    array = load_numpy_array_data(file_path=file_path, mmap_mode="r")
+    # touch every value so the memory mapped read is measured too
+    features, target = array[:, :-1], array[:, -1]
+    features.sum(), target.sum()
+    return features, target
+
+
+def measure(write, read, file_path: str, array: np.ndarray, repeat: int) -> dict:
+    write_seconds, read_seconds = [], []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        write(file_path, array)
+        write_seconds.append(time.perf_counter() - start_time)
+        start_time = time.perf_counter()
+        read(file_path)
+        read_seconds.append(time.perf_counter() - start_time)
+    return {"write_ms": 1000 * min(write_seconds), "read_ms": 1000 * min(read_seconds),
+            "size_kb": os.path.getsize(file_path) / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20640)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    array = get_transformed_array(args.rows)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results = {
+            "csv": measure(write_csv, read_csv, os.path.join(tmp_dir, "train.csv"), array, args.repeat),
+            "npy float64": measure(write_npy, read_npy, os.path.join(tmp_dir, "train64.npy"), array, args.repeat),
+            "npy float32": measure(write_npy, read_npy, os.path.join(tmp_dir, "train32.npy"),
+                                   array.astype(np.float32), args.repeat),
+        }
+
+    print(f"{args.rows} rows x {array.shape[1]} columns, best of {args.repeat}")
+    print(f"{'format':<14}{'write ms':>12}{'read ms':>12}{'size kb':>12}")
+    for name, result in results.items():
+        print(f"{name:<14}{result['write_ms']:>12.1f}{result['read_ms']:>12.1f}{result['size_kb']:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+#!/bin/bash
+# Runs gunicorn and the training job runner side by side. When either of them exits the other one is
+# stopped and the container exits with its status, so that the container restart policy brings both back.
+python -m housing.pipeline.training_job_queue &
+runner_pid=$!
+gunicorn --config gunicorn.conf.py wsgi:application &
+gunicorn_pid=$!
+
+trap 'kill -TERM $runner_pid $gunicorn_pid 2>/dev/null' TERM INT
+
+wait -n
+status=$?
+if ! kill -0 $runner_pid 2>/dev/null; then
+    echo "training job runner exited with status [$status], stopping the container" >&2
+elif ! kill -0 $gunicorn_pid 2>/dev/null; then
+    echo "gunicorn exited with status [$status], stopping the container" >&2
+fi
+kill -TERM $runner_pid $gunicorn_pid 2>/dev/null
+wait
+exit $status
@@ -0,0 +1,24 @@
+import gc
+import os
+
+from housing.config.configuration import Configuration
+
+serving_config = Configuration().get_serving_config()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+preload_app = True
+
+workers = int(os.environ.get("GUNICORN_WORKERS", serving_config.workers))
+threads = int(os.environ.get("GUNICORN_THREADS", serving_config.threads))
+
+# workers are recycled after max_requests (+ jitter so they do not restart together)
+# and get graceful_timeout seconds to finish in-flight requests
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", serving_config.max_requests))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", serving_config.max_requests_jitter))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", serving_config.graceful_timeout))
+
+
+def pre_fork(server, worker):
+    # objects loaded by the master are moved out of the gc generations so that
+    # garbage collection in the workers does not write to, and copy, the shared pages
+    gc.freeze()
@@ -1,5 +1,10 @@
 import sys,os
+import io
+import time
+import shutil
 import tarfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from six.moves import urllib
 import pandas as pd
 import numpy as np
@@ -8,8 +13,149 @@ from housing.logger import logging
 from housing.exception import HousingException
 from housing.entity.config_entity import DataIngestionConfig
 from housing.entity.artifact_entity import DataIngestionArtifact
-
-from sklearn.model_selection import StratifiedShuffleSplit
+from housing.util.util import read_yaml_file
+from housing.constant import *
+
+INCOME_CATEGORY_COLUMN = "median_income"
+INCOME_CATEGORY_BINS = [0.0,1.5,3.0,4.5,6.0,np.inf]
+# income category given to rows without median_income
+MISSING_INCOME_CATEGORY = -1
+TEST_SIZE = 0.2
+INGESTION_PART_DIR_NAME = "parts"
+# rows whose hash falls below this share of the hash range go to test
+SPLIT_HASH_BITS = 16
+TEST_HASH_THRESHOLD = int(TEST_SIZE*(1<<SPLIT_HASH_BITS))
+# test share gaps within this many binomial standard errors are not reported
+SPLIT_NOISE_STANDARD_ERRORS = 3
+# uncompressed raw files are cut into byte ranges parsed by separate workers, about this many ranges
+# per worker so that a slow range does not hold up the others, none smaller than MIN_RAW_FILE_RANGE_BYTES
+RAW_FILE_RANGES_PER_WORKER = 4
+MIN_RAW_FILE_RANGE_BYTES = 1<<20
+
+# start and end are None for a compressed file, which is read whole
+RawFileRange = namedtuple("RawFileRange",["file_path","start","end"])
+
+
+class RawFileRangeReader(io.RawIOBase):
+    """
+    Bytes [start, end) of a file, read by pandas as a csv without header
+    """
+
+    def __init__(self,file_path:str,start:int,end:int):
+        self.file_obj=open(file_path,"rb")
+        self.file_obj.seek(start)
+        self.remaining_bytes=end-start
+
+    def readable(self)->bool:
+        return True
+
+    def readinto(self,buffer)->int:
+        data=self.file_obj.read(min(len(buffer),self.remaining_bytes))
+        buffer[:len(data)]=data
+        self.remaining_bytes-=len(data)
+        return len(data)
+
+    def close(self):
+        self.file_obj.close()
+        super().close()
+
+
+def get_raw_file_ranges(raw_file_path:str,range_bytes:int)->list:
+    """
+    Cuts the rows of an uncompressed csv file after its header into ranges of about range_bytes,
+    each ending right after a line break. Fields holding quoted line breaks are not supported.
+    return: list of RawFileRange in file order
+    """
+    if not raw_file_path.endswith(".csv"):
+        return [RawFileRange(file_path=raw_file_path,start=None,end=None)]
+    with open(raw_file_path,"rb") as raw_file:
+        raw_file.readline()
+        boundaries=[raw_file.tell()]
+        file_size=os.fstat(raw_file.fileno()).st_size
+        while boundaries[-1]+range_bytes<file_size:
+            # the line holding the byte before the cut ends the range
+            raw_file.seek(boundaries[-1]+range_bytes-1)
+            raw_file.readline()
+            if raw_file.tell()>=file_size:
+                break
+            boundaries.append(raw_file.tell())
+    boundaries.append(max(file_size,boundaries[-1]))
+    return [RawFileRange(file_path=raw_file_path,start=start,end=end)
+            for start,end in zip(boundaries[:-1],boundaries[1:])]
+
+
+def read_raw_file_range(raw_file_range:RawFileRange,dtype:dict,chunk_size:int):
+    """
+    return: iterator over data frame chunks of chunk_size rows of the range
+    """
+    if raw_file_range.start is None:
+        return pd.read_csv(raw_file_range.file_path,chunksize=chunk_size,dtype=dtype)
+    if raw_file_range.start==raw_file_range.end:
+        return iter([])
+    file_column_names=list(pd.read_csv(raw_file_range.file_path,nrows=0).columns)
+    range_file=io.BufferedReader(RawFileRangeReader(raw_file_range.file_path,start=raw_file_range.start,
+                                                    end=raw_file_range.end))
+    return pd.read_csv(range_file,header=None,names=file_column_names,chunksize=chunk_size,dtype=dtype)
+
+
+def get_split_hash_key(split_seed:int)->str:
+    # pandas row hashing takes a 16 character key
+    return f"{int(split_seed):016d}"[-16:]
+
+
+def get_income_category(chunk_df:pd.DataFrame)->np.ndarray:
+    income_category=pd.cut(chunk_df[INCOME_CATEGORY_COLUMN],bins=INCOME_CATEGORY_BINS,labels=False)
+    return income_category.fillna(MISSING_INCOME_CATEGORY).astype(np.int64).to_numpy()
+
+
+def get_hash_bucket(chunk_df:pd.DataFrame,key_columns:list,split_seed:int)->np.ndarray:
+    """
+    Bucket in [0, 2**SPLIT_HASH_BITS) of a seeded hash of the key columns of every row,
+    it depends on the row alone whatever the shard order or chunk size.
+    """
+    row_hash=pd.util.hash_pandas_object(chunk_df[key_columns],index=False,
+                                        hash_key=get_split_hash_key(split_seed)).to_numpy()
+    return (row_hash>>np.uint64(64-SPLIT_HASH_BITS)).astype(np.int64)
+
+
+def split_chunk(chunk_df:pd.DataFrame,key_columns:list,split_seed:int)->tuple:
+    """
+    A row goes to test when its hash bucket is below TEST_HASH_THRESHOLD. The hash does not depend on
+    the income category, so every category gets a TEST_SIZE share up to sampling noise, and identical
+    rows always land on the same side.
+    return: train data frame, test data frame, income category and test flag of every row
+    """
+    income_category=get_income_category(chunk_df)
+    is_test=get_hash_bucket(chunk_df,key_columns=key_columns,split_seed=split_seed)<TEST_HASH_THRESHOLD
+    return chunk_df[~is_test],chunk_df[is_test],income_category,is_test
+
+
+def ingest_raw_file_range(raw_file_range:RawFileRange,train_part_file_path:str,test_part_file_path:str,
+                          column_names:list,key_columns:list,dtype:dict,chunk_size:int,split_seed:int)->dict:
+    """
+    Runs in an ingestion worker, writes the train and test rows of one range of a shard to its part files.
+    return: {income category: [train rows, test rows]}
+    """
+    category_counts=dict()
+    with open(train_part_file_path,"w",newline="") as train_file, \
+            open(test_part_file_path,"w",newline="") as test_file:
+        # header is written even for an empty range so that part files can be merged blindly
+        pd.DataFrame(columns=column_names).to_csv(train_file,index=False)
+        pd.DataFrame(columns=column_names).to_csv(test_file,index=False)
+        for chunk_df in read_raw_file_range(raw_file_range,dtype=dtype,chunk_size=chunk_size):
+            train_df,test_df,income_category,is_test=split_chunk(chunk_df[column_names],key_columns=key_columns,
+                                                                 split_seed=split_seed)
+            train_df.to_csv(train_file,index=False,header=False)
+            test_df.to_csv(test_file,index=False,header=False)
+            for category in np.unique(income_category):
+                category_mask=income_category==category
+                counts=category_counts.setdefault(int(category),[0,0])
+                counts[1]+=int(np.count_nonzero(is_test[category_mask]))
+                counts[0]+=int(np.count_nonzero(category_mask))-int(np.count_nonzero(is_test[category_mask]))
+    range_text="" if raw_file_range.start is None else f" bytes [{raw_file_range.start}, {raw_file_range.end})"
+    logging.info(f"Ingested shard: [{raw_file_range.file_path}]{range_text}, "
+                 f"train and test rows per income category: {category_counts}")
+    return category_counts
 
 
 class DataIngestion:
@@ -62,47 +208,145 @@ class DataIngestion:
             raise HousingException(e,sys) from e 
         
 
-    def split_data_as_train_test(self)->DataIngestionArtifact:
+    def get_raw_file_paths(self,raw_data_path:str)->list:
+        """
+        raw_data_path: a csv file or a directory searched recursively for csv shards
+        return: shard file paths in sorted order
+        """
         try:
-            raw_data_dir=self.data_ingestion_config.raw_data_dir
-
-            file_name=os.listdir(raw_data_dir)[0]
-
-            file_path=os.path.join(raw_data_dir,file_name)
-
-            logging.info(f'Reading csv file: [{file_path}]')
-
-            housing_data_frame=pd.read_csv(file_path)
-
-            housing_data_frame['income_cat']=pd.cut(
-                housing_data_frame['median_income'],
-                bins=[0.0,1.5,3.0,4.5,6.0,np.inf],
-                labels=[1,2,3,4,5]
-            )
-
-            strat_train_set=None
-            strat_test_set=None
+            if os.path.isfile(raw_data_path):
+                return [raw_data_path]
+            raw_file_paths=[]
+            for dir_path,_,file_names in os.walk(raw_data_path):
+                raw_file_paths.extend(os.path.join(dir_path,file_name) for file_name in file_names
+                                      if file_name.endswith(RAW_DATA_FILE_EXTENSIONS))
+            if len(raw_file_paths)==0:
+                raise Exception(f"No csv file found in: [{raw_data_path}]")
+            return sorted(raw_file_paths)
+        except Exception as e:
+            raise HousingException(e,sys) from e
 
-            split=StratifiedShuffleSplit(n_splits=1, test_size=0.2, random_state=1)
 
-            logging.info('Splitting data into train and test')
+    def get_column_names(self,raw_file_paths:list)->list:
+        """
+        return: header of the first shard, every shard has to have the same columns
+        """
+        try:
+            column_names=list(pd.read_csv(raw_file_paths[0],nrows=0).columns)
+            for raw_file_path in raw_file_paths[1:]:
+                shard_column_names=list(pd.read_csv(raw_file_path,nrows=0).columns)
+                if set(shard_column_names)!=set(column_names):
+                    raise Exception(f"Columns of shard: [{raw_file_path}] {shard_column_names} "
+                                    f"differ from {column_names}")
+            return column_names
+        except Exception as e:
+            raise HousingException(e,sys) from e
 
-            for train_idx,test_idx in split.split(housing_data_frame,housing_data_frame['income_cat']):
-                strat_train_set=housing_data_frame.loc[train_idx].drop(['income_cat'],axis=1)
-                strat_test_set=housing_data_frame.loc[test_idx].drop(['income_cat'],axis=1)
 
-            train_file_path=os.path.join(self.data_ingestion_config.ingested_train_dir,file_name)
-            test_file_path=os.path.join(self.data_ingestion_config.ingested_test_dir,file_name)
+    @staticmethod
+    def merge_part_files(part_file_paths:list,file_path:str):
+        """
+        Concatenates csv part files written with the same header, keeping only the first header
+        """
+        try:
+            os.makedirs(os.path.dirname(file_path),exist_ok=True)
+            with open(file_path,"w",newline="") as output_file:
+                for part_index,part_file_path in enumerate(part_file_paths):
+                    with open(part_file_path,newline="") as part_file:
+                        header=part_file.readline()
+                        if part_index==0:
+                            output_file.write(header)
+                        shutil.copyfileobj(part_file,output_file)
+        except Exception as e:
+            raise HousingException(e,sys) from e
 
-            if strat_train_set is not None:
-                os.makedirs(self.data_ingestion_config.ingested_train_dir)
-                logging.info(f"Exporting train dataset to filepath: [{train_file_path}]")
-                strat_train_set.to_csv(train_file_path,index=False)
 
-            if strat_test_set is not None:
-                os.makedirs(self.data_ingestion_config.ingested_test_dir)
-                logging.info(f"Exporting test dataset to filepath: [{test_file_path}]")
-                strat_test_set.to_csv(test_file_path,index=False)
+    def split_data_as_train_test(self,raw_data_path:str=None)->DataIngestionArtifact:
+        """
+        Uncompressed shards are cut into byte ranges so that a single large file is parsed by every worker,
+        compressed ones are parsed whole. Each range is read in chunks of chunk_size rows with the schema dtypes
+        in a single pass: each chunk is split with split_chunk and appended to per range part files
+        that are merged in file order at the end. At most workers * chunk_size rows are held in memory.
+        """
+        try:
+            raw_data_path=raw_data_path or self.data_ingestion_config.raw_data_dir
+            raw_file_paths=self.get_raw_file_paths(raw_data_path)
+            column_names=self.get_column_names(raw_file_paths)
+
+            dataset_schema=read_yaml_file(self.data_ingestion_config.schema_file_path)
+            dtype={column:column_type for column,column_type in dataset_schema[DATASET_SCHEMA_COLUMNS_KEY].items()
+                   if column in column_names}
+
+            chunk_size=self.data_ingestion_config.chunk_size
+            workers=self.data_ingestion_config.workers or os.cpu_count()
+            total_bytes=sum(os.path.getsize(raw_file_path) for raw_file_path in raw_file_paths)
+            range_bytes=max(MIN_RAW_FILE_RANGE_BYTES,total_bytes//(workers*RAW_FILE_RANGES_PER_WORKER))
+            raw_file_ranges=[raw_file_range for raw_file_path in raw_file_paths
+                             for raw_file_range in get_raw_file_ranges(raw_file_path,range_bytes=range_bytes)]
+            workers=min(workers,len(raw_file_ranges))
+            logging.info(f"Ingesting [{len(raw_file_paths)}] raw files in [{len(raw_file_ranges)}] ranges from: "
+                         f"[{raw_data_path}] with [{workers}] workers in chunks of [{chunk_size}] rows")
+
+            ingested_train_dir=self.data_ingestion_config.ingested_train_dir
+            ingested_test_dir=self.data_ingestion_config.ingested_test_dir
+            train_part_dir=os.path.join(ingested_train_dir,INGESTION_PART_DIR_NAME)
+            test_part_dir=os.path.join(ingested_test_dir,INGESTION_PART_DIR_NAME)
+            os.makedirs(train_part_dir,exist_ok=True)
+            os.makedirs(test_part_dir,exist_ok=True)
+
+            part_file_name="part-{:05d}.csv"
+            train_part_file_paths=[os.path.join(train_part_dir,part_file_name.format(range_index))
+                                   for range_index in range(len(raw_file_ranges))]
+            test_part_file_paths=[os.path.join(test_part_dir,part_file_name.format(range_index))
+                                  for range_index in range(len(raw_file_ranges))]
+
+            start_time=time.perf_counter()
+            key_columns=self.data_ingestion_config.split_key_columns or column_names
+            split_seed=self.data_ingestion_config.split_seed
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures=[executor.submit(ingest_raw_file_range,raw_file_range,
+                                         train_part_file_paths[range_index],test_part_file_paths[range_index],
+                                         column_names,key_columns,dtype,chunk_size,split_seed)
+                         for range_index,raw_file_range in enumerate(raw_file_ranges)]
+                category_counts=dict()
+                for future in futures:
+                    for category,(n_category_train_rows,n_category_test_rows) in future.result().items():
+                        counts=category_counts.setdefault(category,[0,0])
+                        counts[0]+=n_category_train_rows
+                        counts[1]+=n_category_test_rows
+
+            train_file_path=os.path.join(ingested_train_dir,INGESTED_FILE_NAME)
+            test_file_path=os.path.join(ingested_test_dir,INGESTED_FILE_NAME)
+
+            logging.info(f"Exporting train dataset to filepath: [{train_file_path}]")
+            DataIngestion.merge_part_files(train_part_file_paths,train_file_path)
+            logging.info(f"Exporting test dataset to filepath: [{test_file_path}]")
+            DataIngestion.merge_part_files(test_part_file_paths,test_file_path)
+            shutil.rmtree(train_part_dir)
+            shutil.rmtree(test_part_dir)
+
+            n_train_rows=sum(counts[0] for counts in category_counts.values())
+            n_test_rows=sum(counts[1] for counts in category_counts.values())
+            split_tolerance=self.data_ingestion_config.split_tolerance
+            unbalanced_categories=[]
+            for category,(n_category_train_rows,n_category_test_rows) in sorted(category_counts.items()):
+                n_category_rows=n_category_train_rows+n_category_test_rows
+                logging.info(f"Income category [{category}]: [{n_category_train_rows}] train, "
+                             f"[{n_category_test_rows}] test rows, test share: "
+                             f"[{n_category_test_rows/max(1,n_category_rows):.4f}]")
+                # the hash split misses TEST_SIZE by sampling noise, only a larger gap points at duplicated keys
+                sampling_noise=SPLIT_NOISE_STANDARD_ERRORS*np.sqrt(n_category_rows*TEST_SIZE*(1-TEST_SIZE))
+                if abs(n_category_test_rows-TEST_SIZE*n_category_rows)>max(split_tolerance*n_category_rows,
+                                                                         sampling_noise,1):
+                    unbalanced_categories.append(category)
+            if len(unbalanced_categories)>0:
+                # small categories and duplicated split keys move the share, the split itself stays valid
+                logging.warning(f"Test share of income categories {unbalanced_categories} is off [{TEST_SIZE}] "
+                                f"by more than split_tolerance: [{split_tolerance}], rows per category "
+                                f"[train, test]: {category_counts}")
+            elapsed_seconds=time.perf_counter()-start_time
+            logging.info(f"Ingested [{n_train_rows}] train and [{n_test_rows}] test rows in [{elapsed_seconds:.2f}] "
+                         f"seconds, [{(n_train_rows+n_test_rows)/max(elapsed_seconds,1e-9):.0f}] rows/sec")
 
             data_ingestion_artifact=DataIngestionArtifact(train_file_path=train_file_path,
                                   test_file_path=test_file_path,
@@ -117,6 +361,10 @@ class DataIngestion:
 
     def initiate_data_ingestion(self)->DataIngestionArtifact:
         try:
+            raw_data_path=self.data_ingestion_config.raw_data_path
+            if raw_data_path is not None:
+                logging.info(f"Using local raw data: [{raw_data_path}]")
+                return self.split_data_as_train_test(raw_data_path=raw_data_path)
             tgz_file_path=self.download_housing_data()
             self.extract_tgz_file(tgz_file_path=tgz_file_path)
             return self.split_data_as_train_test()
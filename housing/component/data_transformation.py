@@ -6,13 +6,14 @@ from housing.logger import logging
 from housing.exception import HousingException
 from housing.entity.config_entity import DataTransformationConfig
 from housing.entity.artifact_entity import DataIngestionArtifact,DataValidationArtifact,DataTransformationArtifact
-from housing.util.util import read_yaml_file,load_data,save_numpy_array_data,save_object
+from housing.util.util import read_yaml_file,load_data,save_numpy_array_data,save_sparse_array_data,save_object
 from housing.constant import *
 
 from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import StandardScaler,OneHotEncoder
 from sklearn.impute import SimpleImputer
+from scipy import sparse
 
 
 class DataTransformation:
@@ -51,11 +52,13 @@ class DataTransformation:
             logging.info(f"Numerical columns: {numerical_cols}")
             logging.info(f"Categorical columns: {categorical_cols}")
 
+            # output stays a sparse matrix when its density is below the threshold
             preprocessing=ColumnTransformer(
                 [
                 ('num_pipeline',num_pipeline,numerical_cols),
                 ('cat_pipeline',cat_pipeline,categorical_cols)
-                ]
+                ],
+                sparse_threshold=self.data_transformation_config.sparse_density_threshold
             )
             
             return preprocessing
@@ -64,6 +67,16 @@ class DataTransformation:
 
 
 
+    @staticmethod
+    def get_feature_names(preprocessing_obj:ColumnTransformer,n_features:int)->list:
+        try:
+            if hasattr(preprocessing_obj,"get_feature_names_out"):
+                return [str(name) for name in preprocessing_obj.get_feature_names_out()]
+            # older scikit-learn releases can not name the output columns of pipelines
+            return [f"feature_{index}" for index in range(n_features)]
+        except Exception as e:
+            raise HousingException(e,sys) from e
+
     def initiate_data_transformation(self):
         try:
             logging.info(f"Obtaining preprocessing object.")
@@ -100,28 +113,41 @@ class DataTransformation:
             input_feature_test_arr = preprocessing_obj.transform(input_feature_test_df)
 
 
-            train_arr = np.c_[ input_feature_train_arr, np.array(target_feature_train_df)]
-            test_arr = np.c_[input_feature_test_arr, np.array(target_feature_test_df)]
-
-            final_train_df=pd.DataFrame(train_arr)
-            final_test_df=pd.DataFrame(test_arr)
+            transformed_dtype = np.dtype(self.data_transformation_config.transformed_dtype)
+            is_sparse_output = sparse.issparse(input_feature_train_arr)
+            if is_sparse_output:
+                density = input_feature_train_arr.nnz / max(1, np.prod(input_feature_train_arr.shape))
+                logging.info(f"Preprocessing output is sparse with density: [{density:.4f}], keeping csr format")
+                train_arr = sparse.hstack([input_feature_train_arr, np.array(target_feature_train_df)[:, None]],
+                                          format="csr").astype(transformed_dtype)
+                test_arr = sparse.hstack([input_feature_test_arr, np.array(target_feature_test_df)[:, None]],
+                                         format="csr").astype(transformed_dtype)
+                transformed_file_extension = SPARSE_TRANSFORMED_FILE_EXTENSION
+                save_array_data = save_sparse_array_data
+            else:
+                train_arr = np.c_[input_feature_train_arr, np.array(target_feature_train_df)].astype(
+                    transformed_dtype, copy=False)
+                test_arr = np.c_[input_feature_test_arr, np.array(target_feature_test_df)].astype(
+                    transformed_dtype, copy=False)
+                transformed_file_extension = TRANSFORMED_FILE_EXTENSION
+                save_array_data = save_numpy_array_data
+
+            column_names = self.get_feature_names(preprocessing_obj,n_features=input_feature_train_arr.shape[1]) \
+                + [target_column_name]
             
             transformed_train_dir = self.data_transformation_config.transformed_train_dir
             transformed_test_dir = self.data_transformation_config.transformed_test_dir
 
-            train_file_name = os.path.basename(train_file_path)
-            test_file_name = os.path.basename(test_file_path)
+            train_file_name = os.path.splitext(os.path.basename(train_file_path))[0] + transformed_file_extension
+            test_file_name = os.path.splitext(os.path.basename(test_file_path))[0] + transformed_file_extension
 
             transformed_train_file_path = os.path.join(transformed_train_dir, train_file_name)
             transformed_test_file_path = os.path.join(transformed_test_dir, test_file_name)
 
             logging.info(f"Saving transformed training and testing array.")
 
-            os.makedirs(os.path.dirname(transformed_train_file_path),exist_ok=True)
-            os.makedirs(os.path.dirname(transformed_test_file_path),exist_ok=True)
-
-            final_train_df.to_csv(transformed_train_file_path,index=False)
-            final_test_df.to_csv(transformed_test_file_path,index=False)
+            save_array_data(transformed_train_file_path,train_arr,column_names=column_names)
+            save_array_data(transformed_test_file_path,test_arr,column_names=column_names)
         
 
             preprocessing_obj_file_path = self.data_transformation_config.preprocessed_object_file_path
@@ -1,16 +1,17 @@
 import os, sys
+import hashlib
 import pandas as pd
 import json
 
 from housing.logger import logging
 from housing.exception import HousingException
-from housing.entity.artifact_entity import DataIngestionArtifact,DataValidationArtifact
+from housing.entity.artifact_entity import DataIngestionArtifact,DataValidationArtifact,DataDriftArtifact
 from housing.entity.config_entity import DataValidationConfig
-from housing.util.util import read_yaml_file
+from housing.util.util import read_yaml_file, write_yaml_file, get_file_hash
+from housing.entity.schema_validator import SchemaValidator
+from housing.entity.drift_sketch import DatasetSketch, get_drift_report
 from housing.constant import *
 
-from evidently.report import Report
-
 class DataValidation:
     def __init__(self, data_ingestion_artifact: DataIngestionArtifact,data_validation_config:DataValidationConfig):
         try:
@@ -58,71 +59,125 @@ class DataValidation:
             raise HousingException(e,sys) from e
         
 
-    def validate_dataset_schema(self,input):
+    def validate_dataset_schema(self) -> bool:
+        """
+        Validates the train and test files against the schema chunk by chunk and saves the
+        per-rule violation counts to the schema report.
+        return: True when neither file violates a dataset level rule
+        """
         try:
-            schema_file_path=os.path.join(ROOT_DIR,CONFIG_DIR,SCHEMA_FILE)
-            schema=read_yaml_file(schema_file_path)
-            incoming_data=dict(zip(schema['numerical_columns']+schema['categorical_columns'],input))
-            domain_values=schema['domain_value']['ocean_proximity']
-            numerical_columns= schema['numerical_columns']
-            categorical_columns= schema['categorical_columns']
-            
+            schema=read_yaml_file(self.data_validation_config.schema_file_path)
+            schema_validator=SchemaValidator(schema=schema)
+
+            schema_report=dict()
             validation_status=True
-            #1. Check number of columns
-            if len(input) != 9:
-                validation_status=False
-
-            #2. Checking values of ocean proximity
-            if incoming_data['ocean_proximity'] not in domain_values:
-                validation_status=False
-
-            #3. Check for datatype
-            for key,value in incoming_data.items():
-                if key in categorical_columns:
-                    if not isinstance(value,str):
-                        validation_status=False
-                elif key in numerical_columns:
-                    if not isinstance(value,int) and not isinstance(value,float):
-                        validation_status=False
+            for dataset_name,file_path in (("train",self.data_ingestion_artifact.train_file_path),
+                                           ("test",self.data_ingestion_artifact.test_file_path)):
+                summary=schema_validator.validate_file(file_path=file_path,
+                                                       chunk_size=self.data_validation_config.chunk_size)
+                schema_report[dataset_name]={
+                    "n_rows": summary.n_rows,
+                    "n_valid_rows": summary.n_valid_rows,
+                    "rule_violations": summary.rule_violations,
+                    "null_rates": {column: float(rate) for column, rate in summary.null_rates.items()},
+                    "dataset_violations": {rule: value if isinstance(value, dict) else float(value)
+                                           for rule, value in summary.dataset_violations.items()},
+                }
+                if len(summary.dataset_violations) > 0:
+                    validation_status=False
+
+            write_yaml_file(file_path=self.data_validation_config.schema_report_file_path,data=schema_report)
             logging.info(f"Is the data valid? [{validation_status}]")
             return validation_status
         except Exception as e:
             raise HousingException(e,sys) from e
         
     
-    def get_and_save_data_drift_report(self):
+    def get_dataset_sketch(self,file_path:str)->DatasetSketch:
         try:
-            logging.info('Creating a report to check for Data drift')
-            profile=Profile(sections=[DataDriftProfileSection()])
+            schema=read_yaml_file(self.data_validation_config.schema_file_path)
+            return DatasetSketch.from_csv(file_path=file_path,
+                                          numerical_columns=schema[NUMERICAL_COLUMN_KEY]+[schema[TARGET_COLUMN_KEY]],
+                                          categorical_columns=schema[CATEGORICAL_COLUMN_KEY],
+                                          relative_accuracy=self.data_validation_config.sketch_relative_accuracy,
+                                          chunk_size=self.data_validation_config.chunk_size)
+        except Exception as e:
+            raise HousingException(e,sys) from e
 
-            train,test=self.get_train_and_test()
 
-            profile.calculate(train,test)
-            report=json.loads(profile.json())
+    def get_data_hash(self)->str:
+        """
+        sha256 of the train and test file contents, identifies the ingested data whatever run ingested it
+        """
+        try:
+            file_hashes=[get_file_hash(self.data_ingestion_artifact.train_file_path),
+                         get_file_hash(self.data_ingestion_artifact.test_file_path)]
+            return hashlib.sha256(",".join(file_hashes).encode()).hexdigest()
+        except Exception as e:
+            raise HousingException(e,sys) from e
+
+
+    def get_and_save_data_drift_report(self):
+        """
+        Compares train against test, and the ingested data against the reference sketch of every
+        previously validated dataset, then merges the ingested data into the reference sketch
+        unless the same train and test files were merged by an earlier run.
+        """
+        try:
+            logging.info('Creating a report to check for Data drift')
+            psi_threshold=self.data_validation_config.drift_psi_threshold
+
+            train_sketch=self.get_dataset_sketch(self.data_ingestion_artifact.train_file_path)
+            test_sketch=self.get_dataset_sketch(self.data_ingestion_artifact.test_file_path)
+            report={"train_test": get_drift_report(reference=train_sketch,current=test_sketch,psi_threshold=psi_threshold)}
+
+            current_sketch=train_sketch
+            current_sketch.merge(test_sketch)
+            data_hash=self.get_data_hash()
+            current_sketch.data_hashes=[data_hash]
+            reference_sketch_file_path=self.data_validation_config.reference_sketch_file_path
+            is_reference_updated=True
+            if os.path.exists(reference_sketch_file_path):
+                reference_sketch=DatasetSketch.load(reference_sketch_file_path)
+                report["reference"]=get_drift_report(reference=reference_sketch,current=current_sketch,
+                                                     psi_threshold=psi_threshold)
+                if data_hash in reference_sketch.data_hashes:
+                    logging.info(f"Data [{data_hash}] is already part of the reference sketch, not merging it again")
+                    is_reference_updated=False
+                else:
+                    reference_sketch.merge(current_sketch)
+            else:
+                reference_sketch=current_sketch
+
+            if is_reference_updated:
+                os.makedirs(os.path.dirname(reference_sketch_file_path),exist_ok=True)
+                tmp_file_path=f"{reference_sketch_file_path}.{os.getpid()}.tmp"
+                reference_sketch.save(tmp_file_path)
+                os.replace(tmp_file_path,reference_sketch_file_path)
 
             report_file_path=self.data_validation_config.report_file_path
             report_dir=os.path.dirname(report_file_path)
             os.makedirs(report_dir,exist_ok=True)
 
             with open(report_file_path,'w') as report_file:
-                logging.info('Dumping the report to: [{report_file_path}]')
+                logging.info(f'Dumping the report to: [{report_file_path}]')
                 json.dump(report,report_file,indent=6)
             return report
         except Exception as e:
             raise HousingException(e,sys) from e
         
     
-    def save_data_drift_report_page(self):
+    def save_data_drift_report_page(self,report:dict):
         try:
-            dashboard=Dashboard(tabs=(DataDriftTab()))
-            train,test=self.get_train_and_test()
-            dashboard.calculate(train,test)
-
             report_page_file_path=self.data_validation_config.report_page_file_path
             report_dir=os.path.dirname(report_page_file_path)
             os.makedirs(report_dir,exist_ok=True)
 
-            dashboard.save(report_page_file_path)
+            with open(report_page_file_path,'w') as report_page_file:
+                for comparison,drift_report in report.items():
+                    report_page_file.write(f"<h2>{comparison}: drift in {drift_report['n_drifted_columns']} "
+                                           f"of {drift_report['n_columns']} columns</h2>\n")
+                    report_page_file.write(pd.DataFrame(drift_report["columns"]).T.to_html(float_format="{:.4f}".format))
         except Exception as e:
             raise HousingException(e,sys) from e
         
@@ -130,18 +185,34 @@ class DataValidation:
     def is_data_drift_found(self):
         try:
             report=self.get_and_save_data_drift_report()
-            self.save_data_drift_report_page()
-            return True
+            self.save_data_drift_report_page(report)
+            is_drift_found=any(drift_report["dataset_drift"] for drift_report in report.values())
+            logging.info(f"Is data drift found? [{is_drift_found}]")
+            return is_drift_found
         except Exception as e:
             raise HousingException(e,sys) from e
         
 
+    def initiate_data_drift_check(self)->DataDriftArtifact:
+        """
+        Runs apart from initiate_data_validation so that the pipeline can overlap it with later stages
+        """
+        try:
+            self.is_train_test_file_exists()
+            data_drift_artifact=DataDriftArtifact(report_file_path=self.data_validation_config.report_file_path,
+                                                  report_page_file_path=self.data_validation_config.report_page_file_path,
+                                                  is_drift_found=self.is_data_drift_found())
+            logging.info(f"Data drift artifact: {data_drift_artifact}")
+            return data_drift_artifact
+        except Exception as e:
+            raise HousingException(e,sys) from e
+
+
     def initiate_data_validation(self)->DataValidationArtifact :
         try:
-            _,test=self.get_train_and_test()
             self.is_train_test_file_exists()
-            #self.is_data_drift_found()
-            self.validate_dataset_schema(input=test)
+            if not self.validate_dataset_schema():
+                raise Exception(f"Dataset violates the schema, see: [{self.data_validation_config.schema_report_file_path}]")
 
             data_validation_artifact = DataValidationArtifact(
                 schema_file_path=self.data_validation_config.schema_file_path,
@@ -1,4 +1,5 @@
 import os,sys
+import hashlib
 import numpy as np
 
 from housing.logger import logging
@@ -6,9 +7,10 @@ from housing.exception import HousingException
 from housing.entity.config_entity import ModelEvaluationConfig
 from housing.entity.artifact_entity import DataIngestionArtifact,DataTransformationArtifact,ModelTrainerArtifact,ModelEvaluationArtifact \
                                             ,DataValidationArtifact
-from housing.util.util import write_yaml_file,read_yaml_file,load_object,load_data
+from housing.util.util import write_yaml_file,read_yaml_file,load_object,load_data,get_file_hash
 from housing.constant import *
-from housing.entity.model_factory import evaluate_regression_model
+from housing.entity.model_factory import evaluate_regression_model, get_regression_metric, get_model_accuracy, \
+    RegressionMetric
 
 class ModelEvaluation:
     def __init__(self,model_evaluation_config: ModelEvaluationConfig,
@@ -25,29 +27,103 @@ class ModelEvaluation:
             raise HousingException(e,sys) from e
         
 
-    def get_best_model(self):
+    def get_data_fingerprint(self) -> str:
+        """
+        Hash of the ingested train and test files the models are evaluated on
+        """
         try:
-            model = None
+            digest = hashlib.sha256()
+            for file_path in (self.data_ingestion_artifact.train_file_path, self.data_ingestion_artifact.test_file_path):
+                digest.update(get_file_hash(file_path).encode())
+            return digest.hexdigest()
+        except Exception as e:
+            raise HousingException(e, sys) from e
 
+    def get_best_model_info(self) -> dict:
+        """
+        return: best model entry of model_evaluation.yaml or None
+        """
+        try:
             model_evaluation_file_path = self.model_evaluation_config.model_evaluation_file_path
 
             if not os.path.exists(model_evaluation_file_path):
                 write_yaml_file(file_path=model_evaluation_file_path)
-                return model
-            
+                return None
+
             model_evaluation_file_content=read_yaml_file(file_path=model_evaluation_file_path)
 
             model_evaluation_file_content = dict() if model_evaluation_file_content is None else model_evaluation_file_content
 
-            if BEST_MODEL_KEY not in model_evaluation_file_content:
-                return model
-            
-            model = load_object(file_path=model_evaluation_file_content[BEST_MODEL_KEY][MODEL_PATH_KEY])            
+            return model_evaluation_file_content.get(BEST_MODEL_KEY)
         except Exception as e:
             raise HousingException(e,sys) from e
-        
 
-    def update_evaluation_report(self, model_evaluation_artifact: ModelEvaluationArtifact):
+    def get_best_model(self):
+        try:
+            best_model_info = self.get_best_model_info()
+            if best_model_info is None:
+                return None
+            return load_object(file_path=best_model_info[MODEL_PATH_KEY])
+        except Exception as e:
+            raise HousingException(e,sys) from e
+
+    @staticmethod
+    def get_stored_metric(best_model_info: dict, data_fingerprint: str) -> RegressionMetric:
+        """
+        return: metrics stored with the best model when they were computed on the same data through
+        the full model pipeline, else None
+        """
+        try:
+            if best_model_info.get(MODEL_DATA_FINGERPRINT_KEY) != data_fingerprint \
+                    or best_model_info.get(MODEL_METRIC_SOURCE_KEY) != RAW_DATA_METRIC_SOURCE \
+                    or MODEL_METRICS_KEY not in best_model_info:
+                return None
+            return RegressionMetric(**best_model_info[MODEL_METRICS_KEY])
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    @staticmethod
+    def get_metric_record(metric: RegressionMetric, data_fingerprint: str) -> dict:
+        return {
+            MODEL_DATA_FINGERPRINT_KEY: data_fingerprint,
+            MODEL_METRIC_SOURCE_KEY: RAW_DATA_METRIC_SOURCE,
+            MODEL_METRICS_KEY: {name: float(value) for name, value in metric._asdict().items()},
+        }
+
+    def get_evaluation_data(self) -> tuple:
+        """
+        return: train input, train target, test input and test target of the ingested raw data
+        """
+        try:
+            schema_file_path = self.data_validation_artifact.schema_file_path
+            train_dataframe = load_data(file_path=self.data_ingestion_artifact.train_file_path,
+                                        schema_file_path=schema_file_path)
+            test_dataframe = load_data(file_path=self.data_ingestion_artifact.test_file_path,
+                                       schema_file_path=schema_file_path)
+            target_column_name = read_yaml_file(file_path=schema_file_path)[TARGET_COLUMN_KEY]
+
+            train_target_arr = np.array(train_dataframe[target_column_name])
+            test_target_arr = np.array(test_dataframe[target_column_name])
+            train_dataframe.drop(target_column_name, axis=1, inplace=True)
+            test_dataframe.drop(target_column_name, axis=1, inplace=True)
+            return train_dataframe, train_target_arr, test_dataframe, test_target_arr
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def update_best_model_metric(self, metric: RegressionMetric, data_fingerprint: str):
+        """
+        Stores metrics of the current best model computed on new data so the next evaluation reuses them
+        """
+        try:
+            eval_file_path = self.model_evaluation_config.model_evaluation_file_path
+            model_eval_content = read_yaml_file(file_path=eval_file_path)
+            model_eval_content[BEST_MODEL_KEY].update(ModelEvaluation.get_metric_record(metric, data_fingerprint))
+            write_yaml_file(file_path=eval_file_path, data=model_eval_content)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def update_evaluation_report(self, model_evaluation_artifact: ModelEvaluationArtifact,
+                                 metric: RegressionMetric = None, data_fingerprint: str = None):
         try:
             eval_file_path = self.model_evaluation_config.model_evaluation_file_path
             model_eval_content = read_yaml_file(file_path=eval_file_path)
@@ -62,8 +138,11 @@ class ModelEvaluation:
             eval_result = {
                 BEST_MODEL_KEY: {
                     MODEL_PATH_KEY: model_evaluation_artifact.evaluated_model_path,
+                    MODEL_NAME_KEY: self.model_trainer_artifact.model_name,
                 }
             }
+            if metric is not None:
+                eval_result[BEST_MODEL_KEY].update(ModelEvaluation.get_metric_record(metric, data_fingerprint))
 
             if previous_best_model is not None:
                 model_history = {self.model_evaluation_config.time_stamp: previous_best_model}
@@ -83,52 +162,44 @@ class ModelEvaluation:
     def initiate_model_evaluation(self) -> ModelEvaluationArtifact:
         try:
             trained_model_file_path = self.model_trainer_artifact.trained_model_file_path
-            trained_model_object = load_object(file_path=trained_model_file_path)
-
-            train_file_path = self.data_ingestion_artifact.train_file_path
-            test_file_path = self.data_ingestion_artifact.test_file_path
+            data_fingerprint = self.get_data_fingerprint()
 
-            schema_file_path = self.data_validation_artifact.schema_file_path
+            # the trainer scored on transformed, possibly float32, arrays. The trained model is scored again like
+            # the best model: on the raw ingested data through its full pipeline, so both metrics come from one path
+            evaluation_data = self.get_evaluation_data()
+            trained_model_metric = get_regression_metric(load_object(file_path=trained_model_file_path),
+                                                         *evaluation_data)
 
-            train_dataframe = load_data(file_path=train_file_path,
-                                                           schema_file_path=schema_file_path,
-                                                           )
-            test_dataframe = load_data(file_path=test_file_path,
-                                                          schema_file_path=schema_file_path,
-                                                          )
-            schema_content = read_yaml_file(file_path=schema_file_path)
-            target_column_name = schema_content[TARGET_COLUMN_KEY]
-
-            # target_column
-            logging.info(f"Converting target column into numpy array.")
-            train_target_arr = np.array(train_dataframe[target_column_name])
-            test_target_arr = np.array(test_dataframe[target_column_name])
-            logging.info(f"Conversion completed target column into numpy array.")
+            best_model_info = self.get_best_model_info()
 
-            # dropping target column from the dataframe
-            logging.info(f"Dropping target column from the dataframe.")
-            train_dataframe.drop(target_column_name, axis=1, inplace=True)
-            test_dataframe.drop(target_column_name, axis=1, inplace=True)
-            logging.info(f"Dropping target column from the dataframe completed.")
-
-            model = self.get_best_model()
-
-            if model is None:
+            if best_model_info is None:
                 logging.info("Not found any existing model. Hence accepting trained model")
                 model_evaluation_artifact = ModelEvaluationArtifact(evaluated_model_path=trained_model_file_path,
                                                                     is_model_accepted=True)
-                self.update_evaluation_report(model_evaluation_artifact)
+                self.update_evaluation_report(model_evaluation_artifact, metric=trained_model_metric,
+                                              data_fingerprint=data_fingerprint)
                 logging.info(f"Model accepted. Model eval artifact {model_evaluation_artifact} created")
                 return model_evaluation_artifact
 
-            model_list = [model, trained_model_object]
+            best_model_name = best_model_info.get(MODEL_NAME_KEY, best_model_info[MODEL_PATH_KEY])
+            best_model_metric = ModelEvaluation.get_stored_metric(best_model_info, data_fingerprint)
+
+            if best_model_metric is None:
+                logging.info(f"Evaluation data changed since the best model was scored, predicting with it again")
+                model = load_object(file_path=best_model_info[MODEL_PATH_KEY])
+                best_model_metric = get_regression_metric(model, *evaluation_data)
+                self.update_best_model_metric(metric=best_model_metric, data_fingerprint=data_fingerprint)
+
+            # both metrics are known, the models are compared by name without loading them
+            model_list = [best_model_name, self.model_trainer_artifact.model_name]
 
             metric_info_artifact = evaluate_regression_model(model_list=model_list,
-                                                               X_train=train_dataframe,
-                                                               y_train=train_target_arr,
-                                                               X_test=test_dataframe,
-                                                               y_test=test_target_arr,
-                                                               base_accuracy=self.model_trainer_artifact.model_accuracy,
+                                                               X_train=None,
+                                                               y_train=None,
+                                                               X_test=None,
+                                                               y_test=None,
+                                                               base_accuracy=get_model_accuracy(trained_model_metric),
+                                                               metric_list=[best_model_metric, trained_model_metric],
                                                                )
             logging.info(f"Model evaluation completed. model metric artifact: {metric_info_artifact}")
 
@@ -142,7 +213,8 @@ class ModelEvaluation:
             if metric_info_artifact.index_number == 1:
                 model_evaluation_artifact = ModelEvaluationArtifact(evaluated_model_path=trained_model_file_path,
                                                                     is_model_accepted=True)
-                self.update_evaluation_report(model_evaluation_artifact)
+                self.update_evaluation_report(model_evaluation_artifact, metric=trained_model_metric,
+                                              data_fingerprint=data_fingerprint)
                 logging.info(f"Model accepted. Model eval artifact {model_evaluation_artifact} created")
 
             else:
@@ -1,10 +1,16 @@
 import os, sys
+import errno
+import uuid
 import shutil
+import numpy as np
 
 from housing.logger import logging
 from housing.exception import HousingException
 from housing.entity.config_entity import ModelPusherConfig
 from housing.entity.artifact_entity import ModelEvaluationArtifact, ModelPusherArtifact
+from housing.entity.compact_model import CompactHousingModel, save_compact_model, load_compact_model
+from housing.util.util import load_object
+from housing.constant import COMPACT_MODEL_FILE_NAME
 
 class ModelPusher:
     def __init__(self, model_pusher_config: ModelPusherConfig, model_evaluation_artifact: ModelEvaluationArtifact):
@@ -15,16 +21,69 @@ class ModelPusher:
             raise HousingException(e,sys) from e
         
 
+    def export_compact_model(self, model_file_path: str, compact_model_file_path: str) -> bool:
+        """
+        Writes the memory mappable copy of the model next to the pickled one.
+        The copy is kept only if it predicts the same values as the pickled model.
+        """
+        try:
+            housing_model = load_object(file_path=model_file_path)
+            try:
+                compact_model = CompactHousingModel.from_housing_estimator_model(housing_model)
+            except Exception as e:
+                logging.info(f"Compact model export skipped: {e}")
+                return False
+
+            save_compact_model(file_path=compact_model_file_path, compact_model=compact_model)
+
+            sample_df = compact_model.compiled_preprocessor.get_sample_data_frame()
+            expected = housing_model.predict(sample_df)
+            actual = load_compact_model(file_path=compact_model_file_path).predict(sample_df)
+            if not np.allclose(expected, actual, rtol=1e-7, atol=1e-6):
+                logging.info(f"Compact model does not match pickled model, max abs diff: "
+                             f"[{np.max(np.abs(expected - actual))}]. Compact model export skipped.")
+                os.remove(compact_model_file_path)
+                return False
+            return True
+        except Exception as e:
+            raise HousingException(e,sys) from e
+
+    @staticmethod
+    def publish_version_dir(staging_dir: str, export_dir: str) -> str:
+        """
+        Renames the staged model into export_dir, or into the next free version when another pipeline
+        exported in the same second.
+        return: the version dir the model was published to
+        """
+        try:
+            while True:
+                try:
+                    os.rename(staging_dir, export_dir)
+                    return export_dir
+                except OSError as e:
+                    if e.errno not in (errno.EEXIST, errno.ENOTEMPTY):
+                        raise
+                export_dir = os.path.join(os.path.dirname(export_dir), str(int(os.path.basename(export_dir)) + 1))
+        except Exception as e:
+            raise HousingException(e,sys) from e
+
     def export_model(self) -> ModelPusherArtifact:
         try:
             evaluated_model_file_path = self.model_evaluation_artifact.evaluated_model_path
             export_dir = self.model_pusher_config.export_dir_path
             model_file_name = os.path.basename(evaluated_model_file_path)
-            export_model_file_path = os.path.join(export_dir,model_file_name)
 
-            os.makedirs(export_dir, exist_ok = True)
+            # stage the copy in a hidden folder and rename it into place so that a serving
+            # process polling the export dir never sees a version folder without its model file
+            staging_dir = os.path.join(os.path.dirname(export_dir),
+                                       f".{os.path.basename(export_dir)}.{uuid.uuid4().hex}.tmp")
+            os.makedirs(staging_dir, exist_ok = True)
 
-            shutil.copy(src=evaluated_model_file_path, dst=export_model_file_path)
+            shutil.copy(src=evaluated_model_file_path, dst=os.path.join(staging_dir, model_file_name))
+            self.export_compact_model(model_file_path=evaluated_model_file_path,
+                                      compact_model_file_path=os.path.join(staging_dir, COMPACT_MODEL_FILE_NAME))
+            export_dir = self.publish_version_dir(staging_dir=staging_dir, export_dir=export_dir)
+            export_model_file_path = os.path.join(export_dir,model_file_name)
 
             logging.info(f"Trained model: {evaluated_model_file_path} is copied in export dir:[{export_model_file_path}]")
 
@@ -1,4 +1,5 @@
 import os,sys 
+import numpy as np
 import pandas as pd
 from typing import List
 
@@ -6,8 +7,11 @@ from housing.logger import logging
 from housing.exception import HousingException
 from housing.entity.config_entity import ModelTrainerConfig
 from housing.entity.artifact_entity import DataTransformationArtifact
+from housing.entity.compiled_preprocessor import CompiledPreprocessor
 from housing.entity.model_factory import ModelFactory,GridSearchedBestModel,MetricInfoArtifact,evaluate_regression_model
-from housing.util.util import load_object,save_object
+from housing.entity.cv_result_cache import CVResultCache
+from housing.util.util import load_object,save_object,load_transformed_array_data,to_dense_array,\
+    split_transformed_array_data
 from housing.entity.artifact_entity import ModelTrainerArtifact
 
 
@@ -20,6 +24,42 @@ class HousingEstimatorModel:
         """
         self.preprocessing_object = preprocessing_object
         self.trained_model_object = trained_model_object
+        self.compiled_preprocessor = None
+
+    def compile(self, n_parity_rows: int = 256) -> bool:
+        """
+        Flattens the fitted preprocessing object into a CompiledPreprocessor and keeps it only if
+        predictions through it match the sklearn path on a synthetic sample.
+        return: True if the compiled path is enabled
+        """
+        try:
+            compiled_preprocessor = CompiledPreprocessor.from_preprocessing_object(self.preprocessing_object)
+            sample_df = compiled_preprocessor.get_sample_data_frame(n_rows=n_parity_rows)
+
+            expected = self.trained_model_object.predict(to_dense_array(self.preprocessing_object.transform(sample_df)))
+            actual = self.trained_model_object.predict(compiled_preprocessor.transform_data_frame(sample_df))
+
+            if not np.allclose(expected, actual, rtol=1e-9, atol=1e-9):
+                logging.info(f"Compiled preprocessing does not match sklearn path, max abs diff: "
+                             f"[{np.max(np.abs(expected - actual))}]. Compiled path disabled.")
+                self.compiled_preprocessor = None
+                return False
+            logging.info(f"Compiled preprocessing matches sklearn path on [{n_parity_rows}] rows. Compiled path enabled.")
+            self.compiled_preprocessor = compiled_preprocessor
+            return True
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def transform(self, X):
+        # models pickled before compile existed have no compiled_preprocessor attribute
+        compiled_preprocessor = getattr(self, "compiled_preprocessor", None)
+        if compiled_preprocessor is not None:
+            return compiled_preprocessor.transform_data_frame(X)
+        # the estimator may have been trained on a sparse matrix, it predicts on dense rows like the compiled path
+        return to_dense_array(self.preprocessing_object.transform(X))
+
+    def predict_transformed(self, transformed_feature):
+        return self.trained_model_object.predict(transformed_feature)
 
     def predict(self, X):
         """
@@ -27,8 +67,7 @@ class HousingEstimatorModel:
         which gurantees that the inputs are in the same format as the training data
         At last it perform prediction on transformed features
         """
-        transformed_feature = self.preprocessing_object.transform(X)
-        return self.trained_model_object.predict(transformed_feature)
+        return self.predict_transformed(self.transform(X))
 
     def __repr__(self):
         return f"{type(self.trained_model_object).__name__}()"
@@ -49,26 +88,34 @@ class ModelTrainer:
         try:
             logging.info('Loading Transformed train dataset')
             transformed_train_file_path=self.data_transformation_artifact.transformed_train_file_path
-            train=pd.read_csv(transformed_train_file_path)
+            train=load_transformed_array_data(file_path=transformed_train_file_path)
 
             logging.info('Loading Transformed train dataset')
             transformed_test_file_path=self.data_transformation_artifact.transformed_test_file_path
-            test=pd.read_csv(transformed_test_file_path)
+            test=load_transformed_array_data(file_path=transformed_test_file_path)
 
             logging.info('Splitting the dataset into features and target')
-            X_train, y_train, X_test,y_test=train.iloc[:,:-1],train.iloc[:,-1],test.iloc[:,:-1],test.iloc[:,-1]
+            X_train, y_train=split_transformed_array_data(train)
+            X_test, y_test=split_transformed_array_data(test)
 
             logging.info(f"Extracting model config file path")
             model_config_file_path=self.model_trainer_config.model_config_file_path
 
             logging.info(f"Initializing model factory class using above model config file: {model_config_file_path}")
-            model_factory=ModelFactory(model_config_path=model_config_file_path)
+            cv_result_cache=CVResultCache(cache_dir=self.model_trainer_config.cv_cache_dir,
+                                          max_entries=self.model_trainer_config.cv_cache_max_entries)
+            model_factory=ModelFactory(model_config_path=model_config_file_path,cv_result_cache=cv_result_cache)
 
             base_accuracy=self.model_trainer_config.base_accuracy
             logging.info(f"Expected accuracy: {base_accuracy}")
 
             logging.info(f"Initiating operation model selecttion")
-            best_model=model_factory.get_best_model(X=X_train,y=y_train,base_accuracy=base_accuracy)
+            if model_factory.incremental_training_enabled:
+                logging.info(f"Training out of core with partial_fit on the memory mapped train dataset")
+                best_model=model_factory.get_best_incremental_model(X=X_train,y=y_train,base_accuracy=base_accuracy)
+            else:
+                best_model=model_factory.get_best_model(X=X_train,y=y_train,base_accuracy=base_accuracy,
+                                                        data_file_path=transformed_train_file_path)
 
             logging.info(f"Best model found on training dataset: {best_model}")
 
@@ -77,18 +124,24 @@ class ModelTrainer:
 
             model_list = [model.best_model for model in grid_searched_best_model_list ]
             logging.info(f"Evaluation all trained model on training and testing dataset both")
-            metric_info:MetricInfoArtifact = evaluate_regression_model(model_list=model_list,X_train=X_train,y_train=y_train,X_test=X_test,y_test=y_test,base_accuracy=base_accuracy)
+            # out of core models are scored chunk by chunk as well, the datasets are never loaded whole
+            chunk_size=model_factory.incremental_chunk_size if model_factory.incremental_training_enabled else None
+            metric_info:MetricInfoArtifact = evaluate_regression_model(model_list=model_list,X_train=X_train,y_train=y_train,X_test=X_test,y_test=y_test,base_accuracy=base_accuracy,
+                                                                       chunk_size=chunk_size)
 
             preprocessing_obj=load_object(file_path=self.data_transformation_artifact.preprocessed_object_file_path)
             model_object = metric_info.model_object
 
             trained_model_file_path=self.model_trainer_config.trained_model_file_path
             housing_model = HousingEstimatorModel(preprocessing_object=preprocessing_obj,trained_model_object=model_object)
+            logging.info(f"Compiling preprocessing object for fast inference")
+            housing_model.compile()
             logging.info(f"Saving model at path: {trained_model_file_path}")
             save_object(file_path=trained_model_file_path,obj=housing_model)
 
             model_trainer_artifact=  ModelTrainerArtifact(is_trained=True,message="Model Trained successfully",
             trained_model_file_path=trained_model_file_path,
+            model_name=str(housing_model),
             train_rmse=metric_info.train_rmse,
             test_rmse=metric_info.test_rmse,
             train_accuracy=metric_info.train_accuracy,
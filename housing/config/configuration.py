@@ -3,7 +3,8 @@ import os,sys
 from housing.logger import logging
 from housing.exception import HousingException
 from housing.entity.config_entity import DataIngestionConfig, DataValidationConfig, DataTransformationConfig \
-                                         ,ModelTrainerConfig, ModelEvaluationConfig, ModelPusherConfig, TrainingPipelineConfig
+                                         ,ModelTrainerConfig, ModelEvaluationConfig, ModelPusherConfig, TrainingPipelineConfig \
+                                         ,ServingConfig
 from housing.constant import *
 from housing.util.util import read_yaml_file
 from housing.constant import *
@@ -36,11 +37,27 @@ class Configuration:
 
             ingested_test_dir=os.path.join(ingested_data_dir,data_ingestion_config_info[DATA_INGESTION_TEST_DIR_KEY])
 
+            # local directory (or file) of raw shards used instead of the download url when set
+            raw_data_path=data_ingestion_config_info[DATA_INGESTION_RAW_DATA_PATH_KEY]
+            if raw_data_path is not None:
+                raw_data_path=os.path.join(ROOT_DIR,raw_data_path)
+
+            data_validation_config_info=self.config_info[DATA_VALIDATION_CONFIG_KEY]
+            schema_file_path=os.path.join(ROOT_DIR,data_validation_config_info[DATA_VALIDATION_SCHEMA_DIR_KEY],
+                                          data_validation_config_info[DATA_VALIDATION_SCHEMA_FILE_NAME_KEY])
+
             data_ingestion_config=DataIngestionConfig(dataset_download_url=dataset_download_url,
                                 tgz_download_dir=tgz_download_dir,
                                 raw_data_dir=raw_data_dir,
                                 ingested_train_dir=ingested_train_dir,
-                                ingested_test_dir=ingested_test_dir)
+                                ingested_test_dir=ingested_test_dir,
+                                raw_data_path=raw_data_path,
+                                schema_file_path=schema_file_path,
+                                chunk_size=data_ingestion_config_info[DATA_INGESTION_CHUNK_SIZE_KEY],
+                                workers=data_ingestion_config_info[DATA_INGESTION_WORKERS_KEY],
+                                split_seed=data_ingestion_config_info[DATA_INGESTION_SPLIT_SEED_KEY],
+                                split_key_columns=data_ingestion_config_info[DATA_INGESTION_SPLIT_KEY_COLUMNS_KEY],
+                                split_tolerance=data_ingestion_config_info[DATA_INGESTION_SPLIT_TOLERANCE_KEY])
             
             logging.info(f'Data Ingestion Config: {data_ingestion_config}')
             return data_ingestion_config
@@ -62,9 +79,22 @@ class Configuration:
 
             report_page_file_path=os.path.join(data_validation_dir,data_validation_config_info[DATA_VALIDATION_REPORT_PAGE_FILE_NAME_KEY])
 
+            schema_report_file_path=os.path.join(data_validation_dir,
+                                                 data_validation_config_info[DATA_VALIDATION_SCHEMA_REPORT_FILE_NAME_KEY])
+
+            # the reference sketch accumulates every validated dataset, so it is kept outside the run directory
+            reference_sketch_file_path=os.path.join(self.training_pipeline_config.shared_artifact_dir,
+                                                    DATA_VALIDATION_ARTIFACT_DIR_NAME,
+                                                    data_validation_config_info[DATA_VALIDATION_REFERENCE_SKETCH_FILE_NAME_KEY])
+
             data_validation_config=DataValidationConfig(schema_file_path=schema_file_path,
                                                         report_file_path=report_file_path,
-                                                        report_page_file_path=report_page_file_path)
+                                                        report_page_file_path=report_page_file_path,
+                                                        schema_report_file_path=schema_report_file_path,
+                                                        chunk_size=data_validation_config_info[DATA_VALIDATION_CHUNK_SIZE_KEY],
+                                                        reference_sketch_file_path=reference_sketch_file_path,
+                                                        sketch_relative_accuracy=data_validation_config_info[DATA_VALIDATION_SKETCH_RELATIVE_ACCURACY_KEY],
+                                                        drift_psi_threshold=data_validation_config_info[DATA_VALIDATION_DRIFT_PSI_THRESHOLD_KEY])
             
             logging.info(f"Data Validation Config: {data_validation_config}")
             return data_validation_config
@@ -96,7 +126,9 @@ class Configuration:
             data_transformation_config=DataTransformationConfig(add_bedroom_per_room=add_bedroom_per_room,
                                                                 transformed_train_dir=transformed_train_dir,
                                                                 transformed_test_dir=transformed_test_dir,
-                                                                preprocessed_object_file_path=preprocessed_object_file_path)
+                                                                preprocessed_object_file_path=preprocessed_object_file_path,
+                                                                transformed_dtype=data_transformation_config_info[DATA_TRANSFORMATION_TRANSFORMED_DTYPE_KEY],
+                                                                sparse_density_threshold=data_transformation_config_info[DATA_TRANSFORMATION_SPARSE_DENSITY_THRESHOLD_KEY])
             
             logging.info(f"Data Transformation config: {data_transformation_config}")
             return data_transformation_config
@@ -120,9 +152,15 @@ class Configuration:
             model_config_file_path = os.path.join(ROOT_DIR,get_model_trainer_config_info[MODEL_TRAINER_MODEL_CONFIG_DIR_KEY],
                                                     get_model_trainer_config_info[MODEL_TRAINER_MODEL_CONFIG_FILE_NAME_KEY])
 
+            # shared by all runs, cached cv results are keyed on the training data
+            cv_cache_dir=os.path.join(self.training_pipeline_config.shared_artifact_dir,MODEL_TRAINER_ARTIFACT_DIR,
+                                      get_model_trainer_config_info[MODEL_TRAINER_CV_CACHE_DIR_KEY])
+
             model_trainer_config=ModelTrainerConfig(trained_model_file_path=trained_model_file_path,
                                                     base_accuracy=base_accuarcy,
-                                                    model_config_file_path=model_config_file_path)
+                                                    model_config_file_path=model_config_file_path,
+                                                    cv_cache_dir=cv_cache_dir,
+                                                    cv_cache_max_entries=get_model_trainer_config_info[MODEL_TRAINER_CV_CACHE_MAX_ENTRIES_KEY])
             
             logging.info(f'Model Trainer config: {model_trainer_config}')
 
@@ -134,9 +172,10 @@ class Configuration:
     def get_model_evaluation_config(self)->ModelEvaluationConfig:
         try:
             model_evaluation_config_info=self.config_info[MODEL_EVALUATION_CONFIG_KEY]
-            artifact_dir=os.path.join(self.training_pipeline_config.artifact_dir,MODEL_EVALUATION_ARTIFACT_DIR)
+            # kept with the models it ranks, every pipeline exporting to the same dir compares against the same best model
+            export_dir=os.path.join(ROOT_DIR,self.config_info[MODEL_PUSHER_CONFIG_KEY][MODEL_PUSHER_MODEL_EXPORT_DIR_KEY])
 
-            model_evaluation_file_path=os.path.join(artifact_dir,model_evaluation_config_info[MODEL_EVALUATION_FILE_NAME_KEY])
+            model_evaluation_file_path=os.path.join(export_dir,model_evaluation_config_info[MODEL_EVALUATION_FILE_NAME_KEY])
 
 
             model_evaluation_config=ModelEvaluationConfig(model_evaluation_file_path=model_evaluation_file_path,
@@ -162,6 +201,48 @@ class Configuration:
         except Exception as e:
             raise HousingException(e,sys) from e
 
+
+    def get_serving_config(self)->ServingConfig:
+        try:
+            serving_config_info=self.config_info[SERVING_CONFIG_KEY]
+
+            model_dir=os.path.join(ROOT_DIR,self.config_info[MODEL_PUSHER_CONFIG_KEY][MODEL_PUSHER_MODEL_EXPORT_DIR_KEY])
+
+            model_reload_interval=serving_config_info[SERVING_MODEL_RELOAD_INTERVAL_KEY]
+
+            data_validation_config_info=self.config_info[DATA_VALIDATION_CONFIG_KEY]
+            schema_file_path=os.path.join(ROOT_DIR,data_validation_config_info[DATA_VALIDATION_SCHEMA_DIR_KEY],
+                                          data_validation_config_info[DATA_VALIDATION_SCHEMA_FILE_NAME_KEY])
+
+            max_batch_size=serving_config_info[SERVING_MAX_BATCH_SIZE_KEY]
+
+            serving_config=ServingConfig(model_dir=model_dir,
+                                         model_reload_interval=model_reload_interval,
+                                         schema_file_path=schema_file_path,
+                                         max_batch_size=max_batch_size,
+                                         coalesce_enabled=serving_config_info[SERVING_COALESCE_ENABLED_KEY],
+                                         coalesce_window_ms=serving_config_info[SERVING_COALESCE_WINDOW_MS_KEY],
+                                         coalesce_max_batch_size=serving_config_info[SERVING_COALESCE_MAX_BATCH_SIZE_KEY],
+                                         coalesce_max_queue_depth=serving_config_info[SERVING_COALESCE_MAX_QUEUE_DEPTH_KEY],
+                                         coalesce_timeout_ms=serving_config_info[SERVING_COALESCE_TIMEOUT_MS_KEY],
+                                         cache_enabled=serving_config_info[SERVING_CACHE_ENABLED_KEY],
+                                         cache_max_size=serving_config_info[SERVING_CACHE_MAX_SIZE_KEY],
+                                         cache_ttl_seconds=serving_config_info[SERVING_CACHE_TTL_SECONDS_KEY],
+                                         cache_float_decimals=serving_config_info[SERVING_CACHE_FLOAT_DECIMALS_KEY],
+                                         workers=serving_config_info[SERVING_WORKERS_KEY],
+                                         threads=serving_config_info[SERVING_THREADS_KEY],
+                                         max_requests=serving_config_info[SERVING_MAX_REQUESTS_KEY],
+                                         max_requests_jitter=serving_config_info[SERVING_MAX_REQUESTS_JITTER_KEY],
+                                         graceful_timeout=serving_config_info[SERVING_GRACEFUL_TIMEOUT_KEY],
+                                         asgi_executor_workers=serving_config_info[SERVING_ASGI_EXECUTOR_WORKERS_KEY],
+                                         asgi_max_pending=serving_config_info[SERVING_ASGI_MAX_PENDING_KEY],
+                                         metrics_enabled=serving_config_info[SERVING_METRICS_ENABLED_KEY],
+                                         import_time_budget_ms=serving_config_info[SERVING_IMPORT_TIME_BUDGET_MS_KEY])
+            logging.info(f'Serving config: {serving_config}')
+            return serving_config
+        except Exception as e:
+            raise HousingException(e,sys) from e
+
     
     def get_training_pipeline_config(self)->TrainingPipelineConfig:
         try:
@@ -169,8 +250,25 @@ class Configuration:
 
             artifact_dir = os.path.join(ROOT_DIR, training_pipeline_config_info[TRAINING_PIPELINE_NAME_KEY],
                                         training_pipeline_config_info[TRAINING_PIPELINE_ARTIFACT_DIR_KEY])
+
+            job_dir = os.path.join(ROOT_DIR, training_pipeline_config_info[TRAINING_PIPELINE_NAME_KEY],
+                                   training_pipeline_config_info[TRAINING_PIPELINE_JOB_DIR_KEY])
+
+            # caches and the drift reference, shared by pipelines with their own artifact dir (see TrainingJobQueue)
+            shared_artifact_dir = training_pipeline_config_info[TRAINING_PIPELINE_SHARED_ARTIFACT_DIR_KEY]
+            if shared_artifact_dir is None:
+                shared_artifact_dir = artifact_dir
+            else:
+                shared_artifact_dir = os.path.join(ROOT_DIR, shared_artifact_dir)
             
-            training_pipeline_config=TrainingPipelineConfig(artifact_dir=artifact_dir)
+            training_pipeline_config=TrainingPipelineConfig(artifact_dir=artifact_dir,
+                                                            stage_cache_enabled=training_pipeline_config_info[TRAINING_PIPELINE_STAGE_CACHE_ENABLED_KEY],
+                                                            max_parallel_stages=training_pipeline_config_info[TRAINING_PIPELINE_MAX_PARALLEL_STAGES_KEY],
+                                                            job_dir=job_dir,
+                                                            job_workers=training_pipeline_config_info[TRAINING_PIPELINE_JOB_WORKERS_KEY],
+                                                            job_poll_interval=training_pipeline_config_info[TRAINING_PIPELINE_JOB_POLL_INTERVAL_KEY],
+                                                            shared_artifact_dir=shared_artifact_dir,
+                                                            job_lease_seconds=training_pipeline_config_info[TRAINING_PIPELINE_JOB_LEASE_SECONDS_KEY])
             
             logging.info(f'Training pipeline config: {training_pipeline_config}')
             return training_pipeline_config
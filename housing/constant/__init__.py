@@ -20,6 +20,13 @@ CURRENT_TIME_STAMP = get_current_time_stamp()
 TRAINING_PIPELINE_CONFIG_KEY = "training_pipeline_config"
 TRAINING_PIPELINE_ARTIFACT_DIR_KEY = "artifact_dir"
 TRAINING_PIPELINE_NAME_KEY = "pipeline_name"
+TRAINING_PIPELINE_STAGE_CACHE_ENABLED_KEY = "stage_cache_enabled"
+TRAINING_PIPELINE_MAX_PARALLEL_STAGES_KEY = "max_parallel_stages"
+TRAINING_PIPELINE_JOB_DIR_KEY = "job_dir"
+TRAINING_PIPELINE_JOB_WORKERS_KEY = "job_workers"
+TRAINING_PIPELINE_JOB_POLL_INTERVAL_KEY = "job_poll_interval"
+TRAINING_PIPELINE_SHARED_ARTIFACT_DIR_KEY = "shared_artifact_dir"
+TRAINING_PIPELINE_JOB_LEASE_SECONDS_KEY = "job_lease_seconds"
 
 
 # Data Ingestion related variable
@@ -32,6 +39,14 @@ DATA_INGESTION_TGZ_DOWNLOAD_DIR_KEY = "tgz_download_dir"
 DATA_INGESTION_INGESTED_DIR_NAME_KEY = "ingested_dir"
 DATA_INGESTION_TRAIN_DIR_KEY = "ingested_train_dir"
 DATA_INGESTION_TEST_DIR_KEY = "ingested_test_dir"
+DATA_INGESTION_RAW_DATA_PATH_KEY = "raw_data_path"
+DATA_INGESTION_CHUNK_SIZE_KEY = "chunk_size"
+DATA_INGESTION_WORKERS_KEY = "workers"
+DATA_INGESTION_SPLIT_SEED_KEY = "split_seed"
+DATA_INGESTION_SPLIT_KEY_COLUMNS_KEY = "split_key_columns"
+DATA_INGESTION_SPLIT_TOLERANCE_KEY = "split_tolerance"
+INGESTED_FILE_NAME = "housing.csv"
+RAW_DATA_FILE_EXTENSIONS = (".csv", ".csv.gz", ".csv.bz2", ".csv.zip", ".csv.xz")
 
 # Data Validation related variable
 
@@ -42,6 +57,11 @@ DATA_VALIDATION_SCHEMA_DIR_KEY = "schema_dir"
 DATA_VALIDATION_ARTIFACT_DIR_NAME="data_validation"
 DATA_VALIDATION_REPORT_FILE_NAME_KEY = "report_file_name"
 DATA_VALIDATION_REPORT_PAGE_FILE_NAME_KEY = "report_page_file_name"
+DATA_VALIDATION_SCHEMA_REPORT_FILE_NAME_KEY = "schema_report_file_name"
+DATA_VALIDATION_CHUNK_SIZE_KEY = "chunk_size"
+DATA_VALIDATION_REFERENCE_SKETCH_FILE_NAME_KEY = "reference_sketch_file_name"
+DATA_VALIDATION_SKETCH_RELATIVE_ACCURACY_KEY = "sketch_relative_accuracy"
+DATA_VALIDATION_DRIFT_PSI_THRESHOLD_KEY = "drift_psi_threshold"
 
 
 
@@ -54,6 +74,14 @@ DATA_TRANSFORMATION_TRAIN_DIR_NAME_KEY = "transformed_train_dir"
 DATA_TRANSFORMATION_TEST_DIR_NAME_KEY = "transformed_test_dir"
 DATA_TRANSFORMATION_PREPROCESSING_DIR_KEY = "preprocessing_dir"
 DATA_TRANSFORMATION_PREPROCESSED_FILE_NAME_KEY = "preprocessed_object_file_name"
+DATA_TRANSFORMATION_TRANSFORMED_DTYPE_KEY = "transformed_dtype"
+DATA_TRANSFORMATION_SPARSE_DENSITY_THRESHOLD_KEY = "sparse_density_threshold"
+TRANSFORMED_FILE_EXTENSION = ".npy"
+SPARSE_TRANSFORMED_FILE_EXTENSION = ".npz"
+NUMPY_ARRAY_COLUMNS_KEY = "columns"
+NUMPY_ARRAY_DTYPE_KEY = "dtype"
+NUMPY_ARRAY_SHAPE_KEY = "shape"
+NUMPY_ARRAY_DENSITY_KEY = "density"
 
 
 
@@ -68,6 +96,10 @@ CATEGORICAL_COLUMN_KEY = "categorical_columns"
 
 
 TARGET_COLUMN_KEY="target_column"
+DOMAIN_VALUE_KEY="domain_value"
+SCHEMA_VALUE_RANGE_KEY="value_range"
+SCHEMA_MAX_NULL_RATE_KEY="max_null_rate"
+SCHEMA_MAX_REJECTED_ROW_RATE_KEY="max_rejected_row_rate"
 
 
 # Model Training related variables
@@ -79,6 +111,8 @@ MODEL_TRAINER_TRAINED_MODEL_FILE_NAME_KEY = "model_file_name"
 MODEL_TRAINER_BASE_ACCURACY_KEY = "base_accuracy"
 MODEL_TRAINER_MODEL_CONFIG_DIR_KEY = "model_config_dir"
 MODEL_TRAINER_MODEL_CONFIG_FILE_NAME_KEY = "model_config_file_name"
+MODEL_TRAINER_CV_CACHE_DIR_KEY = "cv_cache_dir"
+MODEL_TRAINER_CV_CACHE_MAX_ENTRIES_KEY = "cv_cache_max_entries"
 
 
 MODEL_EVALUATION_CONFIG_KEY = "model_evaluation_config"
@@ -87,10 +121,42 @@ MODEL_EVALUATION_ARTIFACT_DIR = "model_evaluation"
 # Model Pusher config key
 MODEL_PUSHER_CONFIG_KEY = "model_pusher_config"
 MODEL_PUSHER_MODEL_EXPORT_DIR_KEY = "model_export_dir"
+COMPACT_MODEL_FILE_NAME = "model.bin"
+
+# Serving related variables
+SERVING_CONFIG_KEY = "serving_config"
+SERVING_MODEL_RELOAD_INTERVAL_KEY = "model_reload_interval"
+SERVING_MAX_BATCH_SIZE_KEY = "max_batch_size"
+SERVING_COALESCE_ENABLED_KEY = "coalesce_enabled"
+SERVING_COALESCE_WINDOW_MS_KEY = "coalesce_window_ms"
+SERVING_COALESCE_MAX_BATCH_SIZE_KEY = "coalesce_max_batch_size"
+SERVING_COALESCE_MAX_QUEUE_DEPTH_KEY = "coalesce_max_queue_depth"
+SERVING_COALESCE_TIMEOUT_MS_KEY = "coalesce_timeout_ms"
+SERVING_CACHE_ENABLED_KEY = "cache_enabled"
+SERVING_CACHE_MAX_SIZE_KEY = "cache_max_size"
+SERVING_CACHE_TTL_SECONDS_KEY = "cache_ttl_seconds"
+SERVING_CACHE_FLOAT_DECIMALS_KEY = "cache_float_decimals"
+SERVING_WORKERS_KEY = "workers"
+SERVING_THREADS_KEY = "threads"
+SERVING_MAX_REQUESTS_KEY = "max_requests"
+SERVING_MAX_REQUESTS_JITTER_KEY = "max_requests_jitter"
+SERVING_GRACEFUL_TIMEOUT_KEY = "graceful_timeout"
+SERVING_ASGI_EXECUTOR_WORKERS_KEY = "asgi_executor_workers"
+SERVING_ASGI_MAX_PENDING_KEY = "asgi_max_pending"
+SERVING_METRICS_ENABLED_KEY = "metrics_enabled"
+SERVING_IMPORT_TIME_BUDGET_MS_KEY = "import_time_budget_ms"
 
 BEST_MODEL_KEY = "best_model"
 HISTORY_KEY = "history"
 MODEL_PATH_KEY = "model_path"
+MODEL_DATA_FINGERPRINT_KEY = "data_fingerprint"
+MODEL_METRICS_KEY = "metrics"
+# how stored metrics were computed, only metrics of the current source are compared
+MODEL_METRIC_SOURCE_KEY = "metric_source"
+RAW_DATA_METRIC_SOURCE = "raw_data"
+MODEL_NAME_KEY = "model_name"
 
 EXPERIMENT_DIR_NAME="experiment"
-EXPERIMENT_FILE_NAME="experiment.csv"
\ No newline at end of file
+EXPERIMENT_FILE_NAME="experiment.csv"
+STAGE_CACHE_DIR_NAME="stage_cache"
+FILE_HASH_CHUNK_SIZE=1 << 20
@@ -14,8 +14,11 @@ DataTransformationArtifact = namedtuple("DataTransformationArtifact",
      "preprocessed_object_file_path"])
 
 
+DataDriftArtifact = namedtuple("DataDriftArtifact", ["report_file_path", "report_page_file_path", "is_drift_found"])
+
+
 ModelTrainerArtifact=namedtuple('ModelTrainerArtifact',
-                                ["is_trained", "message", "trained_model_file_path",
+                                ["is_trained", "message", "trained_model_file_path", "model_name",
                                 "train_rmse", "test_rmse", "train_accuracy", "test_accuracy",
                                  "model_accuracy"])
 
@@ -0,0 +1,221 @@
+import os
+import sys
+import json
+
+import numpy as np
+
+from housing.logger import logging
+from housing.exception import HousingException
+from housing.entity.compiled_preprocessor import CompiledPreprocessor
+
+COMPACT_MODEL_MAGIC = b"HOUSMDL1"
+COMPACT_MODEL_ALIGNMENT = 64
+
+TREE_ENSEMBLE_ESTIMATOR = "tree_ensemble"
+LINEAR_ESTIMATOR = "linear"
+
+TREE_LEAF = -1
+
+
+def _align(offset: int) -> int:
+    return (offset + COMPACT_MODEL_ALIGNMENT - 1) // COMPACT_MODEL_ALIGNMENT * COMPACT_MODEL_ALIGNMENT
+
+
+class CompactHousingModel:
+    """
+    HousingEstimatorModel rebuilt from plain arrays.
+    Preprocessing runs through a CompiledPreprocessor and the estimator is either a linear model
+    or a tree ensemble whose node arrays are traversed for all rows and all trees at once.
+    When loaded with load_compact_model every array is a view on one read only memory map,
+    so processes serving the same file share its physical pages.
+    """
+
+    def __init__(self, compiled_preprocessor: CompiledPreprocessor, estimator_type: str, estimator_name: str,
+                 arrays: dict, max_depth: int = 0):
+        try:
+            self.compiled_preprocessor = compiled_preprocessor
+            self.estimator_type = estimator_type
+            self.estimator_name = estimator_name
+            self.arrays = arrays
+            self.max_depth = max_depth
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    @classmethod
+    def from_housing_estimator_model(cls, housing_model) -> "CompactHousingModel":
+        """
+        Supports linear models exposing coef_/intercept_ and regression trees or forests
+        of sklearn trees. Raises for any other estimator.
+        """
+        try:
+            compiled_preprocessor = getattr(housing_model, "compiled_preprocessor", None)
+            if compiled_preprocessor is None:
+                raise Exception("Model has no compiled preprocessor")
+            estimator = housing_model.trained_model_object
+            estimator_name = type(estimator).__name__
+
+            if hasattr(estimator, "coef_") and hasattr(estimator, "intercept_"):
+                arrays = {
+                    "coef": np.ascontiguousarray(np.ravel(estimator.coef_), dtype=np.float64),
+                    "intercept": np.atleast_1d(np.asarray(estimator.intercept_, dtype=np.float64)),
+                }
+                return cls(compiled_preprocessor=compiled_preprocessor, estimator_type=LINEAR_ESTIMATOR,
+                           estimator_name=estimator_name, arrays=arrays)
+
+            if hasattr(estimator, "tree_"):
+                trees = [estimator.tree_]
+            elif hasattr(estimator, "estimators_") and all(hasattr(tree, "tree_") for tree in estimator.estimators_):
+                trees = [tree.tree_ for tree in estimator.estimators_]
+            else:
+                raise Exception(f"Estimator: [{estimator_name}] can not be exported in compact format")
+
+            # node arrays of all trees are concatenated, child ids are shifted to global node ids
+            tree_roots, children_left, children_right, feature, threshold, value = [], [], [], [], [], []
+            node_offset = 0
+            for tree in trees:
+                tree_roots.append(node_offset)
+                for local_children, global_children in ((tree.children_left, children_left),
+                                                        (tree.children_right, children_right)):
+                    global_children.append(np.where(local_children == TREE_LEAF, TREE_LEAF,
+                                                    local_children + node_offset))
+                feature.append(tree.feature)
+                threshold.append(tree.threshold)
+                value.append(tree.value[:, 0, 0])
+                node_offset += tree.node_count
+
+            arrays = {
+                "tree_roots": np.asarray(tree_roots, dtype=np.int64),
+                "children_left": np.concatenate(children_left).astype(np.int64),
+                "children_right": np.concatenate(children_right).astype(np.int64),
+                "feature": np.concatenate(feature).astype(np.int64),
+                "threshold": np.concatenate(threshold).astype(np.float64),
+                "value": np.concatenate(value).astype(np.float64),
+            }
+            return cls(compiled_preprocessor=compiled_preprocessor, estimator_type=TREE_ENSEMBLE_ESTIMATOR,
+                       estimator_name=estimator_name, arrays=arrays,
+                       max_depth=max(int(tree.max_depth) for tree in trees))
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def predict_transformed(self, transformed_feature: np.ndarray) -> np.ndarray:
+        try:
+            if self.estimator_type == LINEAR_ESTIMATOR:
+                return transformed_feature @ self.arrays["coef"] + self.arrays["intercept"][0]
+
+            # sklearn trees compare float32 features against float64 thresholds
+            transformed_feature = transformed_feature.astype(np.float32)
+            children_left = self.arrays["children_left"]
+            children_right = self.arrays["children_right"]
+            feature = self.arrays["feature"]
+            threshold = self.arrays["threshold"]
+
+            rows = np.arange(transformed_feature.shape[0])[:, None]
+            node = np.repeat(self.arrays["tree_roots"][None, :], transformed_feature.shape[0], axis=0)
+            for _ in range(self.max_depth):
+                left = children_left[node]
+                is_leaf = left == TREE_LEAF
+                if is_leaf.all():
+                    break
+                go_left = transformed_feature[rows, np.maximum(feature[node], 0)] <= threshold[node]
+                node = np.where(is_leaf, node, np.where(go_left, left, children_right[node]))
+            return self.arrays["value"][node].mean(axis=1)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def predict_array(self, numerical_values, categorical_values):
+        return self.predict_transformed(self.compiled_preprocessor.transform(numerical_values, categorical_values))
+
+    def transform(self, X):
+        return self.compiled_preprocessor.transform_data_frame(X)
+
+    def predict(self, X):
+        return self.predict_transformed(self.transform(X))
+
+    def __repr__(self):
+        return f"{self.estimator_name}()"
+
+    def __str__(self):
+        return f"{self.estimator_name}()"
+
+
+def save_compact_model(file_path: str, compact_model: CompactHousingModel):
+    """
+    Layout: magic, little endian uint64 header length, json header, then every array
+    at a 64 byte aligned offset recorded in the header.
+    """
+    try:
+        compiled_preprocessor = compact_model.compiled_preprocessor
+        arrays = dict(compact_model.arrays)
+        arrays.update({
+            "impute_values": compiled_preprocessor.impute_values,
+            "mean": compiled_preprocessor.mean,
+            "scale": compiled_preprocessor.scale,
+            "one_hot_values": compiled_preprocessor.one_hot_values,
+        })
+
+        array_info = dict()
+        data_size = 0
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            arrays[name] = array
+            array_info[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": data_size}
+            data_size = _align(data_size + array.nbytes)
+
+        header = json.dumps({
+            "estimator_type": compact_model.estimator_type,
+            "estimator_name": compact_model.estimator_name,
+            "max_depth": compact_model.max_depth,
+            "numerical_columns": compiled_preprocessor.numerical_columns,
+            "categorical_columns": compiled_preprocessor.categorical_columns,
+            "category_impute_values": [str(value) for value in compiled_preprocessor.category_impute_values],
+            "categories": [[str(value) for value in column_categories]
+                           for column_categories in compiled_preprocessor.categories],
+            "arrays": array_info,
+        }).encode("utf-8")
+
+        data_start = _align(len(COMPACT_MODEL_MAGIC) + 8 + len(header))
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "wb") as file_obj:
+            file_obj.write(COMPACT_MODEL_MAGIC)
+            file_obj.write(len(header).to_bytes(8, "little"))
+            file_obj.write(header)
+            for name, array in arrays.items():
+                file_obj.seek(data_start + array_info[name]["offset"])
+                file_obj.write(array.tobytes())
+        logging.info(f"Compact model saved at: [{file_path}]")
+    except Exception as e:
+        raise HousingException(e, sys) from e
+
+
+def load_compact_model(file_path: str) -> CompactHousingModel:
+    try:
+        with open(file_path, "rb") as file_obj:
+            if file_obj.read(len(COMPACT_MODEL_MAGIC)) != COMPACT_MODEL_MAGIC:
+                raise Exception(f"File: [{file_path}] is not a compact model")
+            header_length = int.from_bytes(file_obj.read(8), "little")
+            header = json.loads(file_obj.read(header_length).decode("utf-8"))
+
+        data_start = _align(len(COMPACT_MODEL_MAGIC) + 8 + header_length)
+        buffer = np.memmap(file_path, dtype=np.uint8, mode="r")
+        arrays = dict()
+        for name, info in header["arrays"].items():
+            dtype = np.dtype(info["dtype"])
+            start = data_start + info["offset"]
+            n_bytes = dtype.itemsize * int(np.prod(info["shape"], dtype=np.int64))
+            arrays[name] = buffer[start:start + n_bytes].view(dtype).reshape(info["shape"])
+
+        compiled_preprocessor = CompiledPreprocessor(numerical_columns=header["numerical_columns"],
+                                                     categorical_columns=header["categorical_columns"],
+                                                     impute_values=arrays.pop("impute_values"),
+                                                     mean=arrays.pop("mean"),
+                                                     scale=arrays.pop("scale"),
+                                                     category_impute_values=header["category_impute_values"],
+                                                     categories=header["categories"],
+                                                     one_hot_values=arrays.pop("one_hot_values"))
+        return CompactHousingModel(compiled_preprocessor=compiled_preprocessor,
+                                   estimator_type=header["estimator_type"],
+                                   estimator_name=header["estimator_name"],
+                                   arrays=arrays,
+                                   max_depth=header["max_depth"])
+    except Exception as e:
+        raise HousingException(e, sys) from e
@@ -0,0 +1,127 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+from housing.exception import HousingException
+
+
+class CompiledPreprocessor:
+    """
+    Fitted preprocessing object of get_data_transformer_object flattened into plain numpy arrays.
+    transform works on raw float and category arrays without pandas or sklearn validation and
+    repeats the exact arithmetic of the sklearn pipelines so that both produce identical features.
+    """
+
+    def __init__(self, numerical_columns: list, categorical_columns: list, impute_values, mean, scale,
+                 category_impute_values: list, categories: list, one_hot_values):
+        try:
+            self.numerical_columns = list(numerical_columns)
+            self.categorical_columns = list(categorical_columns)
+
+            self.impute_values = np.asarray(impute_values, dtype=np.float64)
+            self.mean = np.asarray(mean, dtype=np.float64)
+            self.scale = np.asarray(scale, dtype=np.float64)
+
+            self.category_impute_values = list(category_impute_values)
+            self.categories = [np.asarray(column_categories, dtype=object) for column_categories in categories]
+            # first output column of every categorical column and the value a hot category takes after scaling
+            self.category_column_offsets = len(self.numerical_columns) + np.concatenate(
+                [[0], np.cumsum([len(column_categories) for column_categories in self.categories])[:-1]]).astype(np.int64)
+            self.one_hot_values = np.asarray(one_hot_values, dtype=np.float64)
+
+            self.n_features = len(self.numerical_columns) + sum(len(column_categories) for column_categories in self.categories)
+        except Exception as e:
+            raise HousingException(e,sys) from e
+
+    @classmethod
+    def from_preprocessing_object(cls, preprocessing_object) -> "CompiledPreprocessor":
+        """
+        preprocessing_object: fitted ColumnTransformer of DataTransformation.get_data_transformer_object
+        """
+        try:
+            transformers = [transformer for transformer in preprocessing_object.transformers_
+                            if transformer[0] != 'remainder' or transformer[1] != 'drop']
+            if [name for name, _, _ in transformers] != ['num_pipeline', 'cat_pipeline']:
+                raise Exception(f"Unsupported preprocessing object: {preprocessing_object}")
+            (_, num_pipeline, numerical_cols), (_, cat_pipeline, categorical_cols) = transformers
+
+            num_imputer = num_pipeline.named_steps['impute']
+            num_scaler = num_pipeline.named_steps['scaler']
+            cat_imputer = cat_pipeline.named_steps['impute']
+            one_hot_encoder = cat_pipeline.named_steps['one_hot_encoder']
+            cat_scaler = cat_pipeline.named_steps['scaler']
+
+            return cls(numerical_columns=numerical_cols,
+                       categorical_columns=categorical_cols,
+                       impute_values=num_imputer.statistics_,
+                       mean=num_scaler.mean_,
+                       scale=num_scaler.scale_,
+                       category_impute_values=cat_imputer.statistics_,
+                       categories=one_hot_encoder.categories_,
+                       one_hot_values=1 / np.asarray(cat_scaler.scale_, dtype=np.float64))
+        except Exception as e:
+            raise HousingException(e,sys) from e
+
+    def transform(self, numerical_values, categorical_values) -> np.ndarray:
+        """
+        numerical_values: 2d array-like of shape (n_rows, len(numerical_columns))
+        categorical_values: 2d array-like of shape (n_rows, len(categorical_columns))
+        """
+        try:
+            numerical_values = np.array(numerical_values, dtype=np.float64, ndmin=2)
+            categorical_values = np.array(categorical_values, dtype=object, ndmin=2)
+            n_rows = numerical_values.shape[0]
+
+            transformed = np.zeros((n_rows, self.n_features), dtype=np.float64)
+            numerical_part = transformed[:, :len(self.numerical_columns)]
+            numerical_part[:] = numerical_values
+            missing_rows, missing_cols = np.nonzero(np.isnan(numerical_part))
+            numerical_part[missing_rows, missing_cols] = self.impute_values[missing_cols]
+            numerical_part -= self.mean
+            numerical_part /= self.scale
+
+            rows = np.arange(n_rows)
+            for col, categories in enumerate(self.categories):
+                values = categorical_values[:, col]
+                missing_mask = pd.isna(values)
+                if missing_mask.any():
+                    values = values.copy()
+                    values[missing_mask] = self.category_impute_values[col]
+                category_index = np.searchsorted(categories, values)
+                category_index[category_index == len(categories)] = 0
+                unknown_mask = categories[category_index] != values
+                if unknown_mask.any():
+                    raise Exception(f"Found unknown categories {set(values[unknown_mask])} "
+                                    f"in column [{self.categorical_columns[col]}]")
+                output_columns = self.category_column_offsets[col] + category_index
+                transformed[rows, output_columns] = self.one_hot_values[output_columns - len(self.numerical_columns)]
+            return transformed
+        except Exception as e:
+            raise HousingException(e,sys) from e
+
+    def transform_data_frame(self, input_df: pd.DataFrame) -> np.ndarray:
+        try:
+            return self.transform(numerical_values=input_df[self.numerical_columns].to_numpy(dtype=np.float64),
+                                  categorical_values=input_df[self.categorical_columns].to_numpy(dtype=object))
+        except Exception as e:
+            raise HousingException(e,sys) from e
+
+    def get_sample_data_frame(self, n_rows: int = 256, random_state: int = 42) -> pd.DataFrame:
+        """
+        Synthetic raw input spread around the fitted statistics with missing values and every category,
+        used to check the compiled path against the sklearn path.
+        """
+        try:
+            random_generator = np.random.default_rng(random_state)
+            numerical_values = self.mean + self.scale * random_generator.standard_normal(
+                (n_rows, len(self.numerical_columns)))
+            numerical_values[random_generator.random(numerical_values.shape) < 0.05] = np.nan
+            sample_df = pd.DataFrame(numerical_values, columns=self.numerical_columns)
+            for col, categories in enumerate(self.categories):
+                values = np.resize(categories, n_rows).astype(object)
+                values[random_generator.random(n_rows) < 0.05] = np.nan
+                sample_df[self.categorical_columns[col]] = values
+            return sample_df
+        except Exception as e:
+            raise HousingException(e,sys) from e
@@ -3,19 +3,27 @@ from collections import namedtuple
 
 DataIngestionConfig=namedtuple('DataIngestionConfig', 
                                ['dataset_download_url','tgz_download_dir','raw_data_dir',
-                                'ingested_train_dir','ingested_test_dir'])
+                                'ingested_train_dir','ingested_test_dir','raw_data_path',
+                                'schema_file_path','chunk_size','workers','split_seed','split_key_columns',
+                                'split_tolerance'])
 
 
-DataValidationConfig = namedtuple("DataValidationConfig", ["schema_file_path","report_file_path","report_page_file_path"])
+DataValidationConfig = namedtuple("DataValidationConfig", ["schema_file_path","report_file_path","report_page_file_path",
+                                                           "schema_report_file_path","chunk_size",
+                                                           "reference_sketch_file_path","sketch_relative_accuracy",
+                                                           "drift_psi_threshold"])
 
 
 DataTransformationConfig = namedtuple("DataTransformationConfig", ["add_bedroom_per_room",
                                                                    "transformed_train_dir",
                                                                    "transformed_test_dir",
-                                                                   "preprocessed_object_file_path"])
+                                                                   "preprocessed_object_file_path",
+                                                                   "transformed_dtype",
+                                                                   "sparse_density_threshold"])
 
 
-ModelTrainerConfig = namedtuple("ModelTrainerConfig", ["trained_model_file_path","base_accuracy","model_config_file_path"])
+ModelTrainerConfig = namedtuple("ModelTrainerConfig", ["trained_model_file_path","base_accuracy","model_config_file_path",
+                                                       "cv_cache_dir","cv_cache_max_entries"])
 
 
 ModelEvaluationConfig = namedtuple("ModelEvaluationConfig", ["model_evaluation_file_path","time_stamp"])
@@ -24,4 +32,15 @@ ModelEvaluationConfig = namedtuple("ModelEvaluationConfig", ["model_evaluation_f
 ModelPusherConfig = namedtuple("ModelPusherConfig", ["export_dir_path"])
 
 
-TrainingPipelineConfig = namedtuple("TrainingPipelineConfig", ["artifact_dir"])
\ No newline at end of file
+ServingConfig = namedtuple("ServingConfig", ["model_dir", "model_reload_interval", "schema_file_path", "max_batch_size",
+                                             "coalesce_enabled", "coalesce_window_ms", "coalesce_max_batch_size",
+                                             "coalesce_max_queue_depth", "coalesce_timeout_ms", "cache_enabled", "cache_max_size",
+                                             "cache_ttl_seconds", "cache_float_decimals", "workers", "threads",
+                                             "max_requests", "max_requests_jitter", "graceful_timeout",
+                                             "asgi_executor_workers", "asgi_max_pending", "metrics_enabled",
+                                             "import_time_budget_ms"])
+
+
+TrainingPipelineConfig = namedtuple("TrainingPipelineConfig", ["artifact_dir","stage_cache_enabled","max_parallel_stages",
+                                                               "job_dir","job_workers","job_poll_interval",
+                                                               "shared_artifact_dir","job_lease_seconds"])
\ No newline at end of file
@@ -0,0 +1,187 @@
+"""
+Persistent cache of cross validation results, one json file per (training data, estimator, params, cv) point.
+
+usage: python -m housing.entity.cv_result_cache --cache-dir housing/artifact/model_trainer/cv_cache [--estimator RandomForestRegressor]
+prints the stored results in the layout of cv_results_.
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from housing.logger import logging
+from housing.exception import HousingException
+
+CV_RESULT_FILE_EXTENSION = ".json"
+# cv_results_ columns stored for every grid point, split scores are added per fold
+CV_RESULT_COLUMNS = ["mean_fit_time", "std_fit_time", "mean_score_time", "std_score_time",
+                     "mean_test_score", "std_test_score"]
+
+
+def _to_json_value(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+class CVResultCache:
+    """
+    Entries are evicted least recently used first once max_entries is exceeded,
+    a cache hit refreshes the modification time of its file.
+    """
+
+    def __init__(self, cache_dir: str, max_entries: int = 100000):
+        try:
+            self.cache_dir = cache_dir
+            self.max_entries = max_entries
+            os.makedirs(self.cache_dir, exist_ok=True)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    @staticmethod
+    def get_data_fingerprint(input_feature, output_feature) -> str:
+        try:
+            digest = hashlib.sha256()
+            for data in (input_feature, output_feature):
+                if sparse.issparse(data):
+                    data = sparse.csr_matrix(data)
+                    digest.update(f"csr{data.dtype.str}{data.shape}".encode())
+                    for part in (data.data, data.indices, data.indptr):
+                        digest.update(np.ascontiguousarray(part).tobytes())
+                elif isinstance(data, (pd.DataFrame, pd.Series)):
+                    digest.update(json.dumps([str(name) for name in getattr(data, "columns", [data.name])]).encode())
+                    digest.update(pd.util.hash_pandas_object(data, index=False).values.tobytes())
+                else:
+                    data = np.ascontiguousarray(data)
+                    digest.update(f"{data.dtype.str}{data.shape}".encode())
+                    digest.update(data.tobytes())
+            return digest.hexdigest()
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    @staticmethod
+    def get_key(data_fingerprint: str, estimator, cv, scoring) -> str:
+        """
+        estimator: estimator with the candidate params already set
+        cv: cross validation splitter as returned by sklearn check_cv
+        """
+        try:
+            key_data = json.dumps({
+                "data": data_fingerprint,
+                "estimator": f"{type(estimator).__module__}.{type(estimator).__name__}",
+                "params": estimator.get_params(deep=True),
+                "cv": repr(cv),
+                "scoring": repr(scoring),
+            }, sort_keys=True, default=_to_json_value)
+            return hashlib.sha256(key_data.encode()).hexdigest()
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_file_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{CV_RESULT_FILE_EXTENSION}")
+
+    def get(self, key: str) -> dict:
+        """
+        return: stored cv result of the grid point or None
+        """
+        try:
+            file_path = self.get_file_path(key)
+            try:
+                with open(file_path) as file_obj:
+                    cv_result = json.load(file_obj)
+                os.utime(file_path)
+            except (FileNotFoundError, json.JSONDecodeError):
+                return None
+            return cv_result
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def put(self, key: str, cv_result: dict):
+        try:
+            file_path = self.get_file_path(key)
+            tmp_file_path = f"{file_path}.{os.getpid()}.tmp"
+            with open(tmp_file_path, "w") as file_obj:
+                json.dump(cv_result, file_obj, default=_to_json_value)
+            os.replace(tmp_file_path, file_path)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_entry_file_paths(self) -> list:
+        return [os.path.join(self.cache_dir, file_name) for file_name in os.listdir(self.cache_dir)
+                if file_name.endswith(CV_RESULT_FILE_EXTENSION)]
+
+    def evict(self) -> int:
+        """
+        return: number of evicted entries
+        """
+        try:
+            file_paths = self.get_entry_file_paths()
+            n_evict = len(file_paths) - self.max_entries
+            if n_evict <= 0:
+                return 0
+
+            def get_mtime(file_path):
+                try:
+                    return os.path.getmtime(file_path)
+                except FileNotFoundError:
+                    return 0.0
+
+            for file_path in sorted(file_paths, key=get_mtime)[:n_evict]:
+                try:
+                    os.remove(file_path)
+                except FileNotFoundError:
+                    pass
+            logging.info(f"Evicted [{n_evict}] cv results from: [{self.cache_dir}]")
+            return n_evict
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_cv_results(self, estimator_name: str = None, data_fingerprint: str = None) -> pd.DataFrame:
+        """
+        return: stored results with one row per grid point, columns as in cv_results_
+        """
+        try:
+            rows = []
+            for file_path in self.get_entry_file_paths():
+                try:
+                    with open(file_path) as file_obj:
+                        cv_result = json.load(file_obj)
+                except (FileNotFoundError, json.JSONDecodeError):
+                    continue
+                if estimator_name is not None and not cv_result["estimator"].endswith(estimator_name):
+                    continue
+                if data_fingerprint is not None and cv_result["data_fingerprint"] != data_fingerprint:
+                    continue
+                rows.append({"key": os.path.basename(file_path)[:-len(CV_RESULT_FILE_EXTENSION)],
+                             "last_used": time.strftime("%Y-%m-%d %H:%M:%S",
+                                                        time.localtime(os.path.getmtime(file_path))),
+                             **cv_result})
+            return pd.DataFrame(rows)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+
+def main():
+    from housing.config.configuration import Configuration
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cache-dir", default=None)
+    parser.add_argument("--estimator", default=None)
+    parser.add_argument("--data-fingerprint", default=None)
+    args = parser.parse_args()
+
+    cache_dir = args.cache_dir or Configuration().get_model_trainer_config().cv_cache_dir
+    cv_results = CVResultCache(cache_dir=cache_dir).get_cv_results(estimator_name=args.estimator,
+                                                                  data_fingerprint=args.data_fingerprint)
+    with pd.option_context("display.max_rows", None, "display.max_columns", None, "display.width", 200):
+        print(cv_results)
+
+
+if __name__ == "__main__":
+    main()
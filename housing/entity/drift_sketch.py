@@ -0,0 +1,322 @@
+"""
+Mergeable per-column sketches of a dataset and the drift statistics between two of them.
+
+Numeric columns are summarized by a log bucketed histogram: a value v falls in bucket ceil(log(|v|) / log(gamma))
+with gamma = (1 + relative_accuracy) / (1 - relative_accuracy), so every quantile is known within
+relative_accuracy whatever the range of the column. Categorical columns keep a count per category.
+Sketches built on separate chunks, files or runs merge by adding bucket counts, so a long reference
+window is compared against without re-reading it.
+"""
+import sys
+import json
+import math
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from housing.logger import logging
+from housing.exception import HousingException
+
+# absolute values below it fall in the zero bucket
+MIN_INDEXED_VALUE = 1e-9
+ZERO_BUCKET_KEY = 0
+PSI_BIN_COUNT = 10
+# floor of bin proportions so that empty bins keep the psi finite
+PSI_EPSILON = 1e-4
+NUMERIC_SKETCH_TYPE = "numeric"
+CATEGORICAL_SKETCH_TYPE = "categorical"
+
+
+class NumericSketch:
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        try:
+            self.relative_accuracy = relative_accuracy
+            self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+            self.log_gamma = math.log(self.gamma)
+            # positive buckets are keyed above the zero bucket and negative ones below it,
+            # so sorted keys follow the order of the values
+            self.key_offset = 1 - math.ceil(math.log(MIN_INDEXED_VALUE) / self.log_gamma)
+            self.bucket_counts = dict()
+            self.null_count = 0
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    @property
+    def count(self) -> int:
+        return sum(self.bucket_counts.values())
+
+    def update(self, values: np.ndarray):
+        try:
+            values = np.asarray(values, dtype=float)
+            null_mask = np.isnan(values)
+            self.null_count += int(null_mask.sum())
+            values = values[~null_mask]
+
+            keys = np.full(len(values), ZERO_BUCKET_KEY, dtype=np.int64)
+            indexed_mask = np.abs(values) >= MIN_INDEXED_VALUE
+            indexed_values = values[indexed_mask]
+            indexed_keys = np.ceil(np.log(np.abs(indexed_values)) / self.log_gamma).astype(np.int64) + self.key_offset
+            keys[indexed_mask] = np.where(indexed_values > 0, indexed_keys, -indexed_keys)
+
+            for key, count in zip(*np.unique(keys, return_counts=True)):
+                self.bucket_counts[int(key)] = self.bucket_counts.get(int(key), 0) + int(count)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def merge(self, other: "NumericSketch"):
+        try:
+            if other.relative_accuracy != self.relative_accuracy:
+                raise Exception(f"Cannot merge sketches of relative accuracy [{self.relative_accuracy}] "
+                                f"and [{other.relative_accuracy}]")
+            for key, count in other.bucket_counts.items():
+                self.bucket_counts[key] = self.bucket_counts.get(key, 0) + count
+            self.null_count += other.null_count
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_bucket_value(self, key: int) -> float:
+        if key == ZERO_BUCKET_KEY:
+            return 0.0
+        value = 2 * self.gamma ** (abs(key) - self.key_offset) / (self.gamma + 1)
+        return value if key > 0 else -value
+
+    def get_cumulative_counts(self, keys: np.ndarray) -> np.ndarray:
+        """
+        return: number of values in the buckets up to each of keys, keys sorted ascending
+        """
+        sketch_keys = np.array(sorted(self.bucket_counts), dtype=np.int64)
+        cumulative_counts = np.cumsum([self.bucket_counts[key] for key in sketch_keys])
+        positions = np.searchsorted(sketch_keys, keys, side="right")
+        return np.where(positions > 0, cumulative_counts[np.maximum(positions - 1, 0)], 0)
+
+    def get_quantile(self, quantile: float) -> float:
+        try:
+            keys = sorted(self.bucket_counts)
+            rank = quantile * (self.count - 1)
+            cumulative_count = 0
+            for key in keys:
+                cumulative_count += self.bucket_counts[key]
+                if cumulative_count > rank:
+                    return self.get_bucket_value(key)
+            return self.get_bucket_value(keys[-1])
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def to_dict(self) -> dict:
+        return {"type": NUMERIC_SKETCH_TYPE,
+                "relative_accuracy": self.relative_accuracy,
+                "null_count": self.null_count,
+                "bucket_counts": {str(key): count for key, count in self.bucket_counts.items()}}
+
+    @classmethod
+    def from_dict(cls, sketch_dict: dict) -> "NumericSketch":
+        sketch = cls(relative_accuracy=sketch_dict["relative_accuracy"])
+        sketch.null_count = sketch_dict["null_count"]
+        sketch.bucket_counts = {int(key): count for key, count in sketch_dict["bucket_counts"].items()}
+        return sketch
+
+
+class CategoricalSketch:
+
+    def __init__(self):
+        self.category_counts = dict()
+        self.null_count = 0
+
+    @property
+    def count(self) -> int:
+        return sum(self.category_counts.values())
+
+    def update(self, values: pd.Series):
+        try:
+            self.null_count += int(values.isna().sum())
+            for category, count in values.dropna().astype(str).value_counts().items():
+                self.category_counts[category] = self.category_counts.get(category, 0) + int(count)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def merge(self, other: "CategoricalSketch"):
+        for category, count in other.category_counts.items():
+            self.category_counts[category] = self.category_counts.get(category, 0) + count
+        self.null_count += other.null_count
+
+    def to_dict(self) -> dict:
+        return {"type": CATEGORICAL_SKETCH_TYPE,
+                "null_count": self.null_count,
+                "category_counts": self.category_counts}
+
+    @classmethod
+    def from_dict(cls, sketch_dict: dict) -> "CategoricalSketch":
+        sketch = cls()
+        sketch.null_count = sketch_dict["null_count"]
+        sketch.category_counts = dict(sketch_dict["category_counts"])
+        return sketch
+
+
+class DatasetSketch:
+    """
+    One sketch per column of a dataset, built in a single streaming pass over csv chunks.
+    data_hashes: hashes of the datasets merged into the sketch, so that one is never counted twice
+    """
+
+    def __init__(self, numerical_columns: list, categorical_columns: list, relative_accuracy: float = 0.01):
+        try:
+            self.relative_accuracy = relative_accuracy
+            self.data_hashes = []
+            self.column_sketches = {column: NumericSketch(relative_accuracy=relative_accuracy)
+                                    for column in numerical_columns}
+            self.column_sketches.update({column: CategoricalSketch() for column in categorical_columns})
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def update(self, data_frame: pd.DataFrame):
+        try:
+            for column, sketch in self.column_sketches.items():
+                if column not in data_frame.columns:
+                    continue
+                if isinstance(sketch, NumericSketch):
+                    sketch.update(pd.to_numeric(data_frame[column], errors="coerce").to_numpy())
+                else:
+                    sketch.update(data_frame[column])
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def merge(self, other: "DatasetSketch"):
+        try:
+            for column, sketch in other.column_sketches.items():
+                if column in self.column_sketches:
+                    self.column_sketches[column].merge(sketch)
+                else:
+                    self.column_sketches[column] = sketch
+            self.data_hashes.extend(data_hash for data_hash in other.data_hashes if data_hash not in self.data_hashes)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    @classmethod
+    def from_csv(cls, file_path: str, numerical_columns: list, categorical_columns: list,
+                 relative_accuracy: float = 0.01, chunk_size: int = 100000) -> "DatasetSketch":
+        try:
+            dataset_sketch = cls(numerical_columns=numerical_columns, categorical_columns=categorical_columns,
+                                 relative_accuracy=relative_accuracy)
+            dtype = {column: str for column in categorical_columns}
+            for chunk_df in pd.read_csv(file_path, dtype=dtype, chunksize=chunk_size):
+                dataset_sketch.update(chunk_df)
+            return dataset_sketch
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def save(self, file_path: str):
+        try:
+            with open(file_path, "w") as file_obj:
+                json.dump({"relative_accuracy": self.relative_accuracy,
+                           "data_hashes": self.data_hashes,
+                           "columns": {column: sketch.to_dict() for column, sketch in self.column_sketches.items()}},
+                          file_obj)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    @classmethod
+    def load(cls, file_path: str) -> "DatasetSketch":
+        try:
+            with open(file_path) as file_obj:
+                sketch_content = json.load(file_obj)
+            dataset_sketch = cls(numerical_columns=[], categorical_columns=[],
+                                 relative_accuracy=sketch_content["relative_accuracy"])
+            dataset_sketch.data_hashes = list(sketch_content.get("data_hashes", []))
+            for column, sketch_dict in sketch_content["columns"].items():
+                sketch_type = NumericSketch if sketch_dict["type"] == NUMERIC_SKETCH_TYPE else CategoricalSketch
+                dataset_sketch.column_sketches[column] = sketch_type.from_dict(sketch_dict)
+            return dataset_sketch
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+
+def get_psi(reference_proportions: np.ndarray, current_proportions: np.ndarray) -> float:
+    reference_proportions = np.maximum(reference_proportions, PSI_EPSILON)
+    current_proportions = np.maximum(current_proportions, PSI_EPSILON)
+    return float(np.sum((current_proportions - reference_proportions)
+                        * np.log(current_proportions / reference_proportions)))
+
+
+def get_numeric_drift(reference: NumericSketch, current: NumericSketch) -> dict:
+    """
+    ks: largest distance between the bucketed cdfs, with its asymptotic p value
+    psi: over PSI_BIN_COUNT bins holding equal shares of the reference
+    """
+    try:
+        n_reference, n_current = reference.count, current.count
+        keys = np.array(sorted(set(reference.bucket_counts) | set(current.bucket_counts)), dtype=np.int64)
+        reference_cdf = reference.get_cumulative_counts(keys) / n_reference
+        current_cdf = current.get_cumulative_counts(keys) / n_current
+        ks_statistic = float(np.max(np.abs(reference_cdf - current_cdf)))
+        ks_p_value = float(stats.kstwobign.sf(ks_statistic * math.sqrt(n_reference * n_current
+                                                                      / (n_reference + n_current))))
+
+        # last bucket of each reference decile, the final edge takes every remaining bucket
+        bin_edges = np.unique(keys[np.minimum(np.searchsorted(reference_cdf, np.arange(1, PSI_BIN_COUNT) / PSI_BIN_COUNT),
+                                              len(keys) - 1)])
+        bin_edges = np.append(bin_edges[bin_edges < keys[-1]], keys[-1])
+        reference_proportions = np.diff(reference.get_cumulative_counts(bin_edges), prepend=0) / n_reference
+        current_proportions = np.diff(current.get_cumulative_counts(bin_edges), prepend=0) / n_current
+
+        return {"ks_statistic": ks_statistic,
+                "ks_p_value": ks_p_value,
+                "psi": get_psi(reference_proportions, current_proportions),
+                "reference_median": reference.get_quantile(0.5),
+                "current_median": current.get_quantile(0.5)}
+    except Exception as e:
+        raise HousingException(e, sys) from e
+
+
+def get_categorical_drift(reference: CategoricalSketch, current: CategoricalSketch) -> dict:
+    try:
+        categories = sorted(set(reference.category_counts) | set(current.category_counts))
+        reference_counts = np.array([reference.category_counts.get(category, 0) for category in categories])
+        current_counts = np.array([current.category_counts.get(category, 0) for category in categories])
+        if len(categories) > 1:
+            chi_square_statistic, chi_square_p_value, _, _ = stats.chi2_contingency(
+                np.vstack([reference_counts, current_counts]))
+        else:
+            chi_square_statistic, chi_square_p_value = 0.0, 1.0
+        return {"chi_square_statistic": float(chi_square_statistic),
+                "chi_square_p_value": float(chi_square_p_value),
+                "psi": get_psi(reference_counts / reference_counts.sum(), current_counts / current_counts.sum())}
+    except Exception as e:
+        raise HousingException(e, sys) from e
+
+
+def get_drift_report(reference: DatasetSketch, current: DatasetSketch, psi_threshold: float = 0.2) -> dict:
+    """
+    A column drifts when its psi exceeds psi_threshold. The ks and chi square p values are reported as well,
+    on large datasets they flag differences too small to matter.
+    """
+    try:
+        column_reports = dict()
+        for column, reference_sketch in reference.column_sketches.items():
+            current_sketch = current.column_sketches.get(column)
+            if current_sketch is None or reference_sketch.count == 0 or current_sketch.count == 0:
+                continue
+            if isinstance(reference_sketch, NumericSketch):
+                column_report = get_numeric_drift(reference_sketch, current_sketch)
+            else:
+                column_report = get_categorical_drift(reference_sketch, current_sketch)
+            column_report.update({
+                "reference_null_rate": reference_sketch.null_count / (reference_sketch.count + reference_sketch.null_count),
+                "current_null_rate": current_sketch.null_count / (current_sketch.count + current_sketch.null_count),
+                "drift_detected": column_report["psi"] > psi_threshold,
+            })
+            column_reports[column] = column_report
+
+        n_drifted_columns = sum(column_report["drift_detected"] for column_report in column_reports.values())
+        drift_report = {
+            "psi_threshold": psi_threshold,
+            "n_columns": len(column_reports),
+            "n_drifted_columns": n_drifted_columns,
+            "dataset_drift": n_drifted_columns > 0,
+            "columns": column_reports,
+        }
+        logging.info(f"Drift found in [{n_drifted_columns}] of [{len(column_reports)}] columns")
+        return drift_report
+    except Exception as e:
+        raise HousingException(e, sys) from e
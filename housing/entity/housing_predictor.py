@@ -1,12 +1,28 @@
 import os
 import sys
+import time
+from collections import namedtuple
+from threading import Lock, Thread
 
-from housing.exception import HousingException
+from housing.logger import logging
+from housing.exception import HousingException, HousingValidationError
 from housing.util.util import load_object
+from housing.constant import NUMERICAL_COLUMN_KEY, CATEGORICAL_COLUMN_KEY, COMPACT_MODEL_FILE_NAME
+from housing.entity.compact_model import load_compact_model
+from housing.entity.schema_validator import SchemaValidator
+from housing.util.metrics import NULL_REQUEST_TIMER
 
+import numpy as np
 import pandas as pd
 
 
+LoadedModel = namedtuple("LoadedModel", ["model_version", "model_path", "model"])
+
+HousingPrediction = namedtuple("HousingPrediction", ["model_version", "median_house_value"])
+
+HousingBatchPrediction = namedtuple("HousingBatchPrediction", ["model_version", "median_house_value", "row_errors"])
+
+
 class HousingData:
 
     def __init__(self,
@@ -60,29 +76,278 @@ class HousingData:
             raise HousingException(e, sys)
 
 
+class HousingBatchData:
+    """
+    Many housing records scored together.
+    The whole batch is validated against the dataset schema by SchemaValidator,
+    rows failing validation are reported in row_errors and left out of the prediction.
+    """
+
+    def __init__(self, housing_data_frame: pd.DataFrame, schema: dict):
+        try:
+            self.housing_data_frame = housing_data_frame.reset_index(drop=True)
+            self.schema = schema
+            self.numerical_columns = schema[NUMERICAL_COLUMN_KEY]
+            self.categorical_columns = schema[CATEGORICAL_COLUMN_KEY]
+            self.schema_validator = SchemaValidator(schema=schema,
+                                                    required_columns=self.numerical_columns + self.categorical_columns)
+            self.valid_mask = None
+            self.row_errors = None
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    @classmethod
+    def from_records(cls, records: list, schema: dict) -> "HousingBatchData":
+        try:
+            if not isinstance(records, list):
+                raise HousingValidationError("Batch records must be a list of objects")
+            if len(records) == 0:
+                # an empty batch is valid, it only lacks the columns pandas would infer from the records
+                input_columns = schema[NUMERICAL_COLUMN_KEY] + schema[CATEGORICAL_COLUMN_KEY]
+                return cls(housing_data_frame=pd.DataFrame(columns=input_columns), schema=schema)
+            if not all(isinstance(record, dict) for record in records):
+                raise HousingValidationError("Batch records must be a list of objects")
+            return cls(housing_data_frame=pd.DataFrame.from_records(records), schema=schema)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    @classmethod
+    def from_csv(cls, csv_file, schema: dict) -> "HousingBatchData":
+        try:
+            # categorical columns are read as text so that validation sees the raw values
+            dtype = {column: str for column in schema[CATEGORICAL_COLUMN_KEY]}
+            return cls(housing_data_frame=pd.read_csv(csv_file, dtype=dtype), schema=schema)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def __len__(self):
+        return len(self.housing_data_frame)
+
+    def validate(self):
+        """
+        Checks every column of the batch at once.
+        return: boolean mask of valid rows and a dict of row number to list of error messages
+        """
+        try:
+            if self.valid_mask is not None:
+                return self.valid_mask, self.row_errors
+
+            validation_result = self.schema_validator.validate_frame(self.housing_data_frame, collect_row_errors=True)
+            valid_mask, row_errors = validation_result.valid_mask, validation_result.row_errors
+
+            self.valid_mask, self.row_errors = valid_mask, row_errors
+            logging.info(f"Batch validated: [{int(valid_mask.sum())}] of [{len(valid_mask)}] rows are valid")
+            return self.valid_mask, self.row_errors
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_valid_data_frame(self) -> pd.DataFrame:
+        try:
+            valid_mask, _ = self.validate()
+            input_columns = self.numerical_columns + self.categorical_columns
+            return self.housing_data_frame.loc[valid_mask, input_columns]
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+
+class ResidentModel:
+    """
+    Keeps the latest model exported under model_dir loaded in memory.
+    One instance is shared per model_dir across the whole process. A newer version folder
+    dropped by ModelPusher is loaded in a background thread and swapped in with a single
+    reference assignment, so in-flight predictions keep using the model they started with.
+    """
+    _instances = dict()
+    _instances_lock = Lock()
+
+    def __init__(self, model_dir: str, model_reload_interval: float):
+        try:
+            self.model_dir = model_dir
+            self.model_reload_interval = model_reload_interval
+            self.loaded_model: LoadedModel = None
+            self._model_dir_mtime = None
+            self._next_check_time = 0.0
+            self._reload_lock = Lock()
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    @classmethod
+    def get_instance(cls, model_dir: str, model_reload_interval: float = 5) -> "ResidentModel":
+        try:
+            model_dir = os.path.abspath(model_dir)
+            with cls._instances_lock:
+                if model_dir not in cls._instances:
+                    cls._instances[model_dir] = cls(model_dir=model_dir,
+                                                    model_reload_interval=model_reload_interval)
+                return cls._instances[model_dir]
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_latest_model_version(self) -> str:
+        try:
+            # folders being staged by ModelPusher are not digit named and are skipped
+            model_versions = [folder_name for folder_name in os.listdir(self.model_dir) if folder_name.isdigit()]
+            if len(model_versions) == 0:
+                raise Exception(f"No model found in model dir: [{self.model_dir}]")
+            return max(model_versions, key=int)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_model_path(self, model_version: str) -> str:
+        try:
+            model_version_dir = os.path.join(self.model_dir, model_version)
+            file_names = os.listdir(model_version_dir)
+            # the memory mapped compact model is preferred over the pickled one when it was exported
+            if COMPACT_MODEL_FILE_NAME in file_names:
+                file_name = COMPACT_MODEL_FILE_NAME
+            else:
+                file_name = [name for name in file_names if name != COMPACT_MODEL_FILE_NAME][0]
+            return os.path.join(model_version_dir, file_name)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    @staticmethod
+    def load_model(model_path: str):
+        try:
+            if os.path.basename(model_path) == COMPACT_MODEL_FILE_NAME:
+                return load_compact_model(file_path=model_path)
+            return load_object(file_path=model_path)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def reload(self, blocking: bool = True) -> LoadedModel:
+        """
+        Loads the latest model version if it is newer than the resident one.
+        When another thread is already reloading and blocking is False, the resident model is returned.
+        """
+        if not self._reload_lock.acquire(blocking=blocking):
+            return self.loaded_model
+        try:
+            model_dir_mtime = os.stat(self.model_dir).st_mtime_ns
+            model_version = self.get_latest_model_version()
+            if self.loaded_model is None or int(model_version) > int(self.loaded_model.model_version):
+                model_path = self.get_model_path(model_version=model_version)
+                logging.info(f"Loading model version: [{model_version}] from: [{model_path}]")
+                self.loaded_model = LoadedModel(model_version=model_version,
+                                                model_path=model_path,
+                                                model=ResidentModel.load_model(model_path=model_path))
+                logging.info(f"Model version: [{model_version}] is now serving predictions")
+            self._model_dir_mtime = model_dir_mtime
+            return self.loaded_model
+        except Exception as e:
+            raise HousingException(e, sys) from e
+        finally:
+            self._reload_lock.release()
+
+    def _reload_in_background(self):
+        try:
+            self.reload(blocking=False)
+        except Exception as e:
+            logging.info(f"Model reload failed, keeping model version: "
+                         f"[{self.loaded_model.model_version}]. {e}")
+
+    def is_reload_due(self) -> bool:
+        try:
+            now = time.monotonic()
+            if now < self._next_check_time:
+                return False
+            self._next_check_time = now + self.model_reload_interval
+            # a new version folder changes the mtime of model_dir, so a stat is enough to detect a push
+            return os.stat(self.model_dir).st_mtime_ns != self._model_dir_mtime
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_model(self) -> LoadedModel:
+        try:
+            loaded_model = self.loaded_model
+            if loaded_model is None:
+                return self.reload(blocking=True)
+            if self.is_reload_due() and not self._reload_lock.locked():
+                Thread(target=self._reload_in_background, daemon=True, name="model_reload").start()
+            return loaded_model
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+
 class HousingPredictor:
 
-    def __init__(self, model_dir: str):
+    def __init__(self, model_dir: str, model_reload_interval: float = 5):
         try:
             self.model_dir = model_dir
+            self.is_warm = False
+            self.resident_model = ResidentModel.get_instance(model_dir=model_dir,
+                                                             model_reload_interval=model_reload_interval)
         except Exception as e:
             raise HousingException(e, sys) from e
 
     def get_latest_model_path(self):
         try:
-            folder_name = list(map(int, os.listdir(self.model_dir)))
-            latest_model_dir = os.path.join(self.model_dir, f"{max(folder_name)}")
-            file_name = os.listdir(latest_model_dir)[0]
-            latest_model_path = os.path.join(latest_model_dir, file_name)
-            return latest_model_path
+            model_version = self.resident_model.get_latest_model_version()
+            return self.resident_model.get_model_path(model_version=model_version)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def warm_up(self) -> bool:
+        """
+        Loads the model and runs a small prediction so that the first request does not pay for it.
+        return: True once the model is ready to serve
+        """
+        try:
+            loaded_model = self.resident_model.get_model()
+            compiled_preprocessor = getattr(loaded_model.model, "compiled_preprocessor", None)
+            if compiled_preprocessor is not None:
+                loaded_model.model.predict(compiled_preprocessor.get_sample_data_frame(n_rows=8))
+            logging.info(f"Model version: [{loaded_model.model_version}] is warm")
+            self.is_warm = True
+        except Exception as e:
+            logging.info(f"Model warm up failed: {e}")
+            self.is_warm = False
+        return self.is_warm
+
+    def get_model_version(self) -> str:
+        try:
+            return self.resident_model.get_model().model_version
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def predict_with_version(self, X, request_timer=NULL_REQUEST_TIMER) -> HousingPrediction:
+        try:
+            loaded_model = self.resident_model.get_model()
+            with request_timer.stage("transform"):
+                transformed_feature = loaded_model.model.transform(X)
+            with request_timer.stage("predict"):
+                median_house_value = loaded_model.model.predict_transformed(transformed_feature)
+            return HousingPrediction(model_version=loaded_model.model_version,
+                                     median_house_value=median_house_value)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def predict_batch(self, housing_batch_data: HousingBatchData,
+                      request_timer=NULL_REQUEST_TIMER) -> HousingBatchPrediction:
+        """
+        Scores all valid rows of the batch with a single model.predict call.
+        Rejected rows get nan as prediction and their messages in row_errors.
+        """
+        try:
+            if housing_batch_data.valid_mask is None:
+                with request_timer.stage("validate"):
+                    housing_batch_data.validate()
+            valid_mask, row_errors = housing_batch_data.validate()
+            loaded_model = self.resident_model.get_model()
+            median_house_value = np.full(len(housing_batch_data), np.nan)
+            if valid_mask.any():
+                with request_timer.stage("transform"):
+                    transformed_feature = loaded_model.model.transform(housing_batch_data.get_valid_data_frame())
+                with request_timer.stage("predict"):
+                    median_house_value[valid_mask] = loaded_model.model.predict_transformed(transformed_feature)
+            return HousingBatchPrediction(model_version=loaded_model.model_version,
+                                          median_house_value=median_house_value,
+                                          row_errors=row_errors)
         except Exception as e:
             raise HousingException(e, sys) from e
 
     def predict(self, X):
         try:
-            model_path = self.get_latest_model_path()
-            model = load_object(file_path=model_path)
-            median_house_value = model.predict(X)
-            return median_house_value
+            return self.predict_with_version(X).median_house_value
         except Exception as e:
-            raise HousingException(e, sys) from e
\ No newline at end of file
+            raise HousingException(e, sys) from e
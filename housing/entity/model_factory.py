@@ -1,14 +1,26 @@
 import os,sys
+import time
+import copy
 import numpy as np
 import yaml
 from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 from typing import List
 import importlib
 
 from housing.logger import logging
 from housing.exception import HousingException
+from housing.entity.cv_result_cache import CVResultCache, CV_RESULT_COLUMNS
+from housing.util.util import load_transformed_array_data, split_transformed_array_data
 
+from sklearn.base import clone, is_classifier
 from sklearn.metrics import r2_score, mean_squared_error 
+from sklearn.model_selection import check_cv, GridSearchCV, ParameterGrid, ParameterSampler
+from scipy import sparse
+from joblib import effective_n_jobs
+# threadpoolctl ships with scikit-learn
+from threadpoolctl import threadpool_limits
 
 GRID_SEARCH_KEY = 'grid_search'
 MODULE_KEY = 'module'
@@ -16,10 +28,34 @@ CLASS_KEY = 'class'
 PARAM_KEY = 'params'
 MODEL_SELECTION_KEY = 'model_selection'
 SEARCH_PARAM_GRID_KEY = "search_param_grid"
+SEARCH_PARALLELISM_KEY = "search_parallelism"
+CORE_BUDGET_KEY = "core_budget"
+RANDOM_STATE_KEY = "random_state"
+TIME_BUDGET_SECONDS_KEY = "time_budget_seconds"
+DISTRIBUTION_KEY = "distribution"
+DISTRIBUTION_MODULE = "scipy.stats"
+INCREMENTAL_TRAINING_KEY = "incremental_training"
+ENABLED_KEY = "enabled"
+CHUNK_SIZE_KEY = "chunk_size"
+HOLDOUT_ROWS_KEY = "holdout_rows"
+MAX_EPOCHS_KEY = "max_epochs"
+PATIENCE_KEY = "patience"
+TOLERANCE_KEY = "tol"
+
+# searches that sample candidates instead of walking the whole grid, with the parameter limiting how many
+CANDIDATE_LIMIT_PARAMETER = {"RandomizedSearchCV": "n_iter", "HalvingRandomSearchCV": "n_candidates"}
+# halving searches are still experimental in scikit-learn and have to be enabled before import
+HALVING_SEARCH_ENABLER_MODULE = "sklearn.experimental.enable_halving_search_cv"
+# searches with a fixed candidate list whose cv results can be reused, halving searches depend on the resource schedule
+CACHEABLE_SEARCH_CLASSES = ("GridSearchCV", "RandomizedSearchCV")
 
 
 InitializedModelDetail=namedtuple('InitializedModelDetail',
-                                  ['model_serial_number','model','param_grid_search','model_name'])
+                                  ['model_serial_number','model','param_grid_search','model_name',
+                                   'time_budget_seconds'])
+
+
+SearchResult = namedtuple("SearchResult", ["cv_results", "best_estimator", "best_parameters", "best_score"])
 
 
 GridSearchedBestModel = namedtuple("GridSearchedBestModel", 
@@ -35,17 +71,121 @@ MetricInfoArtifact = namedtuple("MetricInfoArtifact",
                                 ["model_name", "model_object", "train_rmse", "test_rmse", "train_accuracy",
                                  "test_accuracy", "model_accuracy", "index_number"])
 
+RegressionMetric = namedtuple("RegressionMetric", ["train_rmse", "test_rmse", "train_accuracy", "test_accuracy"])
+
+
+# estimator class -> whether it can be fit on a sparse matrix
+_sparse_input_support = dict()
+SPARSE_INPUT_TRIAL_ROWS = 50
 
-def evaluate_regression_model(model_list: list, X_train:np.ndarray, y_train:np.ndarray, X_test:np.ndarray, y_test:np.ndarray, base_accuracy:float=0.6) -> MetricInfoArtifact:
+
+def accepts_sparse_input(estimator, X, y) -> bool:
+    """
+    Uses the estimator tags when scikit-learn provides them, otherwise a trial fit on a few sparse rows.
+    """
+    try:
+        estimator_class = type(estimator)
+        if estimator_class not in _sparse_input_support:
+            supported = None
+            if hasattr(estimator, "__sklearn_tags__"):
+                try:
+                    supported = bool(estimator.__sklearn_tags__().input_tags.sparse)
+                except AttributeError:
+                    supported = None
+            if supported is None:
+                try:
+                    clone(estimator).fit(X[:SPARSE_INPUT_TRIAL_ROWS], y[:SPARSE_INPUT_TRIAL_ROWS])
+                    supported = True
+                except (TypeError, ValueError):
+                    supported = False
+            logging.info(f"{estimator_class.__name__} sparse input support: [{supported}]")
+            _sparse_input_support[estimator_class] = supported
+        return _sparse_input_support[estimator_class]
+    except Exception as e:
+        raise HousingException(e, sys) from e
+
+
+def get_model_input(estimator, X, y):
+    """
+    return: X as it is unless it is sparse and the estimator only accepts dense input
+    """
+    try:
+        if sparse.issparse(X) and not accepts_sparse_input(estimator, X, y):
+            return X.toarray()
+        return X
+    except Exception as e:
+        raise HousingException(e, sys) from e
+
+
+def get_chunked_regression_score(model, X, y, chunk_size: int) -> tuple:
+    """
+    Root mean squared error and r2 score of model predicting X chunk by chunk, so that a memory mapped
+    or sparse X is never loaded or densified at once. The target variance is merged across chunks
+    from their means (Chan et al.) to keep r2 exact.
+    return: rmse, r2
+    """
+    try:
+        n_rows, target_mean, target_m2, squared_error = 0, 0.0, 0.0, 0.0
+        for chunk_start in range(0, y.shape[0], chunk_size):
+            y_chunk = np.asarray(y[chunk_start:chunk_start + chunk_size], dtype=np.float64)
+            y_chunk_pred = model.predict(get_model_input(model, X[chunk_start:chunk_start + chunk_size], y_chunk))
+            squared_error += float(np.sum((y_chunk - y_chunk_pred) ** 2))
+
+            n_chunk_rows, chunk_mean = y_chunk.shape[0], float(y_chunk.mean())
+            chunk_m2 = float(np.sum((y_chunk - chunk_mean) ** 2))
+            delta = chunk_mean - target_mean
+            target_m2 += chunk_m2 + delta ** 2 * n_rows * n_chunk_rows / (n_rows + n_chunk_rows)
+            target_mean += delta * n_chunk_rows / (n_rows + n_chunk_rows)
+            n_rows += n_chunk_rows
+        return np.sqrt(squared_error / n_rows), 1 - squared_error / target_m2
+    except Exception as e:
+        raise HousingException(e, sys) from e
+
+
+def get_regression_metric(model, X_train, y_train, X_test, y_test, chunk_size: int = None) -> RegressionMetric:
+    """
+    chunk_size: predict the datasets in chunks of chunk_size rows, used by the out of core training mode
+    """
+    try:
+        if chunk_size is not None:
+            train_rmse, train_accuracy = get_chunked_regression_score(model, X_train, y_train, chunk_size)
+            test_rmse, test_accuracy = get_chunked_regression_score(model, X_test, y_test, chunk_size)
+            return RegressionMetric(train_rmse=train_rmse, test_rmse=test_rmse,
+                                    train_accuracy=train_accuracy, test_accuracy=test_accuracy)
+
+        #Getting prediction for training and testing dataset
+        y_train_pred = model.predict(get_model_input(model, X_train, y_train))
+        y_test_pred = model.predict(get_model_input(model, X_test, y_test))
+
+        #Calculating r squared score and root mean squared error on training and testing dataset
+        return RegressionMetric(train_rmse=np.sqrt(mean_squared_error(y_train, y_train_pred)),
+                                test_rmse=np.sqrt(mean_squared_error(y_test, y_test_pred)),
+                                train_accuracy=r2_score(y_train, y_train_pred),
+                                test_accuracy=r2_score(y_test, y_test_pred))
+    except Exception as e:
+        raise HousingException(e, sys) from e
+
+
+def get_model_accuracy(metric: RegressionMetric) -> float:
+    """
+    harmonic mean of train_accuracy and test_accuracy
+    """
+    return (2 * (metric.train_accuracy * metric.test_accuracy)) / (metric.train_accuracy + metric.test_accuracy)
+
+
+def evaluate_regression_model(model_list: list, X_train:np.ndarray, y_train:np.ndarray, X_test:np.ndarray, y_test:np.ndarray, base_accuracy:float=0.6,
+                              metric_list: list = None, chunk_size: int = None) -> MetricInfoArtifact:
     """
     Description:
     This function compare multiple regression model return best model
     Params:
-    model_list: List of model
+    model_list: List of model, or of model names when metric_list gives the metrics of every model
     X_train: Training dataset input feature
     y_train: Training dataset target feature
     X_test: Testing dataset input feature
     y_test: Testing dataset input feature
+    metric_list: RegressionMetric already known for each model, models with None are predicted on the datasets
+    chunk_size: predict the datasets in chunks of chunk_size rows instead of at once
     return
     It retured a named tuple
     
@@ -58,24 +198,19 @@ def evaluate_regression_model(model_list: list, X_train:np.ndarray, y_train:np.n
     
         index_number = 0
         metric_info_artifact = None
-        for model in model_list:
+        metric_list = [None] * len(model_list) if metric_list is None else metric_list
+        for model, metric in zip(model_list, metric_list):
             model_name = str(model)  #getting model name based on model object
-            logging.info(f"{'>>'*30}Started evaluating model: [{type(model).__name__}] {'<<'*30}")
-            
-            #Getting prediction for training and testing dataset
-            y_train_pred = model.predict(X_train)
-            y_test_pred = model.predict(X_test)
+            logging.info(f"{'>>'*30}Started evaluating model: [{model_name}] {'<<'*30}")
 
-            #Calculating r squared score on training and testing dataset
-            train_acc = r2_score(y_train, y_train_pred)
-            test_acc = r2_score(y_test, y_test_pred)
-            
-            #Calculating mean squared error on training and testing dataset
-            train_rmse = np.sqrt(mean_squared_error(y_train, y_train_pred))
-            test_rmse = np.sqrt(mean_squared_error(y_test, y_test_pred))
+            if metric is None:
+                metric = get_regression_metric(model, X_train, y_train, X_test, y_test, chunk_size=chunk_size)
+            else:
+                logging.info(f"Reusing stored metrics of the model: {metric}")
+            train_rmse, test_rmse, train_acc, test_acc = metric
 
             # Calculating harmonic mean of train_accuracy and test_accuracy
-            model_accuracy = (2 * (train_acc * test_acc)) / (train_acc + test_acc)
+            model_accuracy = get_model_accuracy(metric)
             diff_test_train_acc = abs(test_acc - train_acc)
             
             #logging all important metric
@@ -136,6 +271,18 @@ def get_sample_model_config_yaml_file(export_dir: str):
                     }
 
                 },
+            },
+            SEARCH_PARALLELISM_KEY: {
+                CORE_BUDGET_KEY: -1,
+                RANDOM_STATE_KEY: 42
+            },
+            INCREMENTAL_TRAINING_KEY: {
+                ENABLED_KEY: False,
+                CHUNK_SIZE_KEY: 50000,
+                HOLDOUT_ROWS_KEY: 50000,
+                MAX_EPOCHS_KEY: 10,
+                PATIENCE_KEY: 2,
+                TOLERANCE_KEY: 0.0001
             }
         }
         os.makedirs(export_dir, exist_ok=True)
@@ -149,7 +296,10 @@ def get_sample_model_config_yaml_file(export_dir: str):
 
 
 class ModelFactory:
-    def __init__(self,model_config_path=None):
+    def __init__(self,model_config_path=None, cv_result_cache: CVResultCache = None):
+        """
+        cv_result_cache: when given, cv results of grid points already evaluated on the same data are reused
+        """
         try:
             self.config=ModelFactory.read_params(model_config_path)
 
@@ -159,6 +309,17 @@ class ModelFactory:
 
             self.models_initialization_config: dict = dict(self.config[MODEL_SELECTION_KEY])
 
+            search_parallelism = dict(self.config.get(SEARCH_PARALLELISM_KEY) or dict())
+            self.core_budget: int = ModelFactory.get_core_budget(search_parallelism.get(CORE_BUDGET_KEY, 1))
+            self.random_state = search_parallelism.get(RANDOM_STATE_KEY)
+
+            self.cv_result_cache = cv_result_cache
+
+            # out of core training of estimators implementing partial_fit
+            self.incremental_training: dict = dict(self.config.get(INCREMENTAL_TRAINING_KEY) or dict())
+            self.incremental_training_enabled: bool = bool(self.incremental_training.get(ENABLED_KEY, False))
+            self.incremental_chunk_size: int = int(self.incremental_training.get(CHUNK_SIZE_KEY, 50000))
+
             self.initialized_model_list = None
             self.grid_searched_best_model_list = None
 
@@ -193,6 +354,8 @@ class ModelFactory:
     @staticmethod
     def class_for_name(module_name:str, class_name:str):
         try:
+            if class_name.startswith("Halving"):
+                importlib.import_module(HALVING_SEARCH_ENABLER_MODULE)
             # load the module, will raise ImportError if module cannot be loaded
             module = importlib.import_module(module_name)
             # get the class, will raise AttributeError if class cannot be found
@@ -202,8 +365,211 @@ class ModelFactory:
         except Exception as e:
             raise HousingException(e, sys) from e
 
+    @staticmethod
+    def get_core_budget(core_budget) -> int:
+        """
+        core_budget: number of cores for the whole search, -1 (or None) for all cores
+        """
+        try:
+            cpu_count = os.cpu_count() or 1
+            if core_budget is None or int(core_budget) < 1:
+                return cpu_count
+            return min(int(core_budget), cpu_count)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_search_parallelism(self, n_models: int):
+        """
+        Splits the core budget between concurrent model searches (outer) and the
+        cross validation fits of each search (inner), outer * inner never exceeds the budget.
+        return: (outer_n_jobs, inner_n_jobs)
+        """
+        try:
+            outer_n_jobs = max(1, min(n_models, self.core_budget))
+            inner_n_jobs = max(1, self.core_budget // outer_n_jobs)
+            return outer_n_jobs, inner_n_jobs
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    @staticmethod
+    def get_param_search_space(param_grid_search: dict) -> dict:
+        """
+        Values written as {distribution: randint, low: 2, high: 20} become scipy.stats distributions
+        for randomized searches, lists are kept as they are.
+        """
+        try:
+            param_search_space = dict()
+            for param_name, param_values in param_grid_search.items():
+                if isinstance(param_values, dict) and DISTRIBUTION_KEY in param_values:
+                    distribution_args = dict(param_values)
+                    distribution_ref = ModelFactory.class_for_name(module_name=DISTRIBUTION_MODULE,
+                                                                   class_name=distribution_args.pop(DISTRIBUTION_KEY))
+                    param_search_space[param_name] = distribution_ref(**distribution_args)
+                else:
+                    param_search_space[param_name] = param_values
+            return param_search_space
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_candidate_limit(self, grid_search_cv, initialized_model: InitializedModelDetail, input_feature,
+                            output_feature, n_jobs: int) -> int:
+        """
+        Estimates how many candidates fit in the time budget of a model from one timed fit of the
+        first candidate on a cross validation sized share of the data.
+        n_jobs: n_jobs of the search, -1 and None are resolved as joblib does
+        return: number of candidates affordable in time_budget_seconds, at least 1
+        """
+        try:
+            n_splits = check_cv(grid_search_cv.cv).get_n_splits(input_feature, output_feature)
+            param_search_space = ModelFactory.get_param_search_space(initialized_model.param_grid_search)
+            first_candidate = next(iter(ParameterSampler(param_search_space, n_iter=1,
+                                                         random_state=self.random_state)))
+            n_rows = max(1, int(len(output_feature) * (n_splits - 1) / n_splits))
+            estimator = clone(initialized_model.model).set_params(**first_candidate)
+            start_time = time.perf_counter()
+            estimator.fit(input_feature[:n_rows], output_feature[:n_rows])
+            candidate_seconds = (time.perf_counter() - start_time) * n_splits
+            candidate_limit = max(1, int(initialized_model.time_budget_seconds * effective_n_jobs(n_jobs)
+                                         / candidate_seconds))
+            logging.info(f"Estimated [{candidate_seconds:.2f}] seconds per candidate of "
+                         f"[{initialized_model.model_serial_number}], time budget of "
+                         f"[{initialized_model.time_budget_seconds}] seconds allows [{candidate_limit}] candidates")
+            return candidate_limit
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def apply_time_budget(self, grid_search_cv, initialized_model: InitializedModelDetail, input_feature,
+                          output_feature, n_jobs: int):
+        """
+        Caps the number of candidates of the search to what the time budget of the model is estimated to
+        allow. The budget is an estimate made before the search, a running search is not stopped.
+        Randomized searches sample fewer candidates, grid searches larger than the limit are cut down to a
+        seeded sample of their grid points. Halving searches start at 1/factor of the resource, so they get
+        factor times more candidates.
+        """
+        try:
+            candidate_limit = self.get_candidate_limit(grid_search_cv=grid_search_cv,
+                                                       initialized_model=initialized_model,
+                                                       input_feature=input_feature,
+                                                       output_feature=output_feature,
+                                                       n_jobs=n_jobs)
+            search_class_name = type(grid_search_cv).__name__
+            if search_class_name.startswith("Halving"):
+                candidate_limit *= int(grid_search_cv.factor)
+            limit_parameter = CANDIDATE_LIMIT_PARAMETER.get(search_class_name)
+            if limit_parameter is None:
+                n_candidates = len(ParameterGrid(grid_search_cv.param_grid))
+                if n_candidates > candidate_limit:
+                    logging.info(f"[{search_class_name}] of [{initialized_model.model_serial_number}] has "
+                                 f"[{n_candidates}] candidates, searching [{candidate_limit}] of them")
+                    # sampled without replacement since every grid value is a list
+                    candidates = ParameterSampler(grid_search_cv.param_grid, n_iter=candidate_limit,
+                                                  random_state=self.random_state)
+                    grid_search_cv.param_grid = [{name: [value] for name, value in candidate.items()}
+                                                 for candidate in candidates]
+                return grid_search_cv
+
+            current_limit = getattr(grid_search_cv, limit_parameter)
+            if not isinstance(current_limit, int) or current_limit > candidate_limit:
+                logging.info(f"Setting {search_class_name}.{limit_parameter}={candidate_limit} "
+                             f"for [{initialized_model.model_serial_number}]")
+                setattr(grid_search_cv, limit_parameter, candidate_limit)
+            return grid_search_cv
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def is_cacheable_search(self, grid_search_cv, output_feature) -> bool:
+        try:
+            if self.cv_result_cache is None:
+                return False
+            search_class_name = type(grid_search_cv).__name__
+            if search_class_name not in CACHEABLE_SEARCH_CLASSES:
+                logging.info(f"Cv result cache is not used for [{search_class_name}]")
+                return False
+            if callable(grid_search_cv.scoring) or isinstance(grid_search_cv.scoring, (dict, list, tuple)):
+                logging.info("Cv result cache is only used with a single named or default scoring")
+                return False
+            cv = check_cv(grid_search_cv.cv, output_feature, classifier=is_classifier(grid_search_cv.estimator))
+            if getattr(cv, "shuffle", False) and getattr(cv, RANDOM_STATE_KEY, None) is None:
+                logging.info(f"Cv result cache is not used with unseeded shuffling splitter: [{cv}]")
+                return False
+            return True
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def fit_with_cv_result_cache(self, grid_search_cv, input_feature, output_feature) -> SearchResult:
+        """
+        Looks up every candidate of the search in the cv result cache, cross validates only the missing
+        ones with the settings of grid_search_cv and refits the best candidate of the merged results.
+        Ties are broken by candidate order, as in scikit-learn.
+        """
+        try:
+            search_params = grid_search_cv.get_params(deep=False)
+            if "param_distributions" in search_params:
+                # same sampling as RandomizedSearchCV, candidates are identical for a given random_state
+                candidates = list(ParameterSampler(search_params["param_distributions"], search_params["n_iter"],
+                                                   random_state=search_params[RANDOM_STATE_KEY]))
+            else:
+                candidates = list(ParameterGrid(search_params["param_grid"]))
+            estimator = grid_search_cv.estimator
+            estimator_name = f"{type(estimator).__module__}.{type(estimator).__name__}"
+            cv = check_cv(grid_search_cv.cv, output_feature, classifier=is_classifier(estimator))
+
+            data_fingerprint = CVResultCache.get_data_fingerprint(input_feature, output_feature)
+            keys = [CVResultCache.get_key(data_fingerprint=data_fingerprint,
+                                          estimator=clone(estimator).set_params(**candidate),
+                                          cv=cv, scoring=grid_search_cv.scoring)
+                    for candidate in candidates]
+            cv_results = [self.cv_result_cache.get(key) for key in keys]
+            missing = [index for index, cv_result in enumerate(cv_results) if cv_result is None]
+            logging.info(f"Cv result cache hits: [{len(candidates) - len(missing)}], misses: [{len(missing)}] "
+                         f"for [{estimator_name}]")
+
+            if missing:
+                missing_search_cv = GridSearchCV(clone(estimator),
+                                                 [{name: [value] for name, value in candidates[index].items()}
+                                                  for index in missing],
+                                                 scoring=grid_search_cv.scoring,
+                                                 n_jobs=grid_search_cv.n_jobs,
+                                                 cv=cv,
+                                                 verbose=grid_search_cv.verbose,
+                                                 pre_dispatch=grid_search_cv.pre_dispatch,
+                                                 error_score=grid_search_cv.error_score,
+                                                 refit=False)
+                missing_search_cv.fit(input_feature, output_feature)
+                result_columns = CV_RESULT_COLUMNS + [f"split{split}_test_score"
+                                                      for split in range(cv.get_n_splits(input_feature,
+                                                                                         output_feature))]
+                for position, index in enumerate(missing):
+                    cv_result = {"estimator": estimator_name,
+                                 "data_fingerprint": data_fingerprint,
+                                 "params": candidates[index]}
+                    cv_result.update({column: float(missing_search_cv.cv_results_[column][position])
+                                      for column in result_columns})
+                    self.cv_result_cache.put(keys[index], cv_result)
+                    cv_results[index] = cv_result
+                self.cv_result_cache.evict()
+
+            merged_cv_results = {"params": candidates,
+                                 "cached": [index not in missing for index in range(len(candidates))]}
+            for column in CV_RESULT_COLUMNS:
+                merged_cv_results[column] = np.array([cv_result[column] for cv_result in cv_results])
+            mean_test_score = merged_cv_results["mean_test_score"]
+            if np.isnan(mean_test_score).all():
+                raise Exception(f"All candidates of [{estimator_name}] failed to fit")
+            best_index = int(np.nanargmax(mean_test_score))
+
+            best_estimator = clone(estimator).set_params(**candidates[best_index])
+            best_estimator.fit(input_feature, output_feature)
+            return SearchResult(cv_results=merged_cv_results,
+                                best_estimator=best_estimator,
+                                best_parameters=candidates[best_index],
+                                best_score=float(mean_test_score[best_index]))
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
     def execute_grid_search_operation(self, initialized_model: InitializedModelDetail, input_feature,
-                                      output_feature) -> GridSearchedBestModel:
+                                      output_feature, n_jobs: int = None) -> GridSearchedBestModel:
         """
         excute_grid_search_operation(): function will perform paramter search operation and
         it will return you the best optimistic  model with best paramter:
@@ -211,10 +577,14 @@ class ModelFactory:
         param_grid: dictionary of paramter to perform search operation
         input_feature: your all input features
         output_feature: Target/Dependent features
+        n_jobs: cores used by the cross validation fits of this search, also caps BLAS/OpenMP threads
         ================================================================================
         return: Function will return GridSearchOperation object
         """
         try:
+            # sparse training data goes straight to estimators that accept it
+            input_feature = get_model_input(initialized_model.model, input_feature, output_feature)
+
             # instantiating GridSearchCV class
             
            
@@ -222,21 +592,58 @@ class ModelFactory:
                                                              class_name=self.grid_search_class_name
                                                              )
 
-            grid_search_cv = grid_search_cv_ref(estimator=initialized_model.model,
-                                                param_grid=initialized_model.param_grid_search)
+            # param_grid or param_distributions depending on the search class, always the second argument
+            grid_search_cv = grid_search_cv_ref(initialized_model.model,
+                                                ModelFactory.get_param_search_space(
+                                                    initialized_model.param_grid_search))
             grid_search_cv = ModelFactory.update_property_of_class(grid_search_cv,
                                                                    self.grid_search_property_data)
+            if n_jobs is not None:
+                grid_search_cv.n_jobs = n_jobs
+            if self.random_state is not None and getattr(grid_search_cv, RANDOM_STATE_KEY, 0) is None:
+                grid_search_cv.random_state = self.random_state
+            if initialized_model.time_budget_seconds is not None:
+                grid_search_cv = self.apply_time_budget(grid_search_cv=grid_search_cv,
+                                                        initialized_model=initialized_model,
+                                                        input_feature=input_feature,
+                                                        output_feature=output_feature,
+                                                        n_jobs=grid_search_cv.n_jobs)
 
             
             message = f'{">>"* 30} f"Training {type(initialized_model.model).__name__} Started." {"<<"*30}'
             logging.info(message)
-            grid_search_cv.fit(input_feature, output_feature)
+            start_time = time.perf_counter()
+            thread_limit = nullcontext()
+            if n_jobs is not None:
+                thread_limit = threadpool_limits(limits=n_jobs)
+            with thread_limit:
+                if self.is_cacheable_search(grid_search_cv, output_feature):
+                    search_result = self.fit_with_cv_result_cache(grid_search_cv=grid_search_cv,
+                                                                  input_feature=input_feature,
+                                                                  output_feature=output_feature)
+                else:
+                    grid_search_cv.fit(input_feature, output_feature)
+                    search_result = SearchResult(cv_results=grid_search_cv.cv_results_,
+                                                 best_estimator=grid_search_cv.best_estimator_,
+                                                 best_parameters=grid_search_cv.best_params_,
+                                                 best_score=grid_search_cv.best_score_)
+            wall_time = time.perf_counter() - start_time
             message = f'{">>"* 30} f"Training {type(initialized_model.model).__name__}" completed {"<<"*30}'
+            logging.info(message)
+            logging.info(f"Search of [{initialized_model.model_serial_number}] {initialized_model.model_name} "
+                         f"took [{wall_time:.2f}] seconds with n_jobs: [{grid_search_cv.n_jobs}]")
+            if initialized_model.time_budget_seconds is not None \
+                    and wall_time > initialized_model.time_budget_seconds:
+                logging.info(f"Search of [{initialized_model.model_serial_number}] exceeded its time budget of "
+                             f"[{initialized_model.time_budget_seconds}] seconds")
+            for params, mean_fit_time in zip(search_result.cv_results["params"],
+                                             search_result.cv_results["mean_fit_time"]):
+                logging.info(f"Candidate {params}: mean fit time [{mean_fit_time:.3f}] seconds")
             grid_searched_best_model = GridSearchedBestModel(model_serial_number=initialized_model.model_serial_number,
                                                              model=initialized_model.model,
-                                                             best_model=grid_search_cv.best_estimator_,
-                                                             best_parameters=grid_search_cv.best_params_,
-                                                             best_score=grid_search_cv.best_score_
+                                                             best_model=search_result.best_estimator,
+                                                             best_parameters=search_result.best_parameters,
+                                                             best_score=search_result.best_score
                                                              )
             
             return grid_searched_best_model
@@ -263,13 +670,20 @@ class ModelFactory:
                     model = ModelFactory.update_property_of_class(instance_ref=model,
                                                                   property_data=model_obj_property_data)
 
+                # a fixed seed keeps the search result independent of how the work is scheduled
+                if self.random_state is not None and hasattr(model, RANDOM_STATE_KEY) \
+                        and getattr(model, RANDOM_STATE_KEY) is None:
+                    setattr(model, RANDOM_STATE_KEY, self.random_state)
+
                 param_grid_search = model_initialization_config[SEARCH_PARAM_GRID_KEY]
                 model_name = f"{model_initialization_config[MODULE_KEY]}.{model_initialization_config[CLASS_KEY]}"
 
                 model_initialization_config = InitializedModelDetail(model_serial_number=model_serial_number,
                                                                      model=model,
                                                                      param_grid_search=param_grid_search,
-                                                                     model_name=model_name
+                                                                     model_name=model_name,
+                                                                     time_budget_seconds=model_initialization_config.get(
+                                                                         TIME_BUDGET_SECONDS_KEY)
                                                                      )
 
                 initialized_model_list.append(model_initialization_config)
@@ -302,17 +716,38 @@ class ModelFactory:
     def initiate_best_parameter_search_for_initialized_models(self,
                                                               initialized_model_list: List[InitializedModelDetail],
                                                               input_feature,
-                                                              output_feature) -> List[GridSearchedBestModel]:
+                                                              output_feature,
+                                                              data_file_path: str = None) -> List[GridSearchedBestModel]:
 
+        """
+        Searches of the candidate models run concurrently in a process pool within the core budget.
+        Results keep the order of initialized_model_list whatever the order the searches finish in.
+        data_file_path: transformed array input_feature and output_feature were split from, the pool
+        workers reopen it (memory mapped for .npy files) rather than receiving a pickled copy of the data.
+        Without it the searches run one after another.
+        """
         try:
-            self.grid_searched_best_model_list = []
-            for initialized_model_list in initialized_model_list:
-                grid_searched_best_model = self.initiate_best_parameter_search_for_initialized_model(
-                    initialized_model=initialized_model_list,
-                    input_feature=input_feature,
-                    output_feature=output_feature
-                )
-                self.grid_searched_best_model_list.append(grid_searched_best_model)
+            outer_n_jobs, inner_n_jobs = self.get_search_parallelism(n_models=len(initialized_model_list))
+            if data_file_path is None and outer_n_jobs > 1:
+                outer_n_jobs, inner_n_jobs = 1, self.core_budget
+            logging.info(f"Searching [{len(initialized_model_list)}] models with core budget: [{self.core_budget}], "
+                         f"concurrent searches: [{outer_n_jobs}], n_jobs per search: [{inner_n_jobs}]")
+            start_time = time.perf_counter()
+            if outer_n_jobs == 1:
+                self.grid_searched_best_model_list = [
+                    self.execute_grid_search_operation(initialized_model=initialized_model,
+                                                       input_feature=input_feature,
+                                                       output_feature=output_feature,
+                                                       n_jobs=inner_n_jobs)
+                    for initialized_model in initialized_model_list
+                ]
+            else:
+                with ProcessPoolExecutor(max_workers=outer_n_jobs) as executor:
+                    futures = [executor.submit(run_parameter_search, self, initialized_model, data_file_path,
+                                               inner_n_jobs)
+                               for initialized_model in initialized_model_list]
+                    self.grid_searched_best_model_list = [future.result() for future in futures]
+            logging.info(f"Parameter search of all models took [{time.perf_counter() - start_time:.2f}] seconds")
             return self.grid_searched_best_model_list
         except Exception as e:
             raise HousingException(e, sys) from e
@@ -349,7 +784,93 @@ class ModelFactory:
         except Exception as e:
             raise HousingException(e, sys) from e
 
-    def get_best_model(self, X, y,base_accuracy=0.6) -> BestModel:
+    def execute_incremental_training(self, initialized_model: InitializedModelDetail, input_feature,
+                                     output_feature) -> GridSearchedBestModel:
+        """
+        Trains every candidate of the search grid with partial_fit on chunks of chunk_size rows read from
+        input_feature, which can be a memory mapped array, so only one chunk is in memory at a time.
+        The last holdout_rows rows are held out: after every epoch the candidate is scored on them and
+        training stops once the score has not improved by tol for patience epochs.
+        The candidate with the best hold-out r2 score, at its best epoch, is returned.
+        """
+        try:
+            chunk_size = self.incremental_chunk_size
+            max_epochs = int(self.incremental_training.get(MAX_EPOCHS_KEY, 10))
+            patience = int(self.incremental_training.get(PATIENCE_KEY, 2))
+            tol = float(self.incremental_training.get(TOLERANCE_KEY, 1e-4))
+            n_rows = output_feature.shape[0]
+            holdout_rows = min(int(self.incremental_training.get(HOLDOUT_ROWS_KEY, chunk_size)), n_rows // 2)
+            holdout_start = n_rows - holdout_rows
+
+            X_holdout = np.asarray(input_feature[holdout_start:]) if not sparse.issparse(input_feature) \
+                else input_feature[holdout_start:]
+            y_holdout = np.asarray(output_feature[holdout_start:])
+            chunk_starts = np.arange(0, holdout_start, chunk_size)
+            logging.info(f"Incremental training of [{initialized_model.model_serial_number}] "
+                         f"{initialized_model.model_name} on [{holdout_start}] rows in [{len(chunk_starts)}] chunks, "
+                         f"hold-out rows: [{holdout_rows}]")
+
+            best_candidate = None
+            for candidate in ParameterGrid(initialized_model.param_grid_search):
+                model = clone(initialized_model.model).set_params(**candidate)
+                random_generator = np.random.default_rng(self.random_state)
+                start_time = time.perf_counter()
+                best_model, best_score, epochs_without_improvement = None, -np.inf, 0
+                for epoch in range(max_epochs):
+                    for chunk_start in random_generator.permutation(chunk_starts):
+                        chunk_end = min(chunk_start + chunk_size, holdout_start)
+                        X_chunk = input_feature[chunk_start:chunk_end]
+                        y_chunk = np.asarray(output_feature[chunk_start:chunk_end])
+                        rows = random_generator.permutation(chunk_end - chunk_start)
+                        model.partial_fit(X_chunk[rows], y_chunk[rows])
+                    score = r2_score(y_holdout, model.predict(X_holdout))
+                    logging.info(f"Candidate {candidate} epoch [{epoch + 1}]: hold-out r2 [{score:.6f}]")
+                    if score > best_score + tol:
+                        best_model, best_score, epochs_without_improvement = copy.deepcopy(model), score, 0
+                    else:
+                        epochs_without_improvement += 1
+                        if epochs_without_improvement >= patience:
+                            logging.info(f"Early stopping candidate {candidate} after epoch [{epoch + 1}]")
+                            break
+                logging.info(f"Candidate {candidate}: hold-out r2 [{best_score:.6f}] "
+                             f"in [{time.perf_counter() - start_time:.2f}] seconds")
+                if best_candidate is None or best_score > best_candidate[2]:
+                    best_candidate = (candidate, best_model, best_score)
+
+            candidate, best_model, best_score = best_candidate
+            return GridSearchedBestModel(model_serial_number=initialized_model.model_serial_number,
+                                         model=initialized_model.model,
+                                         best_model=best_model,
+                                         best_parameters=candidate,
+                                         best_score=best_score)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_best_incremental_model(self, X, y, base_accuracy=0.6) -> BestModel:
+        """
+        Model selection of the out of core mode, only models implementing partial_fit take part.
+        """
+        try:
+            initialized_model_list = [initialized_model for initialized_model in self.get_initialized_model_list()
+                                      if hasattr(initialized_model.model, "partial_fit")]
+            if len(initialized_model_list) == 0:
+                raise Exception("Incremental training is enabled but no model in model_selection implements partial_fit")
+            logging.info(f"Incrementally trained models: {initialized_model_list}")
+            self.grid_searched_best_model_list = [
+                self.execute_incremental_training(initialized_model=initialized_model,
+                                                  input_feature=X,
+                                                  output_feature=y)
+                for initialized_model in initialized_model_list
+            ]
+            return ModelFactory.get_best_model_from_grid_searched_best_model_list(self.grid_searched_best_model_list,
+                                                                                  base_accuracy=base_accuracy)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_best_model(self, X, y,base_accuracy=0.6, data_file_path: str = None) -> BestModel:
+        """
+        data_file_path: transformed array X and y were split from, lets model searches run in parallel
+        """
         try:
             logging.info("Started Initializing model from config file")
             initialized_model_list = self.get_initialized_model_list()
@@ -357,10 +878,26 @@ class ModelFactory:
             grid_searched_best_model_list = self.initiate_best_parameter_search_for_initialized_models(
                 initialized_model_list=initialized_model_list,
                 input_feature=X,
-                output_feature=y
+                output_feature=y,
+                data_file_path=data_file_path
             )
             return ModelFactory.get_best_model_from_grid_searched_best_model_list(grid_searched_best_model_list,
                                                                                   base_accuracy=base_accuracy)
         except Exception as e:
             raise HousingException(e, sys) from e
 
+
+def run_parameter_search(model_factory: ModelFactory, initialized_model: InitializedModelDetail, data_file_path: str,
+                         n_jobs: int) -> GridSearchedBestModel:
+    """
+    Process pool task of a model search. The model factory only holds its model.yaml settings, the training
+    data is reopened from data_file_path so a memory mapped array is shared through the page cache.
+    """
+    try:
+        input_feature, output_feature = split_transformed_array_data(load_transformed_array_data(data_file_path))
+        return model_factory.execute_grid_search_operation(initialized_model=initialized_model,
+                                                           input_feature=input_feature,
+                                                           output_feature=output_feature,
+                                                           n_jobs=n_jobs)
+    except Exception as e:
+        raise HousingException(e, sys) from e
@@ -0,0 +1,132 @@
+import sys
+import math
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from housing.exception import HousingException
+from housing.entity.housing_predictor import HousingData, HousingPrediction
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of predictions with a time to live, keyed on the canonical HousingData fields.
+    Callers predict on canonicalize(housing_data), so that a cache hit returns exactly what a miss would.
+    All entries are dropped as soon as a different model version is served.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 300, float_decimals: int = 4):
+        try:
+            self.max_size = max_size
+            self.ttl_seconds = ttl_seconds
+            self.float_decimals = float_decimals
+            self.model_version = None
+
+            self.hit_count = 0
+            self.miss_count = 0
+            self.eviction_count = 0
+            self.expired_count = 0
+            self.invalidation_count = 0
+
+            self._entries = OrderedDict()
+            self._lock = Lock()
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def _normalize_number(self, value) -> float:
+        value = float(value)
+        if math.isnan(value):
+            return value
+        return round(value, self.float_decimals)
+
+    def canonicalize(self, housing_data: HousingData) -> HousingData:
+        """
+        return: HousingData with numbers rounded to float_decimals and ocean_proximity upper cased
+        with its whitespace collapsed, the values both the cache key and the model are given
+        """
+        try:
+            return HousingData(longitude=self._normalize_number(housing_data.longitude),
+                               latitude=self._normalize_number(housing_data.latitude),
+                               housing_median_age=self._normalize_number(housing_data.housing_median_age),
+                               total_rooms=self._normalize_number(housing_data.total_rooms),
+                               total_bedrooms=self._normalize_number(housing_data.total_bedrooms),
+                               population=self._normalize_number(housing_data.population),
+                               households=self._normalize_number(housing_data.households),
+                               median_income=self._normalize_number(housing_data.median_income),
+                               ocean_proximity=" ".join(str(housing_data.ocean_proximity).split()).upper())
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_key(self, housing_data: HousingData) -> tuple:
+        try:
+            housing_data = self.canonicalize(housing_data)
+            # nan never equals itself, missing numbers are keyed as None
+            return tuple(None if isinstance(value, float) and math.isnan(value) else value
+                         for value in (housing_data.longitude, housing_data.latitude, housing_data.housing_median_age,
+                                       housing_data.total_rooms, housing_data.total_bedrooms, housing_data.population,
+                                       housing_data.households, housing_data.median_income,
+                                       housing_data.ocean_proximity))
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def _check_model_version(self, model_version: str):
+        if model_version != self.model_version:
+            if len(self._entries) > 0:
+                self.invalidation_count += 1
+            self._entries.clear()
+            self.model_version = model_version
+
+    def get(self, housing_data: HousingData, model_version: str) -> HousingPrediction:
+        """
+        return: cached HousingPrediction or None
+        """
+        try:
+            key = self.get_key(housing_data)
+            with self._lock:
+                self._check_model_version(model_version)
+                entry = self._entries.get(key)
+                if entry is None:
+                    self.miss_count += 1
+                    return None
+                housing_prediction, expires_at = entry
+                if expires_at < time.monotonic():
+                    del self._entries[key]
+                    self.expired_count += 1
+                    self.miss_count += 1
+                    return None
+                self._entries.move_to_end(key)
+                self.hit_count += 1
+                return housing_prediction
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def put(self, housing_data: HousingData, housing_prediction: HousingPrediction):
+        try:
+            key = self.get_key(housing_data)
+            with self._lock:
+                self._check_model_version(housing_prediction.model_version)
+                self._entries[key] = (housing_prediction, time.monotonic() + self.ttl_seconds)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.eviction_count += 1
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_metrics(self) -> dict:
+        try:
+            lookup_count = self.hit_count + self.miss_count
+            return {
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "size": len(self._entries),
+                "model_version": self.model_version,
+                "hit_count": self.hit_count,
+                "miss_count": self.miss_count,
+                "hit_ratio": self.hit_count / lookup_count if lookup_count else 0,
+                "eviction_count": self.eviction_count,
+                "expired_count": self.expired_count,
+                "invalidation_count": self.invalidation_count,
+            }
+        except Exception as e:
+            raise HousingException(e, sys) from e
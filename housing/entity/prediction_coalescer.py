@@ -0,0 +1,142 @@
+import os
+import sys
+import time
+import queue
+from concurrent.futures import Future
+from threading import Lock, Thread
+
+from housing.logger import logging
+from housing.exception import HousingException
+from housing.entity.housing_predictor import HousingPredictor, HousingData, HousingPrediction
+
+import pandas as pd
+
+
+class PredictionCoalescer:
+    """
+    Collects single row predictions arriving within window_ms (or until max_batch_size rows are waiting)
+    and scores them with one model.predict call. Each caller gets its own row back through a Future.
+    """
+
+    def __init__(self, housing_predictor: HousingPredictor, window_ms: float = 2, max_batch_size: int = 64,
+                 max_queue_depth: int = 1024):
+        try:
+            self.housing_predictor = housing_predictor
+            self.window_ms = window_ms
+            self.max_batch_size = max_batch_size
+            self.max_queue_depth = max_queue_depth
+
+            self.request_count = 0
+            self.rejected_count = 0
+            self.timeout_count = 0
+            self.batch_count = 0
+            self.max_observed_batch_size = 0
+
+            self._queue = None
+            self._worker_pid = None
+            # guards the worker start and the counters, which are updated by request threads and the batching thread
+            self._lock = Lock()
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def _ensure_worker(self):
+        # threads do not survive a fork, so every worker process starts its own batching thread
+        if self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker_pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.max_queue_depth)
+            Thread(target=self._run, daemon=True, name="prediction_coalescer").start()
+            self._worker_pid = os.getpid()
+
+    def submit(self, housing_data: HousingData) -> Future:
+        """
+        Queues one row for prediction.
+        return: Future resolving to a HousingPrediction, or None when the queue is full
+        """
+        try:
+            self._ensure_worker()
+            future = Future()
+            try:
+                self._queue.put_nowait((housing_data, future))
+            except queue.Full:
+                with self._lock:
+                    self.rejected_count += 1
+                return None
+            with self._lock:
+                self.request_count += 1
+            return future
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeout_count += 1
+
+    def _collect_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _predict_batch(self, batch: list):
+        housing_input_dict = dict()
+        for housing_data, _ in batch:
+            for column, values in housing_data.get_housing_data_as_dict().items():
+                housing_input_dict.setdefault(column, []).extend(values)
+        try:
+            housing_prediction = self.housing_predictor.predict_with_version(X=pd.DataFrame(housing_input_dict))
+        except Exception as e:
+            # one bad row must not fail its neighbours, so the batch is retried row by row
+            logging.info(f"Coalesced prediction of [{len(batch)}] rows failed, predicting rows one by one. {e}")
+            for housing_data, future in batch:
+                try:
+                    future.set_result(self.housing_predictor.predict_with_version(
+                        X=housing_data.get_housing_input_data_frame()))
+                except Exception as row_exception:
+                    future.set_exception(row_exception)
+            return
+
+        for row, (_, future) in enumerate(batch):
+            future.set_result(HousingPrediction(model_version=housing_prediction.model_version,
+                                                median_house_value=housing_prediction.median_house_value[row:row + 1]))
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            with self._lock:
+                self.batch_count += 1
+                self.max_observed_batch_size = max(self.max_observed_batch_size, len(batch))
+            try:
+                self._predict_batch(batch)
+            except Exception as e:
+                logging.info(f"Prediction coalescer failed on a batch of [{len(batch)}] rows. {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def get_metrics(self) -> dict:
+        try:
+            with self._lock:
+                return {
+                    "window_ms": self.window_ms,
+                    "max_batch_size": self.max_batch_size,
+                    "max_queue_depth": self.max_queue_depth,
+                    "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+                    "request_count": self.request_count,
+                    "rejected_count": self.rejected_count,
+                    "timeout_count": self.timeout_count,
+                    "batch_count": self.batch_count,
+                    "mean_batch_size": self.request_count / self.batch_count if self.batch_count else 0,
+                    "max_observed_batch_size": self.max_observed_batch_size,
+                }
+        except Exception as e:
+            raise HousingException(e, sys) from e
@@ -0,0 +1,201 @@
+import sys
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from housing.logger import logging
+from housing.exception import HousingException, get_validation_error_message
+from housing.entity.config_entity import ServingConfig
+from housing.entity.housing_predictor import HousingPredictor, HousingData, HousingBatchData, HousingPrediction
+from housing.entity.prediction_coalescer import PredictionCoalescer
+from housing.entity.prediction_cache import PredictionCache
+from housing.util.util import read_yaml_file
+from housing.util.metrics import MetricsRegistry, NULL_REQUEST_TIMER
+
+HOUSING_DATA_KEY = "housing_data"
+MEDIAN_HOUSING_VALUE_KEY = "median_house_value"
+MODEL_VERSION_KEY = "model_version"
+
+
+class PredictionService:
+    """
+    Prediction logic shared by the flask (app.py) and the asyncio (asgi.py) servers:
+    form parsing, cache lookup, coalesced or direct prediction and batch responses.
+    """
+
+    def __init__(self, serving_config: ServingConfig):
+        try:
+            self.serving_config = serving_config
+            self.housing_predictor = HousingPredictor(model_dir=serving_config.model_dir,
+                                                      model_reload_interval=serving_config.model_reload_interval)
+            self.housing_schema = read_yaml_file(serving_config.schema_file_path)
+
+            self.prediction_coalescer = None
+            if serving_config.coalesce_enabled:
+                self.prediction_coalescer = PredictionCoalescer(
+                    housing_predictor=self.housing_predictor,
+                    window_ms=serving_config.coalesce_window_ms,
+                    max_batch_size=serving_config.coalesce_max_batch_size,
+                    max_queue_depth=serving_config.coalesce_max_queue_depth)
+
+            self.prediction_cache = None
+            if serving_config.cache_enabled:
+                self.prediction_cache = PredictionCache(max_size=serving_config.cache_max_size,
+                                                        ttl_seconds=serving_config.cache_ttl_seconds,
+                                                        float_decimals=serving_config.cache_float_decimals)
+
+            self.metrics = MetricsRegistry(enabled=serving_config.metrics_enabled)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    @staticmethod
+    def get_housing_data(form, request_timer=NULL_REQUEST_TIMER) -> HousingData:
+        """
+        form: mapping of the predict.html form fields
+        """
+        try:
+            with request_timer.stage("housing_data"):
+                return HousingData(longitude=float(form['longitude']),
+                                   latitude=float(form['latitude']),
+                                   housing_median_age=float(form['housing_median_age']),
+                                   total_rooms=float(form['total_rooms']),
+                                   total_bedrooms=float(form['total_bedrooms']),
+                                   population=float(form['population']),
+                                   households=float(form['households']),
+                                   median_income=float(form['median_income']),
+                                   ocean_proximity=form['ocean_proximity'],
+                                   )
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def predict(self, housing_data: HousingData, request_timer=NULL_REQUEST_TIMER) -> HousingPrediction:
+        """
+        return: HousingPrediction, or None when the coalescer queue is full or its prediction
+        does not arrive within coalesce_timeout_ms
+        """
+        try:
+            housing_prediction = None
+            if self.prediction_cache is not None:
+                housing_data = self.prediction_cache.canonicalize(housing_data)
+                with request_timer.stage("cache_lookup"):
+                    housing_prediction = self.prediction_cache.get(
+                        housing_data, model_version=self.housing_predictor.get_model_version())
+            if housing_prediction is not None:
+                return housing_prediction
+
+            if self.prediction_coalescer is not None:
+                with request_timer.stage("coalesced_predict"):
+                    future = self.prediction_coalescer.submit(housing_data)
+                    if future is None:
+                        return None
+                    try:
+                        housing_prediction = future.result(timeout=self.serving_config.coalesce_timeout_ms / 1000)
+                    except FutureTimeoutError:
+                        # the batching thread still resolves the abandoned future, nobody waits on it
+                        self.prediction_coalescer.record_timeout()
+                        logging.info(f"Coalesced prediction timed out after "
+                                     f"[{self.serving_config.coalesce_timeout_ms}] ms")
+                        return None
+            else:
+                with request_timer.stage("data_frame"):
+                    housing_df = housing_data.get_housing_input_data_frame()
+                housing_prediction = self.housing_predictor.predict_with_version(X=housing_df,
+                                                                                 request_timer=request_timer)
+
+            if self.prediction_cache is not None:
+                self.prediction_cache.put(housing_data, housing_prediction)
+            return housing_prediction
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_predict_context(self, housing_data: HousingData = None,
+                            housing_prediction: HousingPrediction = None) -> dict:
+        try:
+            if housing_prediction is None:
+                return {HOUSING_DATA_KEY: None, MEDIAN_HOUSING_VALUE_KEY: None, MODEL_VERSION_KEY: None}
+            return {
+                HOUSING_DATA_KEY: housing_data.get_housing_data_as_dict(),
+                MEDIAN_HOUSING_VALUE_KEY: housing_prediction.median_house_value,
+                MODEL_VERSION_KEY: housing_prediction.model_version,
+            }
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_batch_from_records(self, records) -> HousingBatchData:
+        try:
+            if isinstance(records, dict):
+                records = records.get("records")
+            return HousingBatchData.from_records(records, schema=self.housing_schema)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_batch_from_csv(self, csv_file) -> HousingBatchData:
+        try:
+            return HousingBatchData.from_csv(csv_file, schema=self.housing_schema)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def predict_batch(self, housing_batch_data: HousingBatchData, request_timer=NULL_REQUEST_TIMER):
+        """
+        return: json serializable response and http status code,
+        400 for a batch failing validation, 503 when no model can be loaded and 500 when the prediction fails.
+        Error responses carry the validation message only, the full exception is logged.
+        """
+        if len(housing_batch_data) > self.serving_config.max_batch_size:
+            return {"error": f"Batch of [{len(housing_batch_data)}] rows exceeds max batch size: "
+                             f"[{self.serving_config.max_batch_size}]"}, 413
+        try:
+            with request_timer.stage("validate"):
+                housing_batch_data.validate()
+        except Exception as e:
+            logging.info(e)
+            return {"error": get_validation_error_message(e, "Batch failed validation")}, 400
+
+        try:
+            model_version = self.housing_predictor.get_model_version()
+        except Exception as e:
+            logging.info(e)
+            return {"error": "No model is available to serve predictions"}, 503
+
+        if len(housing_batch_data) == 0:
+            return {MODEL_VERSION_KEY: model_version, "predictions": []}, 200
+
+        try:
+            housing_batch_prediction = self.housing_predictor.predict_batch(housing_batch_data,
+                                                                            request_timer=request_timer)
+        except Exception as e:
+            logging.info(e)
+            return {"error": "Prediction failed"}, 500
+
+        with request_timer.stage("serialize"):
+            predictions = []
+            for row, median_house_value in enumerate(housing_batch_prediction.median_house_value.tolist()):
+                if row in housing_batch_prediction.row_errors:
+                    predictions.append({"row": row, "errors": housing_batch_prediction.row_errors[row]})
+                else:
+                    predictions.append({"row": row, MEDIAN_HOUSING_VALUE_KEY: median_house_value})
+        return {MODEL_VERSION_KEY: housing_batch_prediction.model_version, "predictions": predictions}, 200
+
+    def get_readiness(self):
+        """
+        return: json serializable response and http status code
+        """
+        try:
+            if self.housing_predictor.is_warm or self.housing_predictor.warm_up():
+                return {"ready": True, MODEL_VERSION_KEY: self.housing_predictor.get_model_version()}, 200
+            return {"ready": False}, 503
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_metrics(self) -> dict:
+        try:
+            return {
+                "coalescer": self.prediction_coalescer.get_metrics() if self.prediction_coalescer is not None else None,
+                "prediction_cache": self.prediction_cache.get_metrics() if self.prediction_cache is not None else None,
+            }
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_prometheus_metrics(self) -> str:
+        try:
+            return self.metrics.get_prometheus_text(gauges=self.get_metrics())
+        except Exception as e:
+            raise HousingException(e, sys) from e
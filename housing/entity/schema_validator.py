@@ -0,0 +1,181 @@
+import sys
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from housing.logger import logging
+from housing.exception import HousingException, HousingValidationError
+from housing.constant import DATASET_SCHEMA_COLUMNS_KEY, NUMERICAL_COLUMN_KEY, CATEGORICAL_COLUMN_KEY, \
+    DOMAIN_VALUE_KEY, SCHEMA_VALUE_RANGE_KEY, SCHEMA_MAX_NULL_RATE_KEY, SCHEMA_MAX_REJECTED_ROW_RATE_KEY
+
+# row level rules, a row violating any of them is rejected
+DTYPE_RULE = "dtype"
+NULL_RULE = "null"
+RANGE_RULE = "range"
+DOMAIN_RULE = "domain"
+# dataset level rule, checked once all chunks are seen
+NULL_RATE_RULE = "null_rate"
+REJECTED_ROW_RATE_RULE = "rejected_row_rate"
+NUMERIC_DTYPES = ("float", "int")
+
+ChunkValidationResult = namedtuple("ChunkValidationResult",
+                                   ["valid_mask", "rule_violations", "null_counts", "row_errors"])
+
+ValidationSummary = namedtuple("ValidationSummary",
+                               ["n_rows", "n_valid_rows", "valid_mask", "rule_violations", "null_rates",
+                                "dataset_violations"])
+
+
+class SchemaValidator:
+    """
+    Validates data against config/schema.yaml with one vectorized operation per column and rule.
+    Row level rules:
+    dtype: values of numeric columns must parse as numbers
+    null: only columns listed in max_null_rate may be empty
+    range: numeric values must lie within value_range min/max
+    domain: categorical values must be in domain_value
+    Dataset level rules: null rate of each column in max_null_rate and the share of rejected rows
+    against max_rejected_row_rate.
+    """
+
+    def __init__(self, schema: dict, required_columns: list = None):
+        """
+        required_columns: columns the data must have, all columns of the schema by default
+        """
+        try:
+            self.schema = schema
+            self.numerical_columns = schema[NUMERICAL_COLUMN_KEY]
+            self.categorical_columns = schema[CATEGORICAL_COLUMN_KEY]
+            self.column_dtypes = schema.get(DATASET_SCHEMA_COLUMNS_KEY) or dict()
+            self.required_columns = list(self.column_dtypes) if required_columns is None else required_columns
+            self.domain_value = schema.get(DOMAIN_VALUE_KEY) or dict()
+            self.value_range = schema.get(SCHEMA_VALUE_RANGE_KEY) or dict()
+            self.max_null_rate = schema.get(SCHEMA_MAX_NULL_RATE_KEY) or dict()
+            self.max_rejected_row_rate = schema.get(SCHEMA_MAX_REJECTED_ROW_RATE_KEY, 0.0)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_numeric_columns(self, columns) -> list:
+        return [column for column in columns
+                if column in self.numerical_columns
+                or str(self.column_dtypes.get(column, "")).startswith(NUMERIC_DTYPES)]
+
+    def get_csv_dtype(self) -> dict:
+        """
+        categorical columns are read as text so that validation sees the raw values
+        """
+        return {column: str for column in self.categorical_columns}
+
+    def validate_frame(self, data_frame: pd.DataFrame, collect_row_errors: bool = False) -> ChunkValidationResult:
+        """
+        Numeric columns of data_frame are converted to float in place, unparsable values become NaN.
+        collect_row_errors: also return a dict of row number to list of error messages, meant for
+        small batches where every rejected row is reported back
+        """
+        try:
+            missing_columns = [column for column in self.required_columns if column not in data_frame.columns]
+            if len(missing_columns) > 0:
+                raise HousingValidationError(f"Columns: {missing_columns} are missing from the data")
+
+            n_rows = len(data_frame)
+            valid_mask = np.ones(n_rows, dtype=bool)
+            rule_violations = {rule: dict() for rule in (DTYPE_RULE, NULL_RULE, RANGE_RULE, DOMAIN_RULE)}
+            null_counts = dict()
+            row_errors = dict() if collect_row_errors else None
+
+            def add_violation(rule: str, column: str, invalid_mask: np.ndarray, message: str):
+                n_invalid = int(invalid_mask.sum())
+                if n_invalid == 0:
+                    return
+                rule_violations[rule][column] = n_invalid
+                valid_mask[invalid_mask] = False
+                if row_errors is not None:
+                    for row in np.flatnonzero(invalid_mask):
+                        row_errors.setdefault(int(row), []).append(f"[{column}] {message}")
+
+            columns = [column for column in self.required_columns if column in data_frame.columns]
+            numeric_columns = self.get_numeric_columns(columns)
+            for column in columns:
+                raw_values = data_frame[column]
+                null_mask = raw_values.isna().to_numpy()
+
+                if column in numeric_columns:
+                    numeric_values = pd.to_numeric(raw_values, errors="coerce").astype(float)
+                    data_frame[column] = numeric_values
+                    values = numeric_values.to_numpy()
+                    add_violation(DTYPE_RULE, column, np.isnan(values) & ~null_mask, "must be a number")
+
+                    if column in self.value_range:
+                        lower = self.value_range[column].get("min", -np.inf)
+                        upper = self.value_range[column].get("max", np.inf)
+                        with np.errstate(invalid="ignore"):
+                            out_of_range_mask = (values < lower) | (values > upper)
+                        add_violation(RANGE_RULE, column, out_of_range_mask,
+                                      f"must be between {lower} and {upper}")
+
+                if column in self.domain_value:
+                    add_violation(DOMAIN_RULE, column, ~null_mask & ~raw_values.isin(self.domain_value[column]).to_numpy(),
+                                  f"must be one of {self.domain_value[column]}")
+
+                null_counts[column] = int(null_mask.sum())
+                if column not in self.max_null_rate:
+                    add_violation(NULL_RULE, column, null_mask, "must not be empty")
+
+            return ChunkValidationResult(valid_mask=valid_mask,
+                                         rule_violations={rule: counts for rule, counts in rule_violations.items()
+                                                          if len(counts) > 0},
+                                         null_counts=null_counts,
+                                         row_errors=row_errors)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def summarize(self, chunk_results: list) -> ValidationSummary:
+        try:
+            valid_mask = np.concatenate([result.valid_mask for result in chunk_results]) if len(chunk_results) > 0 \
+                else np.ones(0, dtype=bool)
+            n_rows = len(valid_mask)
+            n_valid_rows = int(valid_mask.sum())
+
+            rule_violations = dict()
+            null_counts = dict()
+            for result in chunk_results:
+                for rule, counts in result.rule_violations.items():
+                    for column, count in counts.items():
+                        rule_violations.setdefault(rule, dict())
+                        rule_violations[rule][column] = rule_violations[rule].get(column, 0) + count
+                for column, count in result.null_counts.items():
+                    null_counts[column] = null_counts.get(column, 0) + count
+
+            null_rates = {column: count / n_rows if n_rows > 0 else 0.0 for column, count in null_counts.items()}
+            dataset_violations = dict()
+            for column, max_null_rate in self.max_null_rate.items():
+                if null_rates.get(column, 0.0) > max_null_rate:
+                    dataset_violations.setdefault(NULL_RATE_RULE, dict())[column] = null_rates[column]
+            rejected_row_rate = 1 - n_valid_rows / n_rows if n_rows > 0 else 0.0
+            if rejected_row_rate > self.max_rejected_row_rate:
+                dataset_violations[REJECTED_ROW_RATE_RULE] = rejected_row_rate
+
+            return ValidationSummary(n_rows=n_rows,
+                                     n_valid_rows=n_valid_rows,
+                                     valid_mask=valid_mask,
+                                     rule_violations=rule_violations,
+                                     null_rates=null_rates,
+                                     dataset_violations=dataset_violations)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def validate_file(self, file_path: str, chunk_size: int = 100000) -> ValidationSummary:
+        """
+        Validates a csv file chunk by chunk, only the row mask of the whole file is kept in memory.
+        """
+        try:
+            chunk_results = []
+            for chunk_df in pd.read_csv(file_path, dtype=self.get_csv_dtype(), chunksize=chunk_size):
+                chunk_results.append(self.validate_frame(chunk_df))
+            summary = self.summarize(chunk_results)
+            logging.info(f"Validated [{file_path}]: [{summary.n_valid_rows}] of [{summary.n_rows}] rows are valid, "
+                         f"violations: {summary.rule_violations}, dataset violations: {summary.dataset_violations}")
+            return summary
+        except Exception as e:
+            raise HousingException(e, sys) from e
@@ -29,3 +29,31 @@ class HousingException(Exception):
 
     def __repr__(self) -> str:
         return HousingException.__name__.str()
+
+
+class HousingValidationError(Exception):
+    """
+    Invalid input sent by a client, its message names the offending columns or keys only
+    and is safe to return in a response.
+    """
+
+
+def get_validation_error_message(error: Exception, default_message: str) -> str:
+    """
+    return: message of the HousingValidationError wrapped anywhere in the exception chain of error,
+    default_message when there is none, so that file paths and line numbers never reach a client
+    """
+    while error is not None:
+        if isinstance(error, HousingValidationError):
+            return str(error)
+        error = error.__cause__ or error.__context__
+    return default_message
+
+
+def get_root_cause(error: Exception) -> Exception:
+    """
+    return: innermost exception of the __cause__ chain of error, the one carrying the original message
+    """
+    while error.__cause__ is not None:
+        error = error.__cause__
+    return error
@@ -1,7 +1,6 @@
 import logging
 from datetime import datetime
 import os 
-import pandas as pd
 
 from housing.constant import get_current_time_stamp 
 
@@ -26,6 +25,8 @@ def get_log_file_name():
 
 
 def get_log_dataframe(file_path):
+    import pandas as pd
+
     data=[]
     with open(file_path) as log_file:
         for line in log_file.readlines():
@@ -0,0 +1,146 @@
+"""
+Offline scoring of csv files of any size with the latest model in saved_models.
+
+usage: python -m housing.pipeline.batch_prediction --input listings.csv --output predictions.csv
+                                                   [--chunk-size 100000] [--workers 4]
+The input is read in chunks, every chunk is validated against the schema and scored in a process pool
+where each worker loads the model once. At most max_pending_chunks chunks are in flight, and results are
+written in input order, so memory stays bounded whatever the size of the file.
+"""
+import os
+import sys
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from housing.logger import logging
+from housing.exception import HousingException
+from housing.config.configuration import Configuration
+from housing.entity.housing_predictor import ResidentModel, HousingBatchData
+from housing.util.util import read_yaml_file
+from housing.constant import CATEGORICAL_COLUMN_KEY
+
+PREDICTION_COLUMN_NAME = "predicted_median_house_value"
+ERROR_COLUMN_NAME = "errors"
+
+# model and schema of a pool worker, loaded once by init_worker
+_worker_model = None
+_worker_schema = None
+
+
+def init_worker(model_path: str, schema: dict):
+    global _worker_model, _worker_schema
+    _worker_model = ResidentModel.load_model(model_path=model_path)
+    _worker_schema = schema
+
+
+def score_chunk(chunk_index: int, chunk_df: pd.DataFrame) -> str:
+    """
+    return: the scored chunk as csv text, with header only for the first chunk
+    """
+    housing_batch_data = HousingBatchData(housing_data_frame=chunk_df, schema=_worker_schema)
+    valid_mask, row_errors = housing_batch_data.validate()
+
+    predictions = np.full(len(chunk_df), np.nan)
+    if valid_mask.any():
+        predictions[valid_mask] = _worker_model.predict(housing_batch_data.get_valid_data_frame())
+
+    output_df = housing_batch_data.housing_data_frame
+    output_df[PREDICTION_COLUMN_NAME] = predictions
+    errors = np.full(len(chunk_df), "", dtype=object)
+    for row, messages in row_errors.items():
+        errors[row] = "; ".join(messages)
+    output_df[ERROR_COLUMN_NAME] = errors
+    return output_df.to_csv(index=False, header=chunk_index == 0)
+
+
+class BatchPrediction:
+
+    def __init__(self, model_dir: str, schema_file_path: str, chunk_size: int = 100000, workers: int = None,
+                 max_pending_chunks: int = None):
+        try:
+            self.model_dir = model_dir
+            self.schema = read_yaml_file(schema_file_path)
+            self.chunk_size = chunk_size
+            self.workers = workers or os.cpu_count()
+            self.max_pending_chunks = max_pending_chunks or 2 * self.workers
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_model_path(self) -> str:
+        # resolved once so that every chunk is scored by the same model version
+        try:
+            resident_model = ResidentModel(model_dir=self.model_dir, model_reload_interval=0)
+            model_version = resident_model.get_latest_model_version()
+            logging.info(f"Batch prediction uses model version: [{model_version}]")
+            return resident_model.get_model_path(model_version=model_version)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def predict_file(self, input_file_path: str, output_file_path: str) -> dict:
+        try:
+            model_path = self.get_model_path()
+            dtype = {column: str for column in self.schema[CATEGORICAL_COLUMN_KEY]}
+            chunks = pd.read_csv(input_file_path, chunksize=self.chunk_size, dtype=dtype)
+
+            os.makedirs(os.path.dirname(os.path.abspath(output_file_path)), exist_ok=True)
+            start_time = time.perf_counter()
+            row_count = 0
+            pending = deque()
+
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                     initargs=(model_path, self.schema)) as executor, \
+                    open(output_file_path, "w", newline="") as output_file:
+
+                def write_oldest():
+                    output_file.write(pending.popleft().result())
+
+                for chunk_index, chunk_df in enumerate(chunks):
+                    if len(pending) >= self.max_pending_chunks:
+                        write_oldest()
+                    pending.append(executor.submit(score_chunk, chunk_index, chunk_df))
+                    row_count += len(chunk_df)
+                    logging.info(f"Submitted chunk: [{chunk_index}], rows read: [{row_count}]")
+                while pending:
+                    write_oldest()
+
+            elapsed_seconds = time.perf_counter() - start_time
+            summary = {
+                "rows": row_count,
+                "seconds": elapsed_seconds,
+                "rows_per_sec": row_count / elapsed_seconds if elapsed_seconds > 0 else 0,
+                "model_path": model_path,
+                "output_file_path": output_file_path,
+            }
+            logging.info(f"Batch prediction completed: {summary}")
+            return summary
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", required=True)
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-pending-chunks", type=int, default=None)
+    args = parser.parse_args()
+
+    serving_config = Configuration().get_serving_config()
+    batch_prediction = BatchPrediction(model_dir=serving_config.model_dir,
+                                       schema_file_path=serving_config.schema_file_path,
+                                       chunk_size=args.chunk_size,
+                                       workers=args.workers,
+                                       max_pending_chunks=args.max_pending_chunks)
+    summary = batch_prediction.predict_file(input_file_path=args.input, output_file_path=args.output)
+    print(f"Scored {summary['rows']} rows in {summary['seconds']:.2f}s "
+          f"({summary['rows_per_sec']:.0f} rows/sec) with {summary['model_path']}")
+
+
+if __name__ == "__main__":
+    main()
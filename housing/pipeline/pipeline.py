@@ -3,13 +3,14 @@ from datetime import datetime
 import uuid
 from housing.config.configuration import Configuration
 from housing.logger import logging, get_log_file_name
-from housing.exception import HousingException
+from housing.exception import HousingException, get_root_cause
 from threading import Thread
 from typing import List
 
 from multiprocessing import Process
 from housing.entity.artifact_entity import ModelPusherArtifact, DataIngestionArtifact, ModelEvaluationArtifact
-from housing.entity.artifact_entity import DataValidationArtifact, DataTransformationArtifact, ModelTrainerArtifact
+from housing.entity.artifact_entity import DataValidationArtifact, DataTransformationArtifact, ModelTrainerArtifact, \
+    DataDriftArtifact
 from housing.entity.config_entity import DataIngestionConfig, ModelEvaluationConfig
 from housing.component.data_ingestion import DataIngestion
 from housing.component.data_validation import DataValidation
@@ -18,29 +19,114 @@ from housing.component.model_trainer import ModelTrainer
 from housing.component.model_evaluation import ModelEvaluation
 from housing.component.model_pusher import ModelPusher
 import os, sys
+import json
+import urllib.request
 from collections import namedtuple
 from datetime import datetime
 import pandas as pd
-from housing.constant import EXPERIMENT_DIR_NAME, EXPERIMENT_FILE_NAME
+from housing.constant import EXPERIMENT_DIR_NAME, EXPERIMENT_FILE_NAME, STAGE_CACHE_DIR_NAME
+from housing.constant import DATA_INGESTION_CONFIG_KEY, DATA_VALIDATION_CONFIG_KEY, DATA_TRANSFORMATION_CONFIG_KEY, \
+    MODEL_TRAINER_CONFIG_KEY
+from housing.pipeline.stage_cache import StageCache
+from housing.pipeline.stage_scheduler import StageScheduler, StageNode, CPU_RESOURCE
+
+DOWNLOAD_STATE_TIMEOUT_SECONDS = 10
 
 Experiment = namedtuple("Experiment", ["experiment_id", "initialization_timestamp", "artifact_time_stamp",
                                        "running_status", "start_time", "stop_time", "execution_time", "message",
-                                       "experiment_file_path", "accuracy", "is_model_accepted"])
+                                       "experiment_file_path", "accuracy", "is_model_accepted", "stage_timings"])
 
 
 
 
 
 class Pipeline(Thread):
-    experiment: Experiment = Experiment(*([None] * 11))
-    experiment_file_path = None
 
     def __init__(self, config: Configuration ) -> None:
+        """
+        Experiment state belongs to the instance, pipelines with their own Configuration
+        and artifact dir can run side by side (see TrainingJobQueue)
+        """
         try:
             os.makedirs(config.training_pipeline_config.artifact_dir, exist_ok=True)
-            Pipeline.experiment_file_path=os.path.join(config.training_pipeline_config.artifact_dir,EXPERIMENT_DIR_NAME, EXPERIMENT_FILE_NAME)
+            self.experiment_file_path=os.path.join(config.training_pipeline_config.artifact_dir,EXPERIMENT_DIR_NAME, EXPERIMENT_FILE_NAME)
+            self.experiment: Experiment = Experiment(*([None] * 12))
             super().__init__(daemon=False, name="pipeline")
             self.config = config
+            self.stage_cache = StageCache(
+                cache_dir=os.path.join(config.training_pipeline_config.shared_artifact_dir, STAGE_CACHE_DIR_NAME),
+                enabled=config.training_pipeline_config.stage_cache_enabled)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def run_stage(self, stage_name: str, artifact_type, start_stage, config_key: str, input_file_paths: list = None,
+                  upstream_artifacts: list = None, code_modules: list = None, extra_fingerprint_info: dict = None,
+                  is_cacheable: bool = True, **stage_kwargs):
+        """
+        Runs start_stage(**stage_kwargs) unless a prior successful run had the same stage fingerprint,
+        in which case that run's artifact is returned.
+        is_cacheable: False when the stage inputs can not be fingerprinted, the stage then always runs
+        """
+        try:
+            if not is_cacheable:
+                logging.info(f"Stage [{stage_name}] inputs can not be fingerprinted, running it")
+                return start_stage(**stage_kwargs)
+            config_info = self.config.config_info[config_key]
+            if extra_fingerprint_info is not None:
+                config_info = {**config_info, **extra_fingerprint_info}
+            fingerprint = self.stage_cache.get_fingerprint(stage_name=stage_name,
+                                                           config_info=config_info,
+                                                           input_file_paths=input_file_paths,
+                                                           upstream_artifacts=upstream_artifacts,
+                                                           code_modules=code_modules)
+            artifact = self.stage_cache.get(stage_name=stage_name, fingerprint=fingerprint,
+                                            artifact_type=artifact_type)
+            if artifact is not None:
+                logging.info(f"Stage [{stage_name}] inputs unchanged, reusing artifact: {artifact}")
+                return artifact
+            artifact = start_stage(**stage_kwargs)
+            self.stage_cache.put(stage_name=stage_name, fingerprint=fingerprint, artifact=artifact)
+            return artifact
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    @staticmethod
+    def get_download_state(download_url: str) -> dict:
+        """
+        ETag, Last-Modified and Content-Length headers of the dataset url, they change when new data
+        is published at the same url.
+        return: None when the headers can not be read or do not identify a version of the file
+        """
+        try:
+            request = urllib.request.Request(download_url, method="HEAD")
+            with urllib.request.urlopen(request, timeout=DOWNLOAD_STATE_TIMEOUT_SECONDS) as response:
+                download_state = {header: response.headers.get(header)
+                                  for header in ("ETag", "Last-Modified", "Content-Length")}
+        except Exception as e:
+            logging.info(f"Could not read the headers of [{download_url}]: {e}")
+            return None
+        if download_state["ETag"] is None and download_state["Last-Modified"] is None:
+            return None
+        return {"download_url": download_url, "download_state": download_state}
+
+    def get_raw_data_state(self) -> dict:
+        """
+        Path, size and modification time of every local raw shard, cheap to compute on large inputs,
+        or the version headers of the download url when no local raw data is configured.
+        return: None when the raw data can not be fingerprinted
+        """
+        try:
+            data_ingestion_config = self.config.get_data_ingestion_config()
+            raw_data_path = data_ingestion_config.raw_data_path
+            if raw_data_path is None:
+                return Pipeline.get_download_state(data_ingestion_config.dataset_download_url)
+            if not os.path.exists(raw_data_path):
+                return None
+            raw_file_paths = [raw_data_path] if os.path.isfile(raw_data_path) else sorted(
+                os.path.join(dir_path, file_name) for dir_path, _, file_names in os.walk(raw_data_path)
+                for file_name in file_names)
+            return {"raw_files": [[file_path, os.path.getsize(file_path), os.path.getmtime(file_path)]
+                                  for file_path in raw_file_paths]}
         except Exception as e:
             raise HousingException(e, sys) from e
 
@@ -61,6 +147,15 @@ class Pipeline(Thread):
         except Exception as e:
             raise HousingException(e, sys) from e
 
+    def start_data_drift_check(self, data_ingestion_artifact: DataIngestionArtifact) -> DataDriftArtifact:
+        try:
+            data_validation = DataValidation(data_validation_config=self.config.get_data_validation_config(),
+                                             data_ingestion_artifact=data_ingestion_artifact
+                                             )
+            return data_validation.initiate_data_drift_check()
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
     def start_data_transformation(self,
                                   data_ingestion_artifact: DataIngestionArtifact,
                                   data_validation_artifact: DataValidationArtifact
@@ -107,66 +202,174 @@ class Pipeline(Thread):
         except Exception as e:
             raise HousingException(e, sys) from e
 
+    def run_data_ingestion_stage(self) -> DataIngestionArtifact:
+        raw_data_state = self.get_raw_data_state()
+        return self.run_stage(
+            stage_name="data_ingestion",
+            artifact_type=DataIngestionArtifact,
+            start_stage=self.start_data_ingestion,
+            config_key=DATA_INGESTION_CONFIG_KEY,
+            code_modules=[DataIngestion.__module__],
+            extra_fingerprint_info=raw_data_state,
+            is_cacheable=raw_data_state is not None)
+
+    def run_data_validation_stage(self, data_ingestion_artifact: DataIngestionArtifact) -> DataValidationArtifact:
+        return self.run_stage(
+            stage_name="data_validation",
+            artifact_type=DataValidationArtifact,
+            start_stage=self.start_data_validation,
+            config_key=DATA_VALIDATION_CONFIG_KEY,
+            input_file_paths=[self.config.get_data_validation_config().schema_file_path],
+            upstream_artifacts=[data_ingestion_artifact],
+            code_modules=[DataValidation.__module__, "housing.entity.schema_validator"],
+            data_ingestion_artifact=data_ingestion_artifact)
+
+    def run_data_drift_stage(self, data_ingestion_artifact: DataIngestionArtifact) -> DataDriftArtifact:
+        # the report compares against the shared reference sketch, a different reference means a different report
+        reference_sketch_file_path = self.config.get_data_validation_config().reference_sketch_file_path
+        return self.run_stage(
+            stage_name="data_drift",
+            artifact_type=DataDriftArtifact,
+            start_stage=self.start_data_drift_check,
+            config_key=DATA_VALIDATION_CONFIG_KEY,
+            input_file_paths=[reference_sketch_file_path] if os.path.exists(reference_sketch_file_path) else None,
+            upstream_artifacts=[data_ingestion_artifact],
+            code_modules=[DataValidation.__module__, "housing.entity.drift_sketch"],
+            data_ingestion_artifact=data_ingestion_artifact)
+
+    def run_data_transformation_stage(self, data_ingestion_artifact: DataIngestionArtifact,
+                                      data_validation_artifact: DataValidationArtifact) -> DataTransformationArtifact:
+        return self.run_stage(
+            stage_name="data_transformation",
+            artifact_type=DataTransformationArtifact,
+            start_stage=self.start_data_transformation,
+            config_key=DATA_TRANSFORMATION_CONFIG_KEY,
+            upstream_artifacts=[data_ingestion_artifact, data_validation_artifact],
+            code_modules=[DataTransformation.__module__],
+            data_ingestion_artifact=data_ingestion_artifact,
+            data_validation_artifact=data_validation_artifact)
+
+    def run_model_trainer_stage(self, data_transformation_artifact: DataTransformationArtifact) -> ModelTrainerArtifact:
+        return self.run_stage(
+            stage_name="model_trainer",
+            artifact_type=ModelTrainerArtifact,
+            start_stage=self.start_model_trainer,
+            config_key=MODEL_TRAINER_CONFIG_KEY,
+            input_file_paths=[self.config.get_model_trainer_config().model_config_file_path],
+            upstream_artifacts=[data_transformation_artifact],
+            code_modules=[ModelTrainer.__module__, "housing.entity.model_factory", "housing.entity.cv_result_cache",
+                          "housing.entity.compiled_preprocessor"],
+            data_transformation_artifact=data_transformation_artifact)
+
+    def get_stage_nodes(self) -> List[StageNode]:
+        """
+        Stage graph of the pipeline, edges are the artifacts a stage takes as keyword arguments.
+        The drift check only needs the ingested data, so it overlaps validation and transformation.
+        Ingestion and training fork process pools and hold every cpu, so they never overlap another stage.
+        Evaluation and pusher always run, they compare against the currently deployed model.
+        """
+        try:
+            cpu_count = os.cpu_count() or 1
+            return [
+                StageNode(name="data_ingestion", run=self.run_data_ingestion_stage, inputs=dict(),
+                          resources={CPU_RESOURCE: cpu_count}, condition=None),
+                StageNode(name="data_validation", run=self.run_data_validation_stage,
+                          inputs={"data_ingestion_artifact": "data_ingestion"},
+                          resources={CPU_RESOURCE: 1}, condition=None),
+                StageNode(name="data_drift", run=self.run_data_drift_stage,
+                          inputs={"data_ingestion_artifact": "data_ingestion"},
+                          resources={CPU_RESOURCE: 1}, condition=None),
+                StageNode(name="data_transformation", run=self.run_data_transformation_stage,
+                          inputs={"data_ingestion_artifact": "data_ingestion",
+                                  "data_validation_artifact": "data_validation"},
+                          resources={CPU_RESOURCE: 1}, condition=None),
+                StageNode(name="model_trainer", run=self.run_model_trainer_stage,
+                          inputs={"data_transformation_artifact": "data_transformation"},
+                          resources={CPU_RESOURCE: cpu_count}, condition=None),
+                StageNode(name="model_evaluation", run=self.start_model_evaluation,
+                          inputs={"data_ingestion_artifact": "data_ingestion",
+                                  "data_validation_artifact": "data_validation",
+                                  "model_trainer_artifact": "model_trainer"},
+                          resources={CPU_RESOURCE: 1}, condition=None),
+                StageNode(name="model_pusher", run=self.start_model_pusher,
+                          inputs={"model_eval_artifact": "model_evaluation"},
+                          resources={CPU_RESOURCE: 1},
+                          condition=lambda model_eval_artifact: model_eval_artifact.is_model_accepted),
+            ]
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
     def run_pipeline(self):
         try:
-            if Pipeline.experiment.running_status:
+            if self.experiment.running_status:
                 logging.info("Pipeline is already running")
-                return Pipeline.experiment
+                return self.experiment
             # data ingestion
             logging.info("Pipeline starting.")
 
+            stage_scheduler = StageScheduler(nodes=self.get_stage_nodes(),
+                                             resource_capacity={CPU_RESOURCE: os.cpu_count() or 1},
+                                             max_workers=self.config.training_pipeline_config.max_parallel_stages)
+
             experiment_id = str(uuid.uuid4())
 
-            Pipeline.experiment = Experiment(experiment_id=experiment_id,
+            self.experiment = Experiment(experiment_id=experiment_id,
                                              initialization_timestamp=self.config.time_stamp,
                                              artifact_time_stamp=self.config.time_stamp,
                                              running_status=True,
                                              start_time=datetime.now(),
                                              stop_time=None,
                                              execution_time=None,
-                                             experiment_file_path=Pipeline.experiment_file_path,
+                                             experiment_file_path=self.experiment_file_path,
                                              is_model_accepted=None,
                                              message="Pipeline has been started.",
                                              accuracy=None,
+                                             stage_timings=None,
                                              )
-            logging.info(f"Pipeline experiment: {Pipeline.experiment}")
+            logging.info(f"Pipeline experiment: {self.experiment}")
 
             self.save_experiment()
 
-            data_ingestion_artifact = self.start_data_ingestion()
-            data_validation_artifact = self.start_data_validation(data_ingestion_artifact=data_ingestion_artifact)
-            data_transformation_artifact = self.start_data_transformation(
-                data_ingestion_artifact=data_ingestion_artifact,
-                data_validation_artifact=data_validation_artifact
-            )
-            model_trainer_artifact = self.start_model_trainer(data_transformation_artifact=data_transformation_artifact)
-
-            model_evaluation_artifact = self.start_model_evaluation(data_ingestion_artifact=data_ingestion_artifact,
-                                                                    data_validation_artifact=data_validation_artifact,
-                                                                    model_trainer_artifact=model_trainer_artifact)
-
-            if model_evaluation_artifact.is_model_accepted:
-                model_pusher_artifact = self.start_model_pusher(model_eval_artifact=model_evaluation_artifact)
-                logging.info(f'Model pusher artifact: {model_pusher_artifact}')
-            else:
-                logging.info("Trained model rejected.")
-            logging.info("Pipeline completed.")
-
-            stop_time = datetime.now()
-            Pipeline.experiment = Experiment(experiment_id=Pipeline.experiment.experiment_id,
+            model_trainer_artifact = None
+            model_evaluation_artifact = None
+            message = "Pipeline has been completed."
+            try:
+                artifacts = stage_scheduler.run()
+                model_trainer_artifact = artifacts["model_trainer"]
+                model_evaluation_artifact = artifacts["model_evaluation"]
+                if artifacts["model_pusher"] is not None:
+                    logging.info(f'Model pusher artifact: {artifacts["model_pusher"]}')
+                else:
+                    logging.info("Trained model rejected.")
+                logging.info("Pipeline completed.")
+            except Exception as e:
+                message = f"Pipeline has failed: {get_root_cause(e)}"
+                raise
+            finally:
+                # a failed run is recorded as well, with the timings of the stages that did run
+                stage_timings = json.dumps([{"stage": stage_timing.stage_name,
+                                             "start_time": str(stage_timing.start_time),
+                                             "stop_time": str(stage_timing.stop_time),
+                                             "status": stage_timing.status}
+                                            for stage_timing in stage_scheduler.stage_timings])
+                stop_time = datetime.now()
+                self.experiment = Experiment(experiment_id=self.experiment.experiment_id,
                                              initialization_timestamp=self.config.time_stamp,
                                              artifact_time_stamp=self.config.time_stamp,
                                              running_status=False,
-                                             start_time=Pipeline.experiment.start_time,
+                                             start_time=self.experiment.start_time,
                                              stop_time=stop_time,
-                                             execution_time=stop_time - Pipeline.experiment.start_time,
-                                             message="Pipeline has been completed.",
-                                             experiment_file_path=Pipeline.experiment_file_path,
-                                             is_model_accepted=model_evaluation_artifact.is_model_accepted,
-                                             accuracy=model_trainer_artifact.model_accuracy
+                                             execution_time=stop_time - self.experiment.start_time,
+                                             message=message,
+                                             experiment_file_path=self.experiment_file_path,
+                                             is_model_accepted=None if model_evaluation_artifact is None
+                                             else model_evaluation_artifact.is_model_accepted,
+                                             accuracy=None if model_trainer_artifact is None
+                                             else model_trainer_artifact.model_accuracy,
+                                             stage_timings=stage_timings
                                              )
-            logging.info(f"Pipeline experiment: {Pipeline.experiment}")
-            self.save_experiment()
+                logging.info(f"Pipeline experiment: {self.experiment}")
+                self.save_experiment()
         except Exception as e:
             raise HousingException(e, sys) from e
 
@@ -178,32 +381,37 @@ class Pipeline(Thread):
 
     def save_experiment(self):
         try:
-            if Pipeline.experiment.experiment_id is not None:
-                experiment = Pipeline.experiment
+            if self.experiment.experiment_id is not None:
+                experiment = self.experiment
                 experiment_dict = experiment._asdict()
                 experiment_dict: dict = {key: [value] for key, value in experiment_dict.items()}
 
                 experiment_dict.update({
                     "created_time_stamp": [datetime.now()],
-                    "experiment_file_path": [os.path.basename(Pipeline.experiment.experiment_file_path)]})
+                    "experiment_file_path": [os.path.basename(self.experiment.experiment_file_path)]})
 
                 experiment_report = pd.DataFrame(experiment_dict)
 
-                os.makedirs(os.path.dirname(Pipeline.experiment_file_path), exist_ok=True)
-                if os.path.exists(Pipeline.experiment_file_path):
-                    experiment_report.to_csv(Pipeline.experiment_file_path, index=False, header=False, mode="a")
+                os.makedirs(os.path.dirname(self.experiment_file_path), exist_ok=True)
+                if os.path.exists(self.experiment_file_path):
+                    existing_columns = pd.read_csv(self.experiment_file_path, nrows=0).columns.tolist()
+                    if existing_columns != experiment_report.columns.tolist():
+                        # experiment files written before a column was added are rewritten with the new header
+                        experiment_report = pd.concat([pd.read_csv(self.experiment_file_path), experiment_report])
+                        experiment_report.to_csv(self.experiment_file_path, mode="w", index=False, header=True)
+                    else:
+                        experiment_report.to_csv(self.experiment_file_path, index=False, header=False, mode="a")
                 else:
-                    experiment_report.to_csv(Pipeline.experiment_file_path, mode="w", index=False, header=True)
+                    experiment_report.to_csv(self.experiment_file_path, mode="w", index=False, header=True)
             else:
                 print("First start experiment")
         except Exception as e:
             raise HousingException(e, sys) from e
 
-    @classmethod
-    def get_experiments_status(cls, limit: int = 5) -> pd.DataFrame:
+    def get_experiments_status(self, limit: int = 5) -> pd.DataFrame:
         try:
-            if os.path.exists(Pipeline.experiment_file_path):
-                df = pd.read_csv(Pipeline.experiment_file_path)
+            if os.path.exists(self.experiment_file_path):
+                df = pd.read_csv(self.experiment_file_path)
                 limit = -1 * int(limit)
                 return df[limit:].drop(columns=["experiment_file_path", "initialization_timestamp"], axis=1)
             else:
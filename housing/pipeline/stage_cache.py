@@ -0,0 +1,146 @@
+import os
+import sys
+import json
+import hashlib
+
+from housing.logger import logging
+from housing.exception import HousingException
+from housing.util.util import get_file_hash
+
+STAGE_RECORD_FILE_EXTENSION = ".json"
+# artifact fields telling whether the stage succeeded, failed stages are never reused
+STAGE_SUCCESS_FIELDS = ("is_ingested", "is_validated", "is_transformed", "is_trained")
+
+
+def _to_json_value(value):
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+class StageCache:
+    """
+    Records the artifact of every successful pipeline stage under a fingerprint of its inputs:
+    config section, input files, upstream artifacts and the source of the code running the stage.
+    A later run with the same fingerprint reuses the recorded artifact instead of recomputing it,
+    so a run only executes the stages whose inputs changed and a failed run resumes at the
+    first stage that did not complete.
+    """
+
+    def __init__(self, cache_dir: str, enabled: bool = True):
+        try:
+            self.cache_dir = cache_dir
+            self.enabled = enabled
+            # artifact -> content hash, filled when an artifact is recorded or reused
+            self.artifact_hashes = dict()
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    @staticmethod
+    def get_module_hash(module_name: str) -> str:
+        try:
+            return get_file_hash(sys.modules[module_name].__file__)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_artifact_hash(self, artifact) -> str:
+        """
+        Hash of the artifact values where values naming a file are replaced by the file content hash.
+        """
+        try:
+            if artifact in self.artifact_hashes:
+                return self.artifact_hashes[artifact]
+            artifact_content = dict()
+            for name, value in artifact._asdict().items():
+                if isinstance(value, str) and os.path.isfile(value):
+                    value = get_file_hash(value)
+                artifact_content[name] = value
+            artifact_hash = hashlib.sha256(json.dumps(artifact_content, sort_keys=True,
+                                                      default=_to_json_value).encode()).hexdigest()
+            self.artifact_hashes[artifact] = artifact_hash
+            return artifact_hash
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_fingerprint(self, stage_name: str, config_info: dict = None, input_file_paths: list = None,
+                        upstream_artifacts: list = None, code_modules: list = None) -> str:
+        try:
+            fingerprint_data = {
+                "stage": stage_name,
+                "config": config_info,
+                "input_files": {file_path: get_file_hash(file_path)
+                                for file_path in input_file_paths or []},
+                "upstream_artifacts": [self.get_artifact_hash(artifact) for artifact in upstream_artifacts or []],
+                "code": {module_name: StageCache.get_module_hash(module_name) for module_name in code_modules or []},
+            }
+            return hashlib.sha256(json.dumps(fingerprint_data, sort_keys=True,
+                                             default=_to_json_value).encode()).hexdigest()
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_record_file_path(self, stage_name: str, fingerprint: str) -> str:
+        return os.path.join(self.cache_dir, stage_name, f"{fingerprint}{STAGE_RECORD_FILE_EXTENSION}")
+
+    @staticmethod
+    def get_file_state(file_path: str) -> list:
+        """
+        Size and modification time of a file, recorded instead of a content hash so that checking
+        a reused artifact stays cheap on large files.
+        """
+        try:
+            file_stat = os.stat(file_path)
+            return [file_stat.st_size, file_stat.st_mtime_ns]
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get(self, stage_name: str, fingerprint: str, artifact_type):
+        """
+        return: artifact of a prior successful run with the same fingerprint, None when there is none
+        or when a file it refers to has been removed or modified since (size or modification time differ)
+        """
+        try:
+            if not self.enabled:
+                return None
+            record_file_path = self.get_record_file_path(stage_name, fingerprint)
+            if not os.path.exists(record_file_path):
+                return None
+            with open(record_file_path) as file_obj:
+                record = json.load(file_obj)
+            if sorted(record["artifact"]) != sorted(artifact_type._fields):
+                logging.info(f"Stage [{stage_name}] record [{fingerprint}] has outdated artifact fields")
+                return None
+            artifact = artifact_type(**record["artifact"])
+            for value in artifact:
+                if isinstance(value, str) and value in record["files"] \
+                        and (not os.path.isfile(value) or StageCache.get_file_state(value) != record["files"][value]):
+                    logging.info(f"Stage [{stage_name}] record [{fingerprint}] refers to a missing or modified "
+                                 f"file: [{value}]")
+                    return None
+            self.artifact_hashes[artifact] = record["artifact_hash"]
+            return artifact
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def put(self, stage_name: str, fingerprint: str, artifact):
+        try:
+            if not self.enabled:
+                return
+            if any(getattr(artifact, field, True) is False for field in STAGE_SUCCESS_FIELDS):
+                logging.info(f"Stage [{stage_name}] did not succeed, its artifact is not recorded")
+                return
+            record = {
+                "stage": stage_name,
+                "fingerprint": fingerprint,
+                "artifact": artifact._asdict(),
+                "artifact_hash": self.get_artifact_hash(artifact),
+                "files": {value: StageCache.get_file_state(value) for value in artifact
+                          if isinstance(value, str) and os.path.isfile(value)},
+            }
+            record_file_path = self.get_record_file_path(stage_name, fingerprint)
+            os.makedirs(os.path.dirname(record_file_path), exist_ok=True)
+            tmp_file_path = f"{record_file_path}.{os.getpid()}.tmp"
+            with open(tmp_file_path, "w") as file_obj:
+                json.dump(record, file_obj, indent=2, default=_to_json_value)
+            os.replace(tmp_file_path, record_file_path)
+        except Exception as e:
+            raise HousingException(e, sys) from e
@@ -0,0 +1,128 @@
+import sys
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+
+from housing.logger import logging
+from housing.exception import HousingException
+
+CPU_RESOURCE = "cpu"
+STAGE_SUCCEEDED = "succeeded"
+STAGE_SKIPPED = "skipped"
+STAGE_FAILED = "failed"
+
+# run: callable taking the artifacts of inputs as keyword arguments and returning the stage artifact
+# inputs: keyword argument name -> name of the node producing that artifact
+# resources: resource name -> amount held while the node runs, checked against the scheduler capacity
+# condition: optional callable on the same keyword arguments, the node is skipped when it returns False
+StageNode = namedtuple("StageNode", ["name", "run", "inputs", "resources", "condition"])
+
+StageTiming = namedtuple("StageTiming", ["stage_name", "start_time", "stop_time", "status"])
+
+
+class StageScheduler:
+    """
+    Runs a graph of stages whose edges are artifacts. Every node whose inputs are available is started
+    on a thread pool as soon as the resources it declares fit in the remaining capacity, so independent
+    stages overlap. A node asking for more than the capacity runs alone. Stages that fork their own
+    process pools should ask for the whole cpu capacity so that no other stage thread runs while they fork.
+    """
+
+    def __init__(self, nodes: list, resource_capacity: dict, max_workers: int = None):
+        try:
+            self.nodes = {node.name: node for node in nodes}
+            self.resource_capacity = dict(resource_capacity)
+            self.max_workers = max_workers or len(self.nodes)
+            self.stage_timings = []
+            self.validate_graph()
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def validate_graph(self):
+        try:
+            for node in self.nodes.values():
+                unknown_inputs = [name for name in node.inputs.values() if name not in self.nodes]
+                if len(unknown_inputs) > 0:
+                    raise Exception(f"Stage [{node.name}] depends on unknown stages: {unknown_inputs}")
+            # a topological order exists only when the graph has no cycle
+            remaining = dict(self.nodes)
+            while len(remaining) > 0:
+                ready = [name for name, node in remaining.items()
+                         if all(input_name not in remaining for input_name in node.inputs.values())]
+                if len(ready) == 0:
+                    raise Exception(f"Stage graph has a cycle between: {sorted(remaining)}")
+                for name in ready:
+                    del remaining[name]
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_node_resources(self, node: StageNode) -> dict:
+        return {resource: min(amount, self.resource_capacity.get(resource, amount))
+                for resource, amount in (node.resources or dict()).items()}
+
+    def run_node(self, node: StageNode, stage_kwargs: dict):
+        start_time = datetime.now()
+        status = STAGE_FAILED
+        try:
+            if node.condition is not None and not node.condition(**stage_kwargs):
+                logging.info(f"Stage [{node.name}] skipped")
+                status = STAGE_SKIPPED
+                return None
+            logging.info(f"Stage [{node.name}] started")
+            artifact = node.run(**stage_kwargs)
+            status = STAGE_SUCCEEDED
+            return artifact
+        finally:
+            stop_time = datetime.now()
+            self.stage_timings.append(StageTiming(stage_name=node.name, start_time=start_time,
+                                                  stop_time=stop_time, status=status))
+            logging.info(f"Stage [{node.name}] {status} in [{(stop_time - start_time).total_seconds():.2f}] seconds")
+
+    def run(self) -> dict:
+        """
+        return: stage name -> artifact, None for skipped stages
+        """
+        try:
+            artifacts = dict()
+            pending = dict(self.nodes)
+            running = dict()
+            available = dict(self.resource_capacity)
+            error = None
+
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage") as executor:
+                while len(pending) > 0 or len(running) > 0:
+                    if error is None:
+                        for name, node in list(pending.items()):
+                            if len(running) >= self.max_workers:
+                                break
+                            if any(input_name not in artifacts for input_name in node.inputs.values()):
+                                continue
+                            node_resources = self.get_node_resources(node)
+                            if any(amount > available.get(resource, 0) for resource, amount in node_resources.items()):
+                                continue
+                            for resource, amount in node_resources.items():
+                                available[resource] -= amount
+                            stage_kwargs = {kwarg: artifacts[input_name] for kwarg, input_name in node.inputs.items()}
+                            running[executor.submit(self.run_node, node, stage_kwargs)] = node
+                            del pending[name]
+                    elif len(running) == 0:
+                        break
+
+                    if len(running) == 0:
+                        raise Exception(f"Stages {sorted(pending)} can not be scheduled")
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        node = running.pop(future)
+                        for resource, amount in self.get_node_resources(node).items():
+                            available[resource] += amount
+                        try:
+                            artifacts[node.name] = future.result()
+                        except Exception as e:
+                            # running stages are left to finish, nothing new is started
+                            error = error or e
+
+            if error is not None:
+                raise error
+            return artifacts
+        except Exception as e:
+            raise HousingException(e, sys) from e
@@ -0,0 +1,447 @@
+"""
+Queue of training jobs kept on disk under training_pipeline_config.job_dir, picked up by worker processes.
+
+usage: python -m housing.pipeline.training_job_queue --workers 4
+runs workers until interrupted (default: job_workers, at least 1). This is how jobs are run by default,
+the app only starts workers itself when job_workers > 0, which suits a single process server.
+Every job trains with its own copy of config.yaml and model.yaml, updated with the overrides it was
+submitted with, in its own artifact dir. The stage and cv caches and the drift reference sketch are shared
+with the app's artifact dir. Accepted models are exported to the served model dir, like a run of the app's
+own pipeline. A job submitted with isolated_export exports to the job dir instead, so a what-if training never
+replaces the served model; such a job starts from a copy of the served models' model_evaluation.yaml so its
+model is still compared against the best one.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import threading
+import uuid
+import atexit
+import signal
+import argparse
+import multiprocessing
+from collections import namedtuple
+from datetime import datetime
+
+from housing.logger import logging
+from housing.exception import HousingException, HousingValidationError
+from housing.config.configuration import Configuration
+from housing.util.util import read_yaml_file, write_yaml_file
+from housing.constant import CONFIG_FILE_PATH, TRAINING_PIPELINE_CONFIG_KEY, TRAINING_PIPELINE_ARTIFACT_DIR_KEY, \
+    TRAINING_PIPELINE_SHARED_ARTIFACT_DIR_KEY, \
+    MODEL_TRAINER_CONFIG_KEY, MODEL_TRAINER_MODEL_CONFIG_DIR_KEY, MODEL_TRAINER_MODEL_CONFIG_FILE_NAME_KEY, \
+    MODEL_PUSHER_CONFIG_KEY, MODEL_PUSHER_MODEL_EXPORT_DIR_KEY, get_current_time_stamp
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_FILE_NAME = "job.json"
+JOB_CONFIG_FILE_NAME = "config.yaml"
+JOB_ARTIFACT_DIR_NAME = "artifact"
+JOB_EXPORT_DIR_NAME = "saved_models"
+# marker files, a worker claims a job by renaming its marker from the queued to the running dir
+QUEUED_DIR_NAME = ".queued"
+RUNNING_DIR_NAME = ".running"
+# owner of a running job, written in its marker
+MARKER_WORKER_KEY = "worker"
+MARKER_CLAIM_TOKEN_KEY = "claim_token"
+
+TrainingJob = namedtuple("TrainingJob", ["job_id", "status", "created_time", "start_time", "stop_time", "message",
+                                         "config_overrides", "model_config_overrides", "artifact_dir",
+                                         "accuracy", "is_model_accepted", "worker"])
+
+
+def merge_config(config: dict, overrides: dict, path: str = "") -> dict:
+    """
+    return: copy of config updated with overrides, nested dicts are merged key by key
+    Overrides of keys missing from config are rejected so that a typo does not go unnoticed.
+    """
+    if not isinstance(overrides, dict):
+        raise HousingValidationError(f"Overrides of [{path or 'config'}] must be an object")
+    merged = dict(config)
+    for key, value in overrides.items():
+        if key not in config:
+            raise HousingValidationError(f"Unknown config key: [{path}{key}]")
+        if isinstance(value, dict) and isinstance(config[key], dict):
+            merged[key] = merge_config(config[key], value, path=f"{path}{key}.")
+        else:
+            merged[key] = value
+    return merged
+
+
+def get_worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class TrainingJobQueue:
+
+    def __init__(self, job_dir: str, poll_interval: float = 1, lease_seconds: float = 60):
+        """
+        lease_seconds: a running job whose worker has not renewed its lease for this long is queued again,
+        it must stay well above the clock skew between the hosts sharing job_dir
+        """
+        try:
+            self.job_dir = job_dir
+            self.poll_interval = poll_interval
+            self.lease_seconds = lease_seconds
+            self.queued_dir = os.path.join(job_dir, QUEUED_DIR_NAME)
+            self.running_dir = os.path.join(job_dir, RUNNING_DIR_NAME)
+            os.makedirs(self.queued_dir, exist_ok=True)
+            os.makedirs(self.running_dir, exist_ok=True)
+            self.worker_processes = []
+            self.stop_event = None
+            # set from signal handlers, which must not take the lock of the shared stop_event
+            self.is_stop_requested = False
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    @classmethod
+    def from_config(cls, config: Configuration) -> "TrainingJobQueue":
+        training_pipeline_config = config.training_pipeline_config
+        return cls(job_dir=training_pipeline_config.job_dir, poll_interval=training_pipeline_config.job_poll_interval,
+                   lease_seconds=training_pipeline_config.job_lease_seconds)
+
+    def get_job_file_path(self, job_id: str) -> str:
+        return os.path.join(self.job_dir, job_id, JOB_FILE_NAME)
+
+    def save_job(self, job: TrainingJob):
+        try:
+            job_file_path = self.get_job_file_path(job.job_id)
+            tmp_file_path = f"{job_file_path}.{os.getpid()}.tmp"
+            with open(tmp_file_path, "w") as file_obj:
+                json.dump(job._asdict(), file_obj, indent=2, default=str)
+            os.replace(tmp_file_path, job_file_path)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_job(self, job_id: str) -> TrainingJob:
+        """
+        return: the job or None when there is no job with this id
+        """
+        try:
+            job_file_path = self.get_job_file_path(job_id)
+            if os.path.basename(os.path.dirname(job_file_path)) != job_id or not os.path.exists(job_file_path):
+                return None
+            with open(job_file_path) as file_obj:
+                return TrainingJob(**json.load(file_obj))
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def list_jobs(self, limit: int = None) -> list:
+        """
+        return: jobs, most recently created first
+        """
+        try:
+            jobs = [self.get_job(job_id) for job_id in os.listdir(self.job_dir) if not job_id.startswith(".")]
+            jobs = sorted([job for job in jobs if job is not None], key=lambda job: job.created_time, reverse=True)
+            return jobs if limit is None else jobs[:limit]
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def submit(self, config_overrides: dict = None, model_config_overrides: dict = None,
+               isolated_export: bool = False) -> TrainingJob:
+        """
+        Writes the job config files and queues the job.
+        config_overrides: values replacing those of config.yaml, e.g. {"model_trainer_config": {"base_accuracy": 0.7}}
+        model_config_overrides: values replacing those of model.yaml
+        isolated_export: export an accepted model to the job dir instead of the served model dir
+        """
+        try:
+            config_overrides = config_overrides or dict()
+            model_config_overrides = model_config_overrides or dict()
+            job_id = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+            job_path = os.path.join(self.job_dir, job_id)
+            artifact_dir = os.path.join(job_path, JOB_ARTIFACT_DIR_NAME)
+
+            job_config = merge_config(read_yaml_file(CONFIG_FILE_PATH), config_overrides)
+            model_trainer_config_info = job_config[MODEL_TRAINER_CONFIG_KEY]
+            config = Configuration(config_file_path=CONFIG_FILE_PATH)
+            model_config_file_path = config.get_model_trainer_config().model_config_file_path
+            model_config = merge_config(read_yaml_file(model_config_file_path), model_config_overrides)
+            # absolute paths, Configuration joins them onto the root dir unchanged
+            job_config = merge_config(job_config, {
+                TRAINING_PIPELINE_CONFIG_KEY: {
+                    TRAINING_PIPELINE_ARTIFACT_DIR_KEY: artifact_dir,
+                    TRAINING_PIPELINE_SHARED_ARTIFACT_DIR_KEY: config.training_pipeline_config.shared_artifact_dir,
+                },
+                MODEL_TRAINER_CONFIG_KEY: {MODEL_TRAINER_MODEL_CONFIG_DIR_KEY: job_path},
+            })
+            if isolated_export:
+                job_config = merge_config(job_config, {
+                    MODEL_PUSHER_CONFIG_KEY: {MODEL_PUSHER_MODEL_EXPORT_DIR_KEY: os.path.join(job_path, JOB_EXPORT_DIR_NAME)}
+                })
+
+            os.makedirs(job_path, exist_ok=False)
+            write_yaml_file(file_path=os.path.join(job_path, JOB_CONFIG_FILE_NAME), data=job_config)
+            write_yaml_file(file_path=os.path.join(job_path, model_trainer_config_info[MODEL_TRAINER_MODEL_CONFIG_FILE_NAME_KEY]),
+                            data=model_config)
+
+            job = TrainingJob(job_id=job_id, status=JOB_QUEUED, created_time=str(datetime.now()), start_time=None,
+                              stop_time=None, message="Training job queued.", config_overrides=config_overrides,
+                              model_config_overrides=model_config_overrides, artifact_dir=artifact_dir,
+                              accuracy=None, is_model_accepted=None, worker=None)
+            self.save_job(job)
+            # marker names sort in submission order
+            open(os.path.join(self.queued_dir, f"{time.time_ns()}_{job_id}"), "w").close()
+            logging.info(f"Training job submitted: {job}")
+            return job
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_marker_owner(self, job_id: str) -> dict:
+        """
+        return: worker and claim token written in the running marker of the job, None when it is not running
+        """
+        try:
+            with open(os.path.join(self.running_dir, job_id)) as file_obj:
+                return json.load(file_obj)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def claim_next_job(self) -> tuple:
+        """
+        The marker is renamed into the running dir with a fresh modification time, which starts the lease,
+        and its owner is then written in it.
+        return: (job id, claim token) of the oldest queued job, now owned by the calling process, or None
+        """
+        try:
+            for marker_name in sorted(os.listdir(self.queued_dir)):
+                job_id = marker_name.split("_", 1)[1]
+                marker_file_path = os.path.join(self.queued_dir, marker_name)
+                running_marker_file_path = os.path.join(self.running_dir, job_id)
+                try:
+                    os.utime(marker_file_path)
+                    os.rename(marker_file_path, running_marker_file_path)
+                except FileNotFoundError:
+                    # claimed by another worker in the meantime
+                    continue
+                claim_token = uuid.uuid4().hex
+                tmp_file_path = f"{running_marker_file_path}.{claim_token}.tmp"
+                with open(tmp_file_path, "w") as file_obj:
+                    json.dump({MARKER_WORKER_KEY: get_worker_name(), MARKER_CLAIM_TOKEN_KEY: claim_token}, file_obj)
+                os.replace(tmp_file_path, running_marker_file_path)
+                return job_id, claim_token
+            return None
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def renew_lease(self, job_id: str, claim_token: str) -> bool:
+        """
+        return: False when the job is no longer owned by this claim, e.g. requeued after its lease expired
+        """
+        try:
+            owner = self.get_marker_owner(job_id)
+            if owner is None or owner.get(MARKER_CLAIM_TOKEN_KEY) != claim_token:
+                return False
+            os.utime(os.path.join(self.running_dir, job_id))
+            return True
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def keep_lease(self, job_id: str, claim_token: str, stop_event: threading.Event):
+        """
+        Renews the lease of a running job until stop_event is set
+        """
+        while not stop_event.wait(self.lease_seconds / 3):
+            if not self.renew_lease(job_id=job_id, claim_token=claim_token):
+                logging.info(f"Training job [{job_id}] lease lost, it may be run by another worker")
+                return
+
+    def requeue_orphaned_jobs(self) -> int:
+        """
+        Puts back in the queue the running jobs whose lease expired, their worker is gone or stuck,
+        e.g. after a restart. Markers without a written owner are covered by the lease taken at claim time.
+        return: number of requeued jobs
+        """
+        try:
+            n_requeued = 0
+            for job_id in os.listdir(self.running_dir):
+                if job_id.endswith(".tmp"):
+                    continue
+                marker_file_path = os.path.join(self.running_dir, job_id)
+                try:
+                    if time.time() - os.path.getmtime(marker_file_path) <= self.lease_seconds:
+                        continue
+                except FileNotFoundError:
+                    continue
+                job = self.get_job(job_id)
+                if job is not None:
+                    self.save_job(job._replace(status=JOB_QUEUED, message="Training job requeued.", worker=None))
+                try:
+                    os.rename(marker_file_path, os.path.join(self.queued_dir, f"{time.time_ns()}_{job_id}"))
+                    n_requeued += 1
+                except FileNotFoundError:
+                    # requeued by another process in the meantime
+                    continue
+            if n_requeued > 0:
+                logging.info(f"Requeued [{n_requeued}] orphaned training jobs")
+            return n_requeued
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    @staticmethod
+    def copy_model_evaluation_file(config: Configuration):
+        """
+        A job exporting to its own dir starts from the model evaluation history of the served models,
+        its trained model is then accepted only if it beats the best served model.
+        """
+        try:
+            model_evaluation_file_path = config.get_model_evaluation_config().model_evaluation_file_path
+            served_model_evaluation_file_path = Configuration(config_file_path=CONFIG_FILE_PATH) \
+                .get_model_evaluation_config().model_evaluation_file_path
+            if model_evaluation_file_path == served_model_evaluation_file_path \
+                    or os.path.exists(model_evaluation_file_path) \
+                    or not os.path.exists(served_model_evaluation_file_path):
+                return
+            os.makedirs(os.path.dirname(model_evaluation_file_path), exist_ok=True)
+            shutil.copy(src=served_model_evaluation_file_path, dst=model_evaluation_file_path)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def run_job(self, job_id: str, claim_token: str) -> TrainingJob:
+        """
+        Runs a job claimed by claim_next_job, renewing its lease meanwhile.
+        """
+        # the pipeline imports sklearn and every component, only job workers need it
+        from housing.pipeline.pipeline import Pipeline
+
+        job = self.get_job(job_id)
+        if job is None:
+            logging.info(f"Training job [{job_id}] has no job file, dropping it")
+            os.remove(os.path.join(self.running_dir, job_id))
+            return None
+        job = job._replace(status=JOB_RUNNING, start_time=str(datetime.now()),
+                           message="Training job running.", worker=get_worker_name())
+        self.save_job(job)
+        logging.info(f"Training job started: {job}")
+        job_done_event = threading.Event()
+        lease_thread = threading.Thread(target=self.keep_lease, args=(job_id, claim_token, job_done_event),
+                                        daemon=True, name="training-job-lease")
+        lease_thread.start()
+        try:
+            config = Configuration(config_file_path=os.path.join(self.job_dir, job_id, JOB_CONFIG_FILE_NAME),
+                                   current_time_stamp=get_current_time_stamp())
+            self.copy_model_evaluation_file(config)
+            pipeline = Pipeline(config=config)
+            pipeline.run_pipeline()
+            job = job._replace(status=JOB_SUCCEEDED, message=pipeline.experiment.message,
+                               accuracy=pipeline.experiment.accuracy,
+                               is_model_accepted=pipeline.experiment.is_model_accepted)
+        except Exception as e:
+            logging.info(f"Training job [{job_id}] failed: {e}")
+            job = job._replace(status=JOB_FAILED, message=str(e))
+        job_done_event.set()
+        lease_thread.join()
+        job = job._replace(stop_time=str(datetime.now()))
+        self.save_job(job)
+        owner = self.get_marker_owner(job_id)
+        if owner is not None and owner.get(MARKER_CLAIM_TOKEN_KEY) == claim_token:
+            os.remove(os.path.join(self.running_dir, job_id))
+        logging.info(f"Training job finished: {job}")
+        return job
+
+    def request_stop(self, signum=None, frame=None):
+        """
+        Signal handler, the worker or runner stops once its running job is finished
+        """
+        self.is_stop_requested = True
+
+    def run_worker(self, stop_event, parent_pid: int = None):
+        """
+        Runs queued jobs one at a time until stop_event is set, a stop is requested or the parent process
+        (parent_pid) is gone, a running job is finished first.
+        An idle worker requeues the jobs of workers that are gone.
+        """
+        try:
+            while not stop_event.is_set() and not self.is_stop_requested \
+                    and (parent_pid is None or os.getppid() == parent_pid):
+                claim = self.claim_next_job()
+                if claim is None:
+                    self.requeue_orphaned_jobs()
+                    stop_event.wait(self.poll_interval)
+                    continue
+                job_id, claim_token = claim
+                self.run_job(job_id=job_id, claim_token=claim_token)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def start_workers(self, workers: int):
+        """
+        Starts worker processes, they are asked to stop when this process exits.
+        Spawned rather than forked since the caller may be a multi threaded server.
+        """
+        try:
+            if workers <= 0 or len(self.worker_processes) > 0:
+                return
+            self.stop_event = multiprocessing.get_context("spawn").Event()
+            self.worker_processes = [self.start_worker_process(worker_index) for worker_index in range(workers)]
+            atexit.register(self.stop_workers)
+            logging.info(f"Started [{workers}] training job workers on: [{self.job_dir}]")
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def start_worker_process(self, worker_index: int):
+        worker_process = multiprocessing.get_context("spawn").Process(
+            target=run_training_job_worker,
+            args=(self.job_dir, self.poll_interval, self.lease_seconds, self.stop_event, os.getpid()),
+            name=f"training-job-worker-{worker_index}")
+        worker_process.start()
+        return worker_process
+
+    def supervise_workers(self):
+        """
+        Replaces worker processes that exit, e.g. killed by the oom killer, until a stop is requested
+        """
+        try:
+            while not self.is_stop_requested:
+                for worker_index, worker_process in enumerate(self.worker_processes):
+                    if worker_process.is_alive():
+                        continue
+                    logging.info(f"Training job worker [{worker_process.name}] exited with code "
+                                 f"[{worker_process.exitcode}], starting a new one")
+                    self.worker_processes[worker_index] = self.start_worker_process(worker_index)
+                time.sleep(self.poll_interval)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def stop_workers(self):
+        if self.stop_event is not None:
+            self.stop_event.set()
+
+
+def run_training_job_worker(job_dir: str, poll_interval: float, lease_seconds: float, stop_event, parent_pid: int):
+    training_job_queue = TrainingJobQueue(job_dir=job_dir, poll_interval=poll_interval, lease_seconds=lease_seconds)
+    # ctrl-c reaches the whole process group and is left to the parent, SIGTERM stops the worker after its
+    # running job; the worker also stops once its parent is gone, e.g. killed without running its atexit
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, training_job_queue.request_stop)
+    training_job_queue.run_worker(stop_event, parent_pid=parent_pid)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    config = Configuration()
+    training_job_queue = TrainingJobQueue.from_config(config)
+    training_job_queue.start_workers(args.workers or config.training_pipeline_config.job_workers or 1)
+    signal.signal(signal.SIGTERM, training_job_queue.request_stop)
+    try:
+        training_job_queue.supervise_workers()
+    except KeyboardInterrupt:
+        pass
+    # running jobs are finished before the workers exit
+    training_job_queue.stop_workers()
+    for worker_process in training_job_queue.worker_processes:
+        worker_process.join()
+
+
+if __name__ == "__main__":
+    main()
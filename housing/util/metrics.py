@@ -0,0 +1,181 @@
+import sys
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from threading import Lock
+
+from housing.exception import HousingException
+
+DEFAULT_LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                           1.0, 2.5, 5.0, 10.0)
+
+LATENCY_QUANTILES = (0.5, 0.95, 0.99)
+
+METRIC_PREFIX = "housing"
+
+
+class LatencyHistogram:
+    """
+    Fixed bucket histogram, quantiles are interpolated inside the bucket they fall in.
+    """
+
+    def __init__(self, buckets: tuple = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = Lock()
+
+    def observe(self, seconds: float):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.bucket_counts[index] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def get_quantile(self, quantile: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = quantile * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.bucket_counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+
+class StageTimer:
+    __slots__ = ("request_timer", "stage_name", "start_time")
+
+    def __init__(self, request_timer, stage_name: str):
+        self.request_timer = request_timer
+        self.stage_name = stage_name
+        self.start_time = None
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.request_timer.durations.append((self.stage_name, time.perf_counter() - self.start_time))
+        return False
+
+
+class RequestTimer:
+    """
+    Collects the stage durations of one request, they are recorded with the model version
+    that served the request once it is known, in finish.
+    """
+
+    def __init__(self, metrics_registry, endpoint: str):
+        self.metrics_registry = metrics_registry
+        self.endpoint = endpoint
+        self.durations = []
+
+    def stage(self, stage_name: str) -> StageTimer:
+        return StageTimer(self, stage_name)
+
+    def finish(self, model_version: str = None, status: str = "ok"):
+        self.metrics_registry.record(endpoint=self.endpoint, durations=self.durations,
+                                     model_version=model_version, status=status)
+
+
+class NullRequestTimer:
+    """
+    Used when metrics are disabled, every call is a no-op on shared objects.
+    """
+    _null_stage = nullcontext()
+
+    def stage(self, stage_name: str):
+        return NullRequestTimer._null_stage
+
+    def finish(self, model_version: str = None, status: str = "ok"):
+        pass
+
+
+NULL_REQUEST_TIMER = NullRequestTimer()
+
+
+class MetricsRegistry:
+
+    def __init__(self, enabled: bool = True, buckets: tuple = DEFAULT_LATENCY_BUCKETS):
+        try:
+            self.enabled = enabled
+            self.buckets = buckets
+            self.stage_histograms = dict()
+            self.request_counts = dict()
+            self._lock = Lock()
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def start_request(self, endpoint: str):
+        if not self.enabled:
+            return NULL_REQUEST_TIMER
+        return RequestTimer(self, endpoint)
+
+    def record(self, endpoint: str, durations: list, model_version: str = None, status: str = "ok"):
+        model_version = model_version or ""
+        for stage_name, seconds in durations:
+            key = (endpoint, stage_name, model_version)
+            histogram = self.stage_histograms.get(key)
+            if histogram is None:
+                with self._lock:
+                    histogram = self.stage_histograms.setdefault(key, LatencyHistogram(self.buckets))
+            histogram.observe(seconds)
+        key = (endpoint, model_version, status)
+        with self._lock:
+            self.request_counts[key] = self.request_counts.get(key, 0) + 1
+
+    @staticmethod
+    def _format_labels(**labels) -> str:
+        return ",".join(f'{name}="{str(value)}"' for name, value in labels.items())
+
+    def get_prometheus_text(self, gauges: dict = None) -> str:
+        """
+        gauges: optional {group: {name: value}}, numeric values are exported as housing_<group>_<name>
+        """
+        try:
+            with self._lock:
+                request_counts = dict(self.request_counts)
+                stage_histograms = dict(self.stage_histograms)
+
+            lines = []
+            name = f"{METRIC_PREFIX}_requests_total"
+            lines += [f"# HELP {name} Requests served per endpoint, model version and status.",
+                      f"# TYPE {name} counter"]
+            for (endpoint, model_version, status), count in sorted(request_counts.items()):
+                labels = self._format_labels(endpoint=endpoint, model_version=model_version, status=status)
+                lines.append(f"{name}{{{labels}}} {count}")
+
+            name = f"{METRIC_PREFIX}_stage_latency_seconds"
+            lines += [f"# HELP {name} Latency of each serving stage.", f"# TYPE {name} histogram"]
+            for (endpoint, stage_name, model_version), histogram in sorted(stage_histograms.items()):
+                labels = self._format_labels(endpoint=endpoint, stage=stage_name, model_version=model_version)
+                cumulative = 0
+                for bucket, bucket_count in zip(histogram.buckets, histogram.bucket_counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{{{labels},le="{bucket}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+            name = f"{METRIC_PREFIX}_stage_latency_quantile_seconds"
+            lines += [f"# HELP {name} Latency quantiles of each serving stage estimated from the histogram.",
+                      f"# TYPE {name} gauge"]
+            for (endpoint, stage_name, model_version), histogram in sorted(stage_histograms.items()):
+                labels = self._format_labels(endpoint=endpoint, stage=stage_name, model_version=model_version)
+                for quantile in LATENCY_QUANTILES:
+                    lines.append(f'{name}{{{labels},quantile="{quantile}"}} {histogram.get_quantile(quantile)}')
+
+            for group, values in (gauges or dict()).items():
+                for key, value in (values or dict()).items():
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        name = f"{METRIC_PREFIX}_{group}_{key}"
+                        lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+            return "\n".join(lines) + "\n"
+        except Exception as e:
+            raise HousingException(e, sys) from e
@@ -1,4 +1,5 @@
 import os,sys
+import hashlib
 import yaml
 import pandas as pd
 import numpy as np
@@ -47,13 +48,84 @@ def load_data(file_path:str,schema_file_path:str)->pd.DataFrame:
         raise HousingException(e,sys) from e
     
 
-###Delete 
-def save_numpy_array_data(file_path:str,array:np.array):
+def get_numpy_array_metadata_file_path(file_path:str)->str:
+    return f"{os.path.splitext(file_path)[0]}.yaml"
+
+
+def save_numpy_array_data(file_path:str,array:np.array,column_names:list=None):
+    """
+    Saves array as .npy, column names are written to a yaml file next to it
+    """
     try:
         dir_path = os.path.dirname(file_path)
         os.makedirs(dir_path, exist_ok=True)
         with open(file_path, 'wb') as file_obj:
             np.save(file_obj, array)
+        if column_names is not None:
+            write_yaml_file(file_path=get_numpy_array_metadata_file_path(file_path),
+                            data={NUMPY_ARRAY_COLUMNS_KEY: [str(column) for column in column_names],
+                                  NUMPY_ARRAY_DTYPE_KEY: array.dtype.name,
+                                  NUMPY_ARRAY_SHAPE_KEY: list(array.shape)})
+    except Exception as e:
+        raise HousingException(e, sys) from e
+
+
+def save_sparse_array_data(file_path:str,matrix,column_names:list=None):
+    """
+    Saves a scipy sparse matrix as .npz in csr format, column names are written to a yaml file next to it
+    """
+    try:
+        # scipy is only needed by training, it is imported here to keep it out of the serving startup
+        from scipy import sparse
+
+        dir_path = os.path.dirname(file_path)
+        os.makedirs(dir_path, exist_ok=True)
+        matrix = sparse.csr_matrix(matrix)
+        sparse.save_npz(file_path, matrix)
+        if column_names is not None:
+            write_yaml_file(file_path=get_numpy_array_metadata_file_path(file_path),
+                            data={NUMPY_ARRAY_COLUMNS_KEY: [str(column) for column in column_names],
+                                  NUMPY_ARRAY_DTYPE_KEY: matrix.dtype.name,
+                                  NUMPY_ARRAY_SHAPE_KEY: list(matrix.shape),
+                                  NUMPY_ARRAY_DENSITY_KEY: float(matrix.nnz / max(1, np.prod(matrix.shape)))})
+    except Exception as e:
+        raise HousingException(e, sys) from e
+
+
+def load_transformed_array_data(file_path:str):
+    """
+    return: csr matrix for .npz files, read only memory mapped array for .npy files
+    """
+    try:
+        if file_path.endswith(SPARSE_TRANSFORMED_FILE_EXTENSION):
+            from scipy import sparse
+            return sparse.load_npz(file_path).tocsr()
+        return load_numpy_array_data(file_path=file_path, mmap_mode="r")
+    except Exception as e:
+        raise HousingException(e, sys) from e
+
+
+def to_dense_array(array)->np.array:
+    # scipy sparse matrices are the only inputs with toarray
+    if hasattr(array, "toarray"):
+        return array.toarray()
+    return array
+
+
+def split_transformed_array_data(array)->tuple:
+    """
+    return: features and target (the last column) of a transformed array,
+    the features stay memory mapped or sparse
+    """
+    return array[:, :-1], to_dense_array(array[:, -1]).ravel()
+
+
+def load_numpy_array_data(file_path:str,mmap_mode:str=None)->np.array:
+    """
+    mmap_mode: "r" opens the array memory mapped instead of reading it
+    """
+    try:
+        return np.load(file_path, mmap_mode=mmap_mode)
     except Exception as e:
         raise HousingException(e, sys) from e
 
@@ -95,3 +167,17 @@ def write_yaml_file(file_path:str,data:dict=None):
                 yaml.dump(data,yaml_file)
     except Exception as e:
         raise HousingException(e,sys)
+
+
+def get_file_hash(file_path:str)->str:
+    """
+    sha256 of the file content, read in chunks of FILE_HASH_CHUNK_SIZE bytes
+    """
+    try:
+        digest=hashlib.sha256()
+        with open(file_path,"rb") as file_obj:
+            for chunk in iter(lambda: file_obj.read(FILE_HASH_CHUNK_SIZE),b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    except Exception as e:
+        raise HousingException(e,sys) from e
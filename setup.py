@@ -16,5 +16,8 @@ setup(
     author='Shashvath',
     description='Predicting housing prices for California hosuing dataset',
     packages=find_packages(),
-    install_requires = get_requirements_list()
+    install_requires = get_requirements_list(),
+    entry_points={
+        "console_scripts": ["housing-batch-predict=housing.pipeline.batch_prediction:main"]
+    }
 )
\ No newline at end of file
@@ -0,0 +1,114 @@
+"""
+Parity of the compiled serving path (CompiledPreprocessor, CompactHousingModel) with the sklearn
+preprocessing object and estimators it is built from.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+from sklearn.tree import DecisionTreeRegressor
+from sklearn.ensemble import RandomForestRegressor
+
+from housing.exception import HousingException
+from housing.entity.config_entity import DataTransformationConfig
+from housing.entity.artifact_entity import DataValidationArtifact
+from housing.component.data_transformation import DataTransformation
+from housing.component.model_trainer import HousingEstimatorModel
+from housing.entity.compiled_preprocessor import CompiledPreprocessor
+from housing.entity.compact_model import CompactHousingModel, save_compact_model, load_compact_model
+from housing.util.util import to_dense_array
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA_FILE_PATH = os.path.join(ROOT_DIR, "config", "schema.yaml")
+OCEAN_PROXIMITY = ["<1H OCEAN", "INLAND", "ISLAND", "NEAR BAY", "NEAR OCEAN"]
+
+
+def get_housing_frame(n_rows: int, random_state: int) -> pd.DataFrame:
+    random_generator = np.random.default_rng(random_state)
+    housing_df = pd.DataFrame({
+        "longitude": random_generator.uniform(-124, -114, n_rows),
+        "latitude": random_generator.uniform(32, 42, n_rows),
+        "housing_median_age": random_generator.integers(1, 52, n_rows).astype(float),
+        "total_rooms": random_generator.uniform(10, 8000, n_rows),
+        "total_bedrooms": random_generator.uniform(2, 1500, n_rows),
+        "population": random_generator.uniform(5, 6000, n_rows),
+        "households": random_generator.uniform(2, 1500, n_rows),
+        "median_income": random_generator.uniform(0.5, 15, n_rows),
+        "ocean_proximity": np.resize(OCEAN_PROXIMITY, n_rows).astype(object),
+    })
+    # missing values in every column exercise both imputers
+    for column in housing_df.columns:
+        housing_df.loc[random_generator.random(n_rows) < 0.1, column] = np.nan
+    return housing_df
+
+
+def get_preprocessing_object(housing_df: pd.DataFrame, sparse_density_threshold: float):
+    data_transformation = DataTransformation(
+        data_transformation_config=DataTransformationConfig(add_bedroom_per_room=True,
+                                                            transformed_train_dir=None,
+                                                            transformed_test_dir=None,
+                                                            preprocessed_object_file_path=None,
+                                                            transformed_dtype="float64",
+                                                            sparse_density_threshold=sparse_density_threshold),
+        data_ingestion_artifact=None,
+        data_validation_artifact=DataValidationArtifact(schema_file_path=SCHEMA_FILE_PATH, report_file_path=None,
+                                                        report_page_file_path=None, is_validated=True,
+                                                        message=""))
+    return data_transformation.get_data_transformer_object().fit(housing_df)
+
+
+@pytest.fixture(scope="module")
+def train_df():
+    return get_housing_frame(n_rows=400, random_state=1)
+
+
+@pytest.fixture(scope="module")
+def test_df():
+    return get_housing_frame(n_rows=200, random_state=2)
+
+
+@pytest.mark.parametrize("sparse_density_threshold", [0.0, 1.0])
+def test_transform_matches_sklearn(train_df, test_df, sparse_density_threshold):
+    preprocessing_object = get_preprocessing_object(train_df, sparse_density_threshold)
+    compiled_preprocessor = CompiledPreprocessor.from_preprocessing_object(preprocessing_object)
+
+    assert test_df.isna().any().all()
+    expected = to_dense_array(preprocessing_object.transform(test_df))
+    actual = compiled_preprocessor.transform_data_frame(test_df)
+    np.testing.assert_allclose(actual, expected, rtol=1e-12, atol=1e-12)
+
+
+def test_unknown_category_raises(train_df, test_df):
+    preprocessing_object = get_preprocessing_object(train_df, sparse_density_threshold=0.0)
+    compiled_preprocessor = CompiledPreprocessor.from_preprocessing_object(preprocessing_object)
+
+    unknown_df = test_df.head(5).copy()
+    unknown_df.loc[unknown_df.index[2], "ocean_proximity"] = "MOON"
+    with pytest.raises(ValueError):
+        preprocessing_object.transform(unknown_df)
+    with pytest.raises(HousingException, match="MOON"):
+        compiled_preprocessor.transform_data_frame(unknown_df)
+
+
+@pytest.mark.parametrize("estimator", [LinearRegression(),
+                                       DecisionTreeRegressor(max_depth=6, random_state=0),
+                                       RandomForestRegressor(n_estimators=10, max_depth=5, random_state=0)],
+                         ids=lambda estimator: type(estimator).__name__)
+def test_compact_model_matches_sklearn(train_df, test_df, estimator, tmp_path):
+    preprocessing_object = get_preprocessing_object(train_df, sparse_density_threshold=0.0)
+    target = np.random.default_rng(3).uniform(1e4, 5e5, len(train_df))
+    estimator.fit(to_dense_array(preprocessing_object.transform(train_df)), target)
+
+    housing_model = HousingEstimatorModel(preprocessing_object=preprocessing_object, trained_model_object=estimator)
+    expected = housing_model.predict(test_df)
+    assert housing_model.compile()
+
+    compact_model = CompactHousingModel.from_housing_estimator_model(housing_model)
+    np.testing.assert_allclose(compact_model.predict(test_df), expected, rtol=1e-9)
+
+    compact_model_file_path = str(tmp_path / "model.bin")
+    save_compact_model(file_path=compact_model_file_path, compact_model=compact_model)
+    np.testing.assert_allclose(load_compact_model(file_path=compact_model_file_path).predict(test_df), expected,
+                               rtol=1e-9)
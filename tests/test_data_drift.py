@@ -0,0 +1,59 @@
+"""
+Drift report against the shared reference sketch: every dataset is merged into the reference once.
+"""
+import json
+import os
+
+import numpy as np
+
+from housing.component.data_validation import DataValidation
+from housing.entity.artifact_entity import DataIngestionArtifact
+from housing.entity.config_entity import DataValidationConfig
+from housing.entity.drift_sketch import DatasetSketch
+from test_compiled_preprocessor import SCHEMA_FILE_PATH, get_housing_frame
+
+
+def get_data_validation(tmp_path, run_name: str, random_state: int) -> DataValidation:
+    data_dir = tmp_path / run_name
+    data_dir.mkdir()
+    for file_name, n_rows in (("train.csv", 800), ("test.csv", 200)):
+        housing_df = get_housing_frame(n_rows=n_rows, random_state=random_state + n_rows)
+        housing_df["median_house_value"] = np.random.default_rng(random_state).uniform(1e4, 5e5, n_rows)
+        housing_df.to_csv(data_dir / file_name, index=False)
+    data_validation_config = DataValidationConfig(schema_file_path=SCHEMA_FILE_PATH,
+                                                  report_file_path=str(data_dir / "report.json"),
+                                                  report_page_file_path=str(data_dir / "report.html"),
+                                                  schema_report_file_path=str(data_dir / "schema_report.json"),
+                                                  chunk_size=300,
+                                                  reference_sketch_file_path=str(tmp_path / "reference_sketch.json"),
+                                                  sketch_relative_accuracy=0.01, drift_psi_threshold=0.2)
+    data_ingestion_artifact = DataIngestionArtifact(train_file_path=str(data_dir / "train.csv"),
+                                                    test_file_path=str(data_dir / "test.csv"),
+                                                    is_ingested=True, message="")
+    return DataValidation(data_ingestion_artifact=data_ingestion_artifact,
+                          data_validation_config=data_validation_config)
+
+
+def get_reference_row_count(reference_sketch_file_path: str) -> int:
+    return DatasetSketch.load(reference_sketch_file_path).column_sketches["median_income"].count
+
+
+def test_dataset_is_merged_into_the_reference_once(tmp_path):
+    data_validation = get_data_validation(tmp_path, "first", random_state=1)
+    reference_sketch_file_path = data_validation.data_validation_config.reference_sketch_file_path
+
+    first_report = data_validation.get_and_save_data_drift_report()
+    assert "reference" not in first_report
+    n_reference_rows = get_reference_row_count(reference_sketch_file_path)
+    reference_mtime = os.path.getmtime(reference_sketch_file_path)
+
+    # a rerun on the same data compares against the reference without adding the rows again
+    rerun_report = data_validation.get_and_save_data_drift_report()
+    assert "reference" in rerun_report
+    assert get_reference_row_count(reference_sketch_file_path) == n_reference_rows
+    assert os.path.getmtime(reference_sketch_file_path) == reference_mtime
+
+    get_data_validation(tmp_path, "second", random_state=2).get_and_save_data_drift_report()
+    assert get_reference_row_count(reference_sketch_file_path) > n_reference_rows
+    with open(reference_sketch_file_path) as reference_sketch_file:
+        assert len(json.load(reference_sketch_file)["data_hashes"]) == 2
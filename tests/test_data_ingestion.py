@@ -0,0 +1,109 @@
+"""
+Train/test split of DataIngestion: deterministic whatever the shard layout, chunk size, byte ranges and workers,
+identical rows on the same side, and a TEST_SIZE share of every income category.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import housing.component.data_ingestion as data_ingestion_module
+from housing.component.data_ingestion import DataIngestion, TEST_SIZE, get_income_category
+from housing.entity.config_entity import DataIngestionConfig
+from test_compiled_preprocessor import SCHEMA_FILE_PATH, get_housing_frame
+
+
+def get_raw_frame(n_rows: int) -> pd.DataFrame:
+    raw_df = get_housing_frame(n_rows=n_rows, random_state=4)
+    raw_df["median_house_value"] = np.random.default_rng(5).uniform(1e4, 5e5, n_rows).round(0)
+    return raw_df
+
+
+def ingest(raw_data_path: str, output_dir: str, chunk_size: int = 1000, workers: int = 1,
+           split_seed: int = 1) -> tuple:
+    """
+    return: train and test data frames
+    """
+    data_ingestion_config = DataIngestionConfig(dataset_download_url=None, tgz_download_dir=None, raw_data_dir=None,
+                                                ingested_train_dir=os.path.join(output_dir, "train"),
+                                                ingested_test_dir=os.path.join(output_dir, "test"),
+                                                raw_data_path=raw_data_path, schema_file_path=SCHEMA_FILE_PATH,
+                                                chunk_size=chunk_size, workers=workers, split_seed=split_seed,
+                                                split_key_columns=None, split_tolerance=0.005)
+    data_ingestion_artifact = DataIngestion(data_ingestion_config=data_ingestion_config).initiate_data_ingestion()
+    return pd.read_csv(data_ingestion_artifact.train_file_path), pd.read_csv(data_ingestion_artifact.test_file_path)
+
+
+def sort_rows(data_frame: pd.DataFrame) -> pd.DataFrame:
+    return data_frame.sort_values(list(data_frame.columns)).reset_index(drop=True)
+
+
+@pytest.fixture(scope="module")
+def raw_df():
+    return get_raw_frame(n_rows=20000)
+
+
+@pytest.fixture(scope="module")
+def raw_file_path(raw_df, tmp_path_factory):
+    raw_file_path = str(tmp_path_factory.mktemp("raw") / "housing.csv")
+    raw_df.to_csv(raw_file_path, index=False)
+    return raw_file_path
+
+
+def test_split_does_not_depend_on_chunks_ranges_or_workers(raw_file_path, tmp_path, monkeypatch):
+    train_df, test_df = ingest(raw_file_path, str(tmp_path / "whole"), chunk_size=20000)
+
+    # byte ranges of about 64 KB, each parsed by one of two workers
+    monkeypatch.setattr(data_ingestion_module, "MIN_RAW_FILE_RANGE_BYTES", 1 << 16)
+    ranged_train_df, ranged_test_df = ingest(raw_file_path, str(tmp_path / "ranges"), chunk_size=777, workers=2)
+
+    pd.testing.assert_frame_equal(ranged_train_df, train_df)
+    pd.testing.assert_frame_equal(ranged_test_df, test_df)
+
+
+def test_split_does_not_depend_on_shard_layout(raw_df, raw_file_path, tmp_path):
+    shard_dir = tmp_path / "shards"
+    shard_dir.mkdir()
+    # shards in another row order, one compressed and one with its columns reordered
+    shuffled_df = raw_df.sample(frac=1.0, random_state=6)
+    shuffled_df.iloc[:7000].to_csv(shard_dir / "part-0.csv", index=False)
+    shuffled_df.iloc[7000:14000].to_csv(shard_dir / "part-1.csv.gz", index=False)
+    shuffled_df.iloc[14000:][list(raw_df.columns[::-1])].to_csv(shard_dir / "part-2.csv", index=False)
+
+    train_df, test_df = ingest(raw_file_path, str(tmp_path / "file"))
+    sharded_train_df, sharded_test_df = ingest(str(shard_dir), str(tmp_path / "sharded"), workers=2)
+
+    pd.testing.assert_frame_equal(sort_rows(sharded_train_df), sort_rows(train_df))
+    pd.testing.assert_frame_equal(sort_rows(sharded_test_df), sort_rows(test_df))
+
+
+def test_split_seed_changes_the_split(raw_file_path, tmp_path):
+    _, test_df = ingest(raw_file_path, str(tmp_path / "seed_1"), split_seed=1)
+    _, other_test_df = ingest(raw_file_path, str(tmp_path / "seed_2"), split_seed=2)
+
+    assert not sort_rows(test_df).equals(sort_rows(other_test_df))
+
+
+def test_identical_rows_land_on_the_same_side(raw_df, tmp_path):
+    duplicated_df = pd.concat([raw_df.head(2000)] * 3, ignore_index=True)
+    raw_file_path = str(tmp_path / "duplicated.csv")
+    duplicated_df.to_csv(raw_file_path, index=False)
+
+    train_df, test_df = ingest(raw_file_path, str(tmp_path / "output"))
+
+    assert len(train_df) + len(test_df) == len(duplicated_df)
+    assert train_df.merge(test_df.drop_duplicates(), how="inner").empty
+    assert (train_df.value_counts(dropna=False) == 3).all() and (test_df.value_counts(dropna=False) == 3).all()
+
+
+def test_every_income_category_gets_its_test_share(raw_df, raw_file_path, tmp_path):
+    train_df, test_df = ingest(raw_file_path, str(tmp_path / "output"))
+
+    assert len(train_df) + len(test_df) == len(raw_df)
+    train_categories = pd.Series(get_income_category(train_df)).value_counts()
+    test_categories = pd.Series(get_income_category(test_df)).value_counts()
+    for category, n_test_rows in test_categories.items():
+        n_rows = n_test_rows + train_categories[category]
+        # the hash split misses TEST_SIZE by sampling noise only
+        assert abs(n_test_rows / n_rows - TEST_SIZE) < 4 * np.sqrt(TEST_SIZE * (1 - TEST_SIZE) / n_rows)
@@ -0,0 +1,114 @@
+"""
+/predict_batch validation and status codes, and the error bodies clients get back.
+"""
+import os
+
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression
+
+import app as flask_app
+from housing.entity.config_entity import ServingConfig
+from housing.entity.prediction_service import PredictionService
+from housing.component.model_trainer import HousingEstimatorModel
+from housing.util.util import save_object, to_dense_array
+from test_compiled_preprocessor import SCHEMA_FILE_PATH, get_housing_frame, get_preprocessing_object
+
+MODEL_VERSION = "20260101000000"
+VALID_RECORD = {"longitude": -122.2, "latitude": 37.8, "housing_median_age": 30, "total_rooms": 1000,
+                "total_bedrooms": 200, "population": 500, "households": 180, "median_income": 5.0,
+                "ocean_proximity": "NEAR BAY"}
+
+
+def get_serving_config(model_dir: str, **overrides) -> ServingConfig:
+    serving_config = ServingConfig(model_dir=model_dir, model_reload_interval=5, schema_file_path=SCHEMA_FILE_PATH,
+                                   max_batch_size=100, coalesce_enabled=False, coalesce_window_ms=2,
+                                   coalesce_max_batch_size=64, coalesce_max_queue_depth=1024,
+                                   coalesce_timeout_ms=1000, cache_enabled=True, cache_max_size=100,
+                                   cache_ttl_seconds=300, cache_float_decimals=4, workers=1, threads=1,
+                                   max_requests=0, max_requests_jitter=0, graceful_timeout=30,
+                                   asgi_executor_workers=1, asgi_max_pending=1, metrics_enabled=False,
+                                   import_time_budget_ms=None)
+    return serving_config._replace(**overrides)
+
+
+@pytest.fixture(scope="module")
+def model_dir(tmp_path_factory):
+    train_df = get_housing_frame(n_rows=300, random_state=1)
+    preprocessing_object = get_preprocessing_object(train_df, sparse_density_threshold=0.0)
+    target = np.random.default_rng(3).uniform(1e4, 5e5, len(train_df))
+    estimator = LinearRegression().fit(to_dense_array(preprocessing_object.transform(train_df)), target)
+
+    model_dir = str(tmp_path_factory.mktemp("saved_models"))
+    save_object(file_path=os.path.join(model_dir, MODEL_VERSION, "model.pkl"),
+                obj=HousingEstimatorModel(preprocessing_object=preprocessing_object, trained_model_object=estimator))
+    return model_dir
+
+
+@pytest.fixture
+def client(model_dir, monkeypatch):
+    monkeypatch.setattr(flask_app, "prediction_service",
+                        PredictionService(serving_config=get_serving_config(model_dir, max_batch_size=3)))
+    return flask_app.app.test_client()
+
+
+def test_valid_and_invalid_rows(client):
+    response = client.post("/predict_batch", json=[VALID_RECORD, dict(VALID_RECORD, median_income="abc")])
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["model_version"] == MODEL_VERSION
+    assert [prediction["row"] for prediction in body["predictions"]] == [0, 1]
+    assert np.isfinite(body["predictions"][0]["median_house_value"])
+    assert body["predictions"][1]["errors"] == ["[median_income] must be a number"]
+
+
+def test_records_key_and_csv_body(client):
+    assert client.post("/predict_batch", json={"records": [VALID_RECORD]}).status_code == 200
+
+    csv_body = ",".join(VALID_RECORD) + "\n" + ",".join(str(value) for value in VALID_RECORD.values()) + "\n"
+    response = client.post("/predict_batch", data=csv_body, content_type="text/csv")
+    assert response.status_code == 200
+    assert len(response.get_json()["predictions"]) == 1
+
+
+@pytest.mark.parametrize("records", [[], {"records": []}])
+def test_empty_batch(client, records):
+    response = client.post("/predict_batch", json=records)
+
+    assert response.status_code == 200
+    assert response.get_json() == {"model_version": MODEL_VERSION, "predictions": []}
+
+
+@pytest.mark.parametrize("body, message", [
+    ([{"longitude": 1.0}], "are missing from the data"),
+    ("not a list", "Batch records must be a list of objects"),
+    ([1, 2], "Batch records must be a list of objects"),
+])
+def test_invalid_batch_is_400_without_internals(client, body, message):
+    response = client.post("/predict_batch", json=body)
+
+    assert response.status_code == 400
+    error = response.get_json()["error"]
+    assert message in error
+    assert "Error occured" not in error and ".py" not in error
+
+
+def test_unparsable_body_is_400(client):
+    response = client.post("/predict_batch", data="{not json", content_type="application/json")
+
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Batch could not be parsed"}
+
+
+def test_oversized_batch_is_413(client):
+    assert client.post("/predict_batch", json=[VALID_RECORD] * 4).status_code == 413
+
+
+def test_no_model_is_503(tmp_path, monkeypatch):
+    monkeypatch.setattr(flask_app, "prediction_service",
+                        PredictionService(serving_config=get_serving_config(str(tmp_path))))
+
+    response = flask_app.app.test_client().post("/predict_batch", json=[VALID_RECORD])
+    assert response.status_code == 503
+    assert response.get_json() == {"error": "No model is available to serve predictions"}
@@ -0,0 +1,81 @@
+"""
+PredictionCache: canonical keys, model version invalidation, time to live and LRU eviction.
+"""
+import numpy as np
+
+from housing.entity.housing_predictor import HousingData, HousingPrediction
+from housing.entity.prediction_cache import PredictionCache
+
+
+def get_housing_data(median_income: float = 5.0, ocean_proximity: str = "NEAR BAY",
+                     total_bedrooms: float = 200.0) -> HousingData:
+    return HousingData(longitude=-122.2, latitude=37.8, housing_median_age=30, total_rooms=1000,
+                       total_bedrooms=total_bedrooms, population=500, households=180, median_income=median_income,
+                       ocean_proximity=ocean_proximity)
+
+
+def get_prediction(model_version: str, median_house_value: float = 1.0) -> HousingPrediction:
+    return HousingPrediction(model_version=model_version, median_house_value=np.array([median_house_value]))
+
+
+def test_hit_and_miss():
+    prediction_cache = PredictionCache()
+    housing_data = get_housing_data()
+
+    assert prediction_cache.get(housing_data, model_version="1") is None
+    housing_prediction = get_prediction("1")
+    prediction_cache.put(housing_data, housing_prediction)
+    assert prediction_cache.get(housing_data, model_version="1") is housing_prediction
+
+    metrics = prediction_cache.get_metrics()
+    assert (metrics["hit_count"], metrics["miss_count"], metrics["size"]) == (1, 1, 1)
+
+
+def test_new_model_version_drops_entries():
+    prediction_cache = PredictionCache()
+    housing_data = get_housing_data()
+    prediction_cache.put(housing_data, get_prediction("1"))
+
+    assert prediction_cache.get(housing_data, model_version="2") is None
+    assert prediction_cache.get_metrics()["invalidation_count"] == 1
+    assert prediction_cache.get_metrics()["size"] == 0
+    # predictions of the new version are cached as usual
+    prediction_cache.put(housing_data, get_prediction("2", median_house_value=2.0))
+    assert prediction_cache.get(housing_data, model_version="2").median_house_value[0] == 2.0
+
+
+def test_key_is_built_from_the_canonical_input():
+    prediction_cache = PredictionCache(float_decimals=4)
+    raw_housing_data = get_housing_data(median_income=5.00001, ocean_proximity="  near   bay ",
+                                        total_bedrooms=float("nan"))
+    canonical_housing_data = prediction_cache.canonicalize(raw_housing_data)
+
+    assert canonical_housing_data.ocean_proximity == "NEAR BAY"
+    assert canonical_housing_data.median_income == 5.0
+    assert np.isnan(canonical_housing_data.total_bedrooms)
+    # what the model is given is keyed exactly like the raw input
+    assert prediction_cache.get_key(canonical_housing_data) == prediction_cache.get_key(raw_housing_data)
+    assert prediction_cache.get_key(get_housing_data(ocean_proximity="INLAND")) \
+        != prediction_cache.get_key(get_housing_data(ocean_proximity="NEAR BAY"))
+
+
+def test_expired_entries_are_missed():
+    prediction_cache = PredictionCache(ttl_seconds=0)
+    housing_data = get_housing_data()
+    prediction_cache.put(housing_data, get_prediction("1"))
+
+    assert prediction_cache.get(housing_data, model_version="1") is None
+    assert prediction_cache.get_metrics()["expired_count"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    prediction_cache = PredictionCache(max_size=2)
+    first, second, third = (get_housing_data(median_income=income) for income in (1.0, 2.0, 3.0))
+    prediction_cache.put(first, get_prediction("1"))
+    prediction_cache.put(second, get_prediction("1"))
+    assert prediction_cache.get(first, model_version="1") is not None
+    prediction_cache.put(third, get_prediction("1"))
+
+    assert prediction_cache.get(second, model_version="1") is None
+    assert prediction_cache.get(first, model_version="1") is not None
+    assert prediction_cache.get_metrics()["eviction_count"] == 1
@@ -0,0 +1,89 @@
+"""
+PredictionCoalescer: rows submitted together are scored in one batch and each caller gets its own row back.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+
+import numpy as np
+import pytest
+
+from housing.entity.housing_predictor import HousingData, HousingPrediction
+from housing.entity.prediction_coalescer import PredictionCoalescer
+
+MODEL_VERSION = "1"
+
+
+class IncomePredictor:
+    """
+    Predicts ten times median_income and fails any batch holding a negative income
+    """
+
+    def __init__(self, release_event: Event = None):
+        self.batch_sizes = []
+        self.entered_event = Event()
+        self.release_event = release_event
+
+    def predict_with_version(self, X) -> HousingPrediction:
+        self.entered_event.set()
+        if self.release_event is not None:
+            self.release_event.wait(timeout=10)
+        self.batch_sizes.append(len(X))
+        median_income = X["median_income"].to_numpy(dtype=float)
+        if (median_income < 0).any():
+            raise ValueError("negative median_income")
+        return HousingPrediction(model_version=MODEL_VERSION, median_house_value=median_income * 10)
+
+
+def get_housing_data(median_income: float) -> HousingData:
+    return HousingData(longitude=-122.2, latitude=37.8, housing_median_age=30, total_rooms=1000,
+                       total_bedrooms=200, population=500, households=180, median_income=median_income,
+                       ocean_proximity="NEAR BAY")
+
+
+def test_concurrent_rows_are_batched():
+    housing_predictor = IncomePredictor()
+    prediction_coalescer = PredictionCoalescer(housing_predictor=housing_predictor, window_ms=200, max_batch_size=8)
+    incomes = [float(income) for income in range(1, 21)]
+
+    with ThreadPoolExecutor(max_workers=len(incomes)) as executor:
+        futures = list(executor.map(lambda income: prediction_coalescer.submit(get_housing_data(income)), incomes))
+    predictions = [future.result(timeout=10) for future in futures]
+
+    for income, prediction in zip(incomes, predictions):
+        assert prediction.model_version == MODEL_VERSION
+        np.testing.assert_allclose(prediction.median_house_value, [income * 10])
+    assert sum(housing_predictor.batch_sizes) == len(incomes)
+    assert max(housing_predictor.batch_sizes) <= 8
+    assert len(housing_predictor.batch_sizes) < len(incomes)
+    metrics = prediction_coalescer.get_metrics()
+    assert metrics["request_count"] == len(incomes)
+    assert metrics["batch_count"] == len(housing_predictor.batch_sizes)
+
+
+def test_failing_row_does_not_fail_its_batch():
+    prediction_coalescer = PredictionCoalescer(housing_predictor=IncomePredictor(), window_ms=200, max_batch_size=8)
+
+    good_future = prediction_coalescer.submit(get_housing_data(2.0))
+    bad_future = prediction_coalescer.submit(get_housing_data(-1.0))
+
+    np.testing.assert_allclose(good_future.result(timeout=10).median_house_value, [20.0])
+    with pytest.raises(ValueError):
+        bad_future.result(timeout=10)
+
+
+def test_full_queue_rejects_rows():
+    release_event = Event()
+    housing_predictor = IncomePredictor(release_event=release_event)
+    prediction_coalescer = PredictionCoalescer(housing_predictor=housing_predictor, window_ms=0, max_batch_size=1,
+                                               max_queue_depth=1)
+
+    first_future = prediction_coalescer.submit(get_housing_data(1.0))
+    # the batching thread holds the first row, the second fills the queue
+    assert housing_predictor.entered_event.wait(timeout=10)
+    second_future = prediction_coalescer.submit(get_housing_data(2.0))
+    assert prediction_coalescer.submit(get_housing_data(3.0)) is None
+
+    release_event.set()
+    np.testing.assert_allclose(first_future.result(timeout=10).median_house_value, [10.0])
+    np.testing.assert_allclose(second_future.result(timeout=10).median_house_value, [20.0])
+    assert prediction_coalescer.get_metrics()["rejected_count"] == 1
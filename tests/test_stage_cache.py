@@ -0,0 +1,94 @@
+"""
+StageCache: a stage is reused only when its fingerprint matches and the files of its artifact are unchanged.
+"""
+import os
+
+import pytest
+
+from housing.entity.artifact_entity import DataIngestionArtifact
+from housing.pipeline.stage_cache import StageCache
+
+STAGE_NAME = "data_ingestion"
+
+
+@pytest.fixture
+def stage_files(tmp_path):
+    """
+    return: input file and an artifact whose train and test files exist
+    """
+    input_file_path = tmp_path / "schema.yaml"
+    input_file_path.write_text("columns: 1\n")
+    train_file_path, test_file_path = tmp_path / "train.csv", tmp_path / "test.csv"
+    train_file_path.write_text("a\n1\n")
+    test_file_path.write_text("a\n2\n")
+    artifact = DataIngestionArtifact(train_file_path=str(train_file_path), test_file_path=str(test_file_path),
+                                     is_ingested=True, message="Data Ingestion successful")
+    return str(input_file_path), artifact
+
+
+def get_fingerprint(stage_cache: StageCache, input_file_path: str, config_info: dict = None) -> str:
+    return stage_cache.get_fingerprint(stage_name=STAGE_NAME, config_info=config_info or {"chunk_size": 10},
+                                       input_file_paths=[input_file_path],
+                                       code_modules=[StageCache.__module__])
+
+
+def test_hit_on_unchanged_inputs(tmp_path, stage_files):
+    input_file_path, artifact = stage_files
+    stage_cache = StageCache(cache_dir=str(tmp_path / "cache"))
+    fingerprint = get_fingerprint(stage_cache, input_file_path)
+
+    assert stage_cache.get(STAGE_NAME, fingerprint, DataIngestionArtifact) is None
+    stage_cache.put(STAGE_NAME, fingerprint, artifact)
+
+    # a new pipeline run computes the same fingerprint and gets the artifact back
+    other_stage_cache = StageCache(cache_dir=str(tmp_path / "cache"))
+    assert get_fingerprint(other_stage_cache, input_file_path) == fingerprint
+    assert other_stage_cache.get(STAGE_NAME, fingerprint, DataIngestionArtifact) == artifact
+
+
+def test_miss_on_changed_config_or_input_file(tmp_path, stage_files):
+    input_file_path, artifact = stage_files
+    stage_cache = StageCache(cache_dir=str(tmp_path / "cache"))
+    fingerprint = get_fingerprint(stage_cache, input_file_path)
+    stage_cache.put(STAGE_NAME, fingerprint, artifact)
+
+    assert get_fingerprint(stage_cache, input_file_path, config_info={"chunk_size": 20}) != fingerprint
+    with open(input_file_path, "a") as input_file:
+        input_file.write("rows: 2\n")
+    changed_fingerprint = get_fingerprint(stage_cache, input_file_path)
+    assert changed_fingerprint != fingerprint
+    assert stage_cache.get(STAGE_NAME, changed_fingerprint, DataIngestionArtifact) is None
+
+
+def test_miss_on_modified_or_removed_artifact_file(tmp_path, stage_files):
+    input_file_path, artifact = stage_files
+    stage_cache = StageCache(cache_dir=str(tmp_path / "cache"))
+    fingerprint = get_fingerprint(stage_cache, input_file_path)
+    stage_cache.put(STAGE_NAME, fingerprint, artifact)
+
+    with open(artifact.train_file_path, "a") as train_file:
+        train_file.write("3\n")
+    assert stage_cache.get(STAGE_NAME, fingerprint, DataIngestionArtifact) is None
+
+    stage_cache.put(STAGE_NAME, fingerprint, artifact)
+    os.remove(artifact.test_file_path)
+    assert stage_cache.get(STAGE_NAME, fingerprint, DataIngestionArtifact) is None
+
+
+def test_failed_stage_is_not_recorded(tmp_path, stage_files):
+    input_file_path, artifact = stage_files
+    stage_cache = StageCache(cache_dir=str(tmp_path / "cache"))
+    fingerprint = get_fingerprint(stage_cache, input_file_path)
+
+    stage_cache.put(STAGE_NAME, fingerprint, artifact._replace(is_ingested=False))
+    assert stage_cache.get(STAGE_NAME, fingerprint, DataIngestionArtifact) is None
+
+
+def test_disabled_cache_always_misses(tmp_path, stage_files):
+    input_file_path, artifact = stage_files
+    stage_cache = StageCache(cache_dir=str(tmp_path / "cache"), enabled=False)
+    fingerprint = get_fingerprint(stage_cache, input_file_path)
+
+    stage_cache.put(STAGE_NAME, fingerprint, artifact)
+    assert stage_cache.get(STAGE_NAME, fingerprint, DataIngestionArtifact) is None
+    assert not os.path.exists(tmp_path / "cache")
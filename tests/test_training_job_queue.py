@@ -0,0 +1,75 @@
+"""
+TrainingJobQueue: a queued job is claimed by one worker under a lease, and requeued once its lease expires.
+"""
+import os
+import time
+
+import pytest
+
+from housing.pipeline.training_job_queue import TrainingJobQueue, JOB_QUEUED
+
+LEASE_SECONDS = 60
+
+
+@pytest.fixture
+def training_job_queue(tmp_path):
+    return TrainingJobQueue(job_dir=str(tmp_path / "jobs"), poll_interval=0.1, lease_seconds=LEASE_SECONDS)
+
+
+def expire_lease(training_job_queue: TrainingJobQueue, job_id: str):
+    marker_file_path = os.path.join(training_job_queue.running_dir, job_id)
+    expired_time = time.time() - 2 * LEASE_SECONDS
+    os.utime(marker_file_path, (expired_time, expired_time))
+
+
+def test_jobs_are_claimed_once_in_submission_order(training_job_queue):
+    first_job = training_job_queue.submit()
+    second_job = training_job_queue.submit()
+
+    first_job_id, first_claim_token = training_job_queue.claim_next_job()
+    second_job_id, second_claim_token = training_job_queue.claim_next_job()
+
+    assert (first_job_id, second_job_id) == (first_job.job_id, second_job.job_id)
+    assert first_claim_token != second_claim_token
+    assert training_job_queue.claim_next_job() is None
+    assert training_job_queue.get_marker_owner(first_job_id)["claim_token"] == first_claim_token
+
+
+def test_unknown_config_key_is_rejected(training_job_queue):
+    with pytest.raises(Exception, match="Unknown config key"):
+        training_job_queue.submit(config_overrides={"model_trainer_config": {"no_such_key": 1}})
+    assert training_job_queue.claim_next_job() is None
+
+
+def test_live_lease_is_not_requeued(training_job_queue):
+    job_id = training_job_queue.submit().job_id
+    _, claim_token = training_job_queue.claim_next_job()
+
+    assert training_job_queue.requeue_orphaned_jobs() == 0
+    assert training_job_queue.renew_lease(job_id=job_id, claim_token=claim_token)
+    assert training_job_queue.claim_next_job() is None
+
+
+def test_expired_lease_is_requeued_and_the_old_claim_lost(training_job_queue):
+    job_id = training_job_queue.submit().job_id
+    _, claim_token = training_job_queue.claim_next_job()
+
+    expire_lease(training_job_queue, job_id)
+    assert training_job_queue.requeue_orphaned_jobs() == 1
+    assert training_job_queue.get_job(job_id).status == JOB_QUEUED
+
+    # the worker that lost its lease can not renew it, the job is claimed again under a new token
+    assert not training_job_queue.renew_lease(job_id=job_id, claim_token=claim_token)
+    reclaimed_job_id, new_claim_token = training_job_queue.claim_next_job()
+    assert reclaimed_job_id == job_id and new_claim_token != claim_token
+    assert not training_job_queue.renew_lease(job_id=job_id, claim_token=claim_token)
+    assert training_job_queue.renew_lease(job_id=job_id, claim_token=new_claim_token)
+
+
+def test_renewed_lease_survives_requeue(training_job_queue):
+    job_id = training_job_queue.submit().job_id
+    _, claim_token = training_job_queue.claim_next_job()
+
+    expire_lease(training_job_queue, job_id)
+    assert training_job_queue.renew_lease(job_id=job_id, claim_token=claim_token)
+    assert training_job_queue.requeue_orphaned_jobs() == 0
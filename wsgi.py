@@ -0,0 +1,14 @@
+"""
+Production entry point: gunicorn --config gunicorn.conf.py wsgi:application
+With preload_app the master imports this module, so the model is loaded and warmed once
+before the workers are forked and every worker shares it copy on write.
+"""
+from app import app, housing_predictor
+
+
+def create_app():
+    housing_predictor.warm_up()
+    return app
+
+
+application = create_app()